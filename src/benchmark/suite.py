@@ -0,0 +1,185 @@
+"""Benchmark suite with JSON baselines.
+
+Usage:
+  python -m src.benchmark.suite -suite quick -output [results.json]
+      -baseline [baseline.json]
+
+Runs the seeded workloads in src.benchmark.workloads and reports operations
+per second, p50 and p99 latency and peak memory for each case. If a
+baseline from an earlier run is given, cases that got slower by more than
+the tolerance are reported as regressions and the exit status is 1.
+"""
+
+import argparse
+import json
+import platform
+import sys
+import tracemalloc
+
+import numpy as np
+
+import src.benchmark.workloads as workloads
+
+
+def _Cases(workload, param_sets):
+  """Makes (workload, params) cases from a list of parameter dicts."""
+  return [(workload, params) for params in param_sets]
+
+
+# Benchmark cases of each suite. The quick suite takes about a minute, the
+# full suite covers the largest sizes and takes much longer.
+SUITES = {
+    'quick': (
+        _Cases('matching', [
+            dict(depth=depth, crossing_ratio=ratio, num_orders=20000)
+            for depth in (10, 1000) for ratio in (0.1, 0.5, 0.9)]) +
+        _Cases('history', [
+            dict(num_trades=num_trades, limit=limit, candle_size=candle_size,
+                 num_queries=100)
+            for num_trades in (10**5, 10**6)
+            for limit, candle_size in ((25, 1), (None, 100))]) +
+        _Cases('simulation', [
+            dict(num_agents=num_agents, timesteps=20)
+            for num_agents in (10**3, 10**4)])),
+    'full': (
+        _Cases('matching', [
+            dict(depth=depth, crossing_ratio=ratio, num_orders=100000)
+            for depth in (10, 1000, 10000) for ratio in (0.0, 0.5, 1.0)]) +
+        _Cases('history', [
+            dict(num_trades=num_trades, limit=limit, candle_size=candle_size,
+                 num_queries=100)
+            for num_trades in (10**5, 10**6, 10**7)
+            for limit, candle_size in ((25, 1), (1000, 10), (None, 100))]) +
+        _Cases('simulation', [
+            dict(num_agents=num_agents, timesteps=10)
+            for num_agents in (10**3, 10**4, 10**5, 10**6)])),
+}
+
+
+def CaseName(workload, params):
+  """Gets a readable name that identifies a case."""
+  return '%s/%s' % (workload, ','.join(
+      '%s=%s' % (name, params[name]) for name in sorted(params)))
+
+
+def RunCase(workload, params, memory=True):
+  """Runs one benchmark case.
+
+  Args:
+    workload: Name of the workload in workloads.WORKLOADS.
+    params: Parameters of the workload.
+    memory: (optional) Run the workload a second time with tracemalloc to
+      measure its peak memory. Timings come from the first run, which is not
+      slowed down by tracing.
+
+  Returns:
+    Dict of the case's metrics.
+  """
+  run = workloads.WORKLOADS[workload]
+  num_ops, latencies, total_seconds = run(**params)
+  result = {
+      'workload': workload,
+      'params': params,
+      'ops': num_ops,
+      'seconds': total_seconds,
+      'ops_per_sec': num_ops / total_seconds if total_seconds > 0 else 0.0,
+      'p50_us': float(np.percentile(latencies, 50)) * 1e6,
+      'p99_us': float(np.percentile(latencies, 99)) * 1e6,
+  }
+  if memory:
+    tracemalloc.start()
+    try:
+      run(**params)
+      result['peak_memory_mb'] = tracemalloc.get_traced_memory()[1] / 2.0**20
+    finally:
+      tracemalloc.stop()
+  return result
+
+
+def RunSuite(cases, memory=True, log=None):
+  """Runs benchmark cases.
+
+  Args:
+    cases: List of (workload, params) cases.
+    memory: (optional) Measure the peak memory of each case.
+    log: (optional) File to write a line to after each case.
+
+  Returns:
+    Results dict with the metrics of each case by name.
+  """
+  results = {
+      'python': platform.python_version(),
+      'numpy': np.__version__,
+      'cases': {},
+  }
+  for workload, params in cases:
+    name = CaseName(workload, params)
+    result = RunCase(workload, params, memory=memory)
+    results['cases'][name] = result
+    if log:
+      log.write('%-70s %12.0f ops/s  p50 %9.1f us  p99 %9.1f us\n' % (
+          name, result['ops_per_sec'], result['p50_us'], result['p99_us']))
+      log.flush()
+  return results
+
+
+def Compare(results, baseline, tolerance=0.2):
+  """Finds cases that are slower than in the baseline.
+
+  Args:
+    results: Results dict of RunSuite.
+    baseline: Results dict of an earlier run.
+    tolerance: (optional) Allowed relative slowdown.
+
+  Returns:
+    List of messages, one per regressed metric. Empty if nothing regressed.
+  """
+  regressions = []
+  for name, result in sorted(results['cases'].items()):
+    base = baseline['cases'].get(name)
+    if base is None:
+      continue
+    if result['ops_per_sec'] < base['ops_per_sec'] * (1 - tolerance):
+      regressions.append('%s: %.0f ops/s, baseline %.0f ops/s' % (
+          name, result['ops_per_sec'], base['ops_per_sec']))
+    if result['p99_us'] > base['p99_us'] * (1 + tolerance):
+      regressions.append('%s: p99 %.1f us, baseline %.1f us' % (
+          name, result['p99_us'], base['p99_us']))
+    if ('peak_memory_mb' in result and 'peak_memory_mb' in base and
+        result['peak_memory_mb'] > base['peak_memory_mb'] * (1 + tolerance)):
+      regressions.append('%s: peak memory %.1f MB, baseline %.1f MB' % (
+          name, result['peak_memory_mb'], base['peak_memory_mb']))
+  return regressions
+
+
+def main(argv):
+  # Command-line args.
+  parser = argparse.ArgumentParser()
+  parser.add_argument('-suite', action="store", type=str, default='quick',
+                      choices=sorted(SUITES))
+  parser.add_argument('-filter', action="store", type=str, default='')
+  parser.add_argument('-output', action="store", type=str, default='')
+  parser.add_argument('-baseline', action="store", type=str, default='')
+  parser.add_argument('-tolerance', action="store", type=float, default=0.2)
+  parser.add_argument('-no_memory', action="store_true")
+  args = parser.parse_args(argv)
+
+  cases = [case for case in SUITES[args.suite]
+           if args.filter in CaseName(*case)]
+  results = RunSuite(cases, memory=not args.no_memory, log=sys.stdout)
+  if args.output:
+    with open(args.output, 'w') as output:
+      json.dump(results, output, indent=2, sort_keys=True)
+  if args.baseline:
+    with open(args.baseline) as baseline_file:
+      baseline = json.load(baseline_file)
+    regressions = Compare(results, baseline, tolerance=args.tolerance)
+    for regression in regressions:
+      sys.stdout.write('REGRESSION %s\n' % regression)
+    if regressions:
+      return 1
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(main(sys.argv[1:]))
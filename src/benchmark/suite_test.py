@@ -0,0 +1,41 @@
+import unittest
+
+import src.benchmark.suite as suite
+
+
+class TestBenchmarkSuite(unittest.TestCase):
+  """Test cases for the benchmark suite."""
+
+  def test_RunCase_AllWorkloads(self):
+    """Every workload reports its metrics."""
+    cases = [
+        ('matching', dict(depth=5, crossing_ratio=0.5, num_orders=50)),
+        ('history', dict(num_trades=1000, limit=25, candle_size=1,
+                         num_queries=5)),
+        ('simulation', dict(num_agents=20, timesteps=3)),
+    ]
+    results = suite.RunSuite(cases)
+    self.assertEqual(3, len(results['cases']))
+    for result in results['cases'].values():
+      self.assertGreater(result['ops'], 0)
+      self.assertGreater(result['ops_per_sec'], 0)
+      self.assertLessEqual(result['p50_us'], result['p99_us'])
+      self.assertGreater(result['peak_memory_mb'], 0)
+
+  def test_CaseName_Unique(self):
+    """Every case in a suite has its own name."""
+    for cases in suite.SUITES.values():
+      names = [suite.CaseName(*case) for case in cases]
+      self.assertEqual(len(names), len(set(names)))
+
+  def test_Compare(self):
+    """Only slowdowns beyond the tolerance are regressions."""
+    baseline = {'cases': {'a': {'ops_per_sec': 100, 'p99_us': 10},
+                          'b': {'ops_per_sec': 100, 'p99_us': 10}}}
+    results = {'cases': {'a': {'ops_per_sec': 90, 'p99_us': 11},
+                         'b': {'ops_per_sec': 50, 'p99_us': 20},
+                         'c': {'ops_per_sec': 1, 'p99_us': 1000}}}
+    regressions = suite.Compare(results, baseline, tolerance=0.2)
+    self.assertEqual(2, len(regressions))
+    self.assertTrue(all(regression.startswith('b:')
+                        for regression in regressions))
@@ -0,0 +1,141 @@
+"""Seeded workloads for benchmarking the exchange and the simulation.
+
+Every workload returns (number of operations, latencies in seconds, total
+seconds). The latencies are per operation where each operation is timed,
+or per timestep for whole simulations.
+"""
+
+import time
+
+import numpy as np
+
+import src.model.asset as asset
+import src.model.environment.environment as env
+import src.model.environment.environment_time as env_time
+import src.model.market.simulated_exchange as sim_exchange
+import src.model.market.trade_history as trade_history
+import src.model.trader.strategies.strategies as strategies
+import src.model.wallet as wallet
+
+
+# Price around which benchmark books are built.
+MID_PRICE = 1000
+# Funds of benchmark traders, large enough to never run out.
+UNLIMITED_FUNDS = {asset.Symbols.USD: 1e15, asset.Symbols.BTC: 1e12}
+
+
+def _NewExchange(history, start_time=0):
+  """Creates an exchange trading BTC with the given history."""
+  time_obj = env_time.IntegerTime(start_time=start_time, time_unit=1)
+  return sim_exchange.SimulatedExchange(
+      time=time_obj, symbols=[asset.Symbols.BTC],
+      history={asset.Symbols.BTC: history})
+
+
+def OrderMatching(depth, crossing_ratio, num_orders, seed=0):
+  """Submits limit orders to a book with the given number of price levels.
+
+  Both sides of the book are filled with depth price levels around
+  MID_PRICE. The resting orders are large, so crossing orders never use up a
+  level and the depth stays the same.
+
+  Args:
+    depth: Number of price levels on each side of the book.
+    crossing_ratio: Fraction of orders that cross the spread and trade.
+      Other orders rest at a random level on their side of the book.
+    num_orders: Number of timed orders.
+    seed: (optional) Seed of the orders.
+  """
+  exchange = _NewExchange([(-1, MID_PRICE, -1)])
+  buyer = wallet.Wallet(dict(UNLIMITED_FUNDS))
+  seller = wallet.Wallet(dict(UNLIMITED_FUNDS))
+  for level in range(1, depth + 1):
+    exchange.Buy(asset.Symbols.BTC, 1e6, buyer, MID_PRICE - level)
+    exchange.Sell(asset.Symbols.BTC, 1e6, seller, MID_PRICE + level)
+  rng = np.random.default_rng(seed)
+  buys = rng.random(num_orders) < 0.5
+  crossing = rng.random(num_orders) < crossing_ratio
+  levels = rng.integers(1, depth + 1, size=num_orders)
+  latencies = np.empty(num_orders)
+  start = time.perf_counter()
+  for i in range(num_orders):
+    if buys[i]:
+      price = MID_PRICE + 1 if crossing[i] else MID_PRICE - int(levels[i])
+      order_start = time.perf_counter()
+      exchange.Buy(asset.Symbols.BTC, 1, buyer, price)
+    else:
+      price = MID_PRICE - 1 if crossing[i] else MID_PRICE + int(levels[i])
+      order_start = time.perf_counter()
+      exchange.Sell(asset.Symbols.BTC, 1, seller, price)
+    latencies[i] = time.perf_counter() - order_start
+  return num_orders, latencies, time.perf_counter() - start
+
+
+def HistoryQueries(num_trades, limit, candle_size, num_queries, seed=0):
+  """Queries candles of a long trade history.
+
+  The history is a random walk with 10 trades per time unit. The first
+  query builds the candles, later queries are served from them.
+
+  Args:
+    num_trades: Number of trades in the history.
+    limit: Number of candles per query. All candles if None.
+    candle_size: Number of time units per candle.
+    num_queries: Number of timed queries. Time steps between queries.
+    seed: (optional) Seed of the prices.
+  """
+  rng = np.random.default_rng(seed)
+  timestamps = np.arange(num_trades) // 10
+  prices = np.maximum(
+      MID_PRICE + np.cumsum(rng.integers(-1, 2, size=num_trades)), 1)
+  amounts = rng.integers(1, 10, size=num_trades)
+  history = trade_history.TradeHistory.FromArrays(timestamps, prices, amounts)
+  exchange = _NewExchange(history, start_time=int(timestamps[-1]) + 1)
+  latencies = np.empty(num_queries)
+  start = time.perf_counter()
+  for i in range(num_queries):
+    query_start = time.perf_counter()
+    exchange.GetHistory(asset.Symbols.BTC, limit, candle_size)
+    latencies[i] = time.perf_counter() - query_start
+    exchange.time.Step()
+  return num_queries, latencies, time.perf_counter() - start
+
+
+def Simulation(num_agents, timesteps, vectorize=True, seed=0):
+  """Runs a simulation with the strategy distribution of run.py.
+
+  Operations are the orders placed by the agents. Latencies are per
+  timestep.
+
+  Args:
+    num_agents: Number of agents.
+    timesteps: Number of timed timesteps.
+    vectorize: (optional) Invoke strategies for cohorts of agents.
+    seed: (optional) Seed of the environment.
+  """
+  exchange = _NewExchange([(-1, 20, -1)])
+  sim_env = env.TradingEnvironment(
+      time=exchange.time, exchanges=[exchange], vectorize=vectorize,
+      seed=seed)
+  sim_env.GenerateAgents(
+      num_agents,
+      {strategies.RandomStrategy(): 0.6,
+       strategies.BandedMomentumStrategy(): 0.1,
+       strategies.BandedMomentumStrategy(momentum=False): 0.3},
+      {asset.Symbols.USD: 1000, asset.Symbols.BTC: 10})
+  latencies = np.empty(timesteps)
+  start = time.perf_counter()
+  for i in range(timesteps):
+    step_start = time.perf_counter()
+    sim_env.Run(timesteps=1)
+    latencies[i] = time.perf_counter() - step_start
+  # Order ids count the orders placed on the exchange.
+  return exchange.trade_id, latencies, time.perf_counter() - start
+
+
+# Workloads by name.
+WORKLOADS = {
+    'matching': OrderMatching,
+    'history': HistoryQueries,
+    'simulation': Simulation,
+}
@@ -0,0 +1,141 @@
+"""Checkpoints of the complete state of a trading environment."""
+
+import gc
+import os
+import pickle
+import random
+
+import numpy as np
+
+import src.model.market.tape as tape
+import src.util.events as events
+
+
+# Version of the checkpoint format.
+CHECKPOINT_VERSION = 1
+
+
+# Classes that append records to files. The files are not part of the
+# checkpoint, only their paths and the number of records written.
+_FILE_WRITERS = (tape.TapeWriter, events.BinaryConsumer)
+
+# Bytes copied at a time when branching a file.
+_COPY_CHUNK_SIZE = 1 << 20
+
+
+class _Pickler(pickle.Pickler):
+  """Pickler that stores file writers by reference."""
+
+  def persistent_id(self, obj):
+    if type(obj) in _FILE_WRITERS:
+      return type(obj), obj.__getstate__()
+    return None
+
+
+class _Unpickler(pickle.Unpickler):
+  """Unpickler that reopens file writers, optionally on a branch's files."""
+
+  def __init__(self, checkpoint, branch=None):
+    pickle.Unpickler.__init__(self, checkpoint)
+    self.branch = branch
+    # Writers by class and path. Persistent ids are not memoized, so every
+    # reference to a writer is loaded here.
+    self._writers = {}
+
+  def persistent_load(self, pid):
+    writer_class, state = pid
+    key = writer_class, state['path']
+    if key not in self._writers:
+      self._writers[key] = self._LoadWriter(writer_class, state)
+    return self._writers[key]
+
+  def _LoadWriter(self, writer_class, state):
+    """Reopen a writer, on a copy of its file for a branch."""
+    if self.branch is not None:
+      path = BranchPath(state['path'], self.branch)
+      _CopyPrefix(state['path'], path,
+                  state['num_records'] * writer_class.dtype.itemsize)
+      state = dict(state, path=path)
+    writer = writer_class.__new__(writer_class)
+    writer.__setstate__(state)
+    return writer
+
+
+def BranchPath(path, branch):
+  """Gets the path of a branch's copy of a file, like btc.<branch>.tape."""
+  root, extension = os.path.splitext(path)
+  return '%s.%s%s' % (root, branch, extension)
+
+
+def _CopyPrefix(source, destination, size):
+  """Copy the first size bytes of a file."""
+  with open(source, 'rb') as source_file:
+    with open(destination, 'wb') as destination_file:
+      while size > 0:
+        chunk = source_file.read(min(size, _COPY_CHUNK_SIZE))
+        if not chunk:
+          raise ValueError('File %s is shorter than when it was saved.'
+                           % source)
+        destination_file.write(chunk)
+        size -= len(chunk)
+
+
+def Save(environment, path):
+  """Write the state of an environment to a checkpoint file.
+
+  The checkpoint contains the time, the exchanges with their order books,
+  histories and pools, the agents with their wallets and strategies, and
+  the state of all random number generators. Tapes and event files are
+  flushed and referenced by path and number of records. The file is replaced
+  atomically, so a crash while saving keeps the previous checkpoint.
+
+  Args:
+    environment: TradingEnvironment to save.
+    path: Path of the checkpoint file.
+  """
+  state = {
+      'version': CHECKPOINT_VERSION,
+      'environment': environment,
+      'random_state': random.getstate(),
+      'np_random_state': np.random.get_state(),
+  }
+  temp_path = path + '.tmp'
+  with open(temp_path, 'wb') as checkpoint:
+    _Pickler(checkpoint, pickle.HIGHEST_PROTOCOL).dump(state)
+  os.replace(temp_path, path)
+
+
+def Load(path, branch=None):
+  """Restore an environment from a checkpoint file.
+
+  Every call returns an independent copy of the environment, so several
+  scenarios can be run from the same checkpoint. The global random number
+  generators are restored to their state at the time of the checkpoint.
+
+  Tapes and event files are truncated to the records written when the
+  checkpoint was saved and appended to from there. Scenarios that run side
+  by side need a branch name each: a branch writes to copies of the files at
+  BranchPath, and the original files are left unchanged.
+
+  Args:
+    path: Path of the checkpoint file.
+    branch: (optional) Name of the branch whose files are written.
+
+  Returns:
+    TradingEnvironment in the state it was saved in.
+  """
+  # Loading creates millions of objects. Collecting garbage in between only
+  # slows it down, since none of them are garbage.
+  gc_enabled = gc.isenabled()
+  gc.disable()
+  try:
+    with open(path, 'rb') as checkpoint:
+      state = _Unpickler(checkpoint, branch).load()
+  finally:
+    if gc_enabled:
+      gc.enable()
+  if state.get('version') != CHECKPOINT_VERSION:
+    raise ValueError('Unsupported checkpoint version %s' % state.get('version'))
+  random.setstate(state['random_state'])
+  np.random.set_state(state['np_random_state'])
+  return state['environment']
@@ -0,0 +1,123 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import src.model.asset as asset
+import src.model.environment.checkpoint as checkpoint
+import src.model.environment.environment as env
+import src.model.environment.environment_time as env_time
+import src.model.market.simulated_exchange as sim_exchange
+import src.model.market.tape as tape
+import src.model.trader.strategies.strategies as strategies
+
+
+class TestCheckpoint(unittest.TestCase):
+  """Test cases for saving and restoring environments."""
+
+  def setUp(self):
+    """Test set up. Called before each test case."""
+    self.dir = tempfile.mkdtemp()
+    self.path = os.path.join(self.dir, 'checkpoint.pkl')
+    self.tape_path = os.path.join(self.dir, 'btc.tape')
+    self.environment = self._NewEnvironment()
+
+  def _NewEnvironment(self, history_window=None):
+    """Creates an environment recording trades to a tape after 5 steps."""
+    time_obj = env_time.IntegerTime(start_time=0, time_unit=1)
+    exchange = sim_exchange.SimulatedExchange(
+        time=time_obj, symbols=[asset.Symbols.BTC],
+        history={asset.Symbols.BTC: [(-1, 20, -1)]},
+        tapes={asset.Symbols.BTC: tape.TapeWriter(self.tape_path)},
+        history_window=history_window)
+    environment = env.TradingEnvironment(
+        time=time_obj, exchanges=[exchange], vectorize=True, seed=11)
+    environment.GenerateAgents(
+        40, {strategies.RandomStrategy(): 0.5,
+             strategies.BandedMomentumStrategy(history_range=5): 0.5},
+        {asset.Symbols.USD: 1000, asset.Symbols.BTC: 10})
+    environment.Run(timesteps=5)
+    return environment
+
+  def tearDown(self):
+    """Test tear down. Called after each test case."""
+    shutil.rmtree(self.dir)
+
+  def _State(self, environment):
+    """Gets the trade history and holdings of an environment."""
+    exchange = environment.exchanges[0]
+    return (list(exchange.history[asset.Symbols.BTC]),
+            repr(exchange.GetOrderbook(asset.Symbols.BTC)),
+            environment.wallet_bank.amounts[:len(environment.wallet_bank)].tolist())
+
+  def test_Restore_ContinuesIdentically(self):
+    """A restored environment continues exactly like the original."""
+    checkpoint.Save(self.environment, self.path)
+    self.environment.Run(timesteps=5)
+    restored = checkpoint.Load(self.path)
+    self.assertEqual(5, restored.time.GetCurrentTime())
+    restored.Run(timesteps=5)
+    self.assertEqual(self._State(self.environment), self._State(restored))
+
+  def test_Restore_IndependentCopies(self):
+    """Scenarios branched from one checkpoint do not share state."""
+    checkpoint.Save(self.environment, self.path)
+    first = checkpoint.Load(self.path)
+    second = checkpoint.Load(self.path)
+    first.Run(timesteps=3)
+    self.assertEqual(5, second.time.GetCurrentTime())
+    self.assertEqual(self._State(self.environment), self._State(second))
+    # Restored agents share wallets with the restored bank.
+    agent = second.agents[0]
+    agent.wallet.AddAmount(asset.Symbols.USD, 1)
+    self.assertIs(second.wallet_bank, agent.wallet.bank)
+
+  def test_Restore_ReopensTape(self):
+    """Trades after restoring continue the tape where it was saved."""
+    checkpoint.Save(self.environment, self.path)
+    self.environment.Run(timesteps=5)
+    self.environment.exchanges[0].tapes[asset.Symbols.BTC].Flush()
+    restored = checkpoint.Load(self.path)
+    restored.Run(timesteps=5)
+    restored.exchanges[0].tapes[asset.Symbols.BTC].Close()
+    history = tape.LoadHistory(self.tape_path)
+    self.assertEqual(
+        restored.exchanges[0].GetNumTrades(asset.Symbols.BTC) - 1,
+        len(history))
+    self.assertEqual(
+        list(restored.exchanges[0].history[asset.Symbols.BTC])[1:],
+        list(history))
+
+  def test_Restore_Branches(self):
+    """Branches write their own tapes and leave the original unchanged."""
+    checkpoint.Save(self.environment, self.path)
+    self.environment.exchanges[0].tapes[asset.Symbols.BTC].Close()
+    num_saved = len(tape.ReadTape(self.tape_path))
+    first = checkpoint.Load(self.path, branch='first')
+    second = checkpoint.Load(self.path, branch='second')
+    first.Run(timesteps=5)
+    second.Run(timesteps=3)
+    for branch, environment in (('first', first), ('second', second)):
+      exchange = environment.exchanges[0]
+      exchange.tapes[asset.Symbols.BTC].Close()
+      branch_path = checkpoint.BranchPath(self.tape_path, branch)
+      self.assertEqual(os.path.join(self.dir, 'btc.%s.tape' % branch),
+                       branch_path)
+      self.assertEqual(list(exchange.history[asset.Symbols.BTC])[1:],
+                       list(tape.LoadHistory(branch_path)))
+    self.assertEqual(num_saved, len(tape.ReadTape(self.tape_path)))
+
+  def test_Restore_HistoryWindow(self):
+    """Histories reading old trades from the tape are restored."""
+    self.environment.exchanges[0].tapes[asset.Symbols.BTC].Close()
+    os.remove(self.tape_path)
+    environment = self._NewEnvironment(history_window=4)
+    checkpoint.Save(environment, self.path)
+    environment.Run(timesteps=5)
+    restored = checkpoint.Load(self.path, branch='restored')
+    history = restored.exchanges[0].history[asset.Symbols.BTC]
+    self.assertIs(restored.exchanges[0].tapes[asset.Symbols.BTC],
+                  history.writer)
+    restored.Run(timesteps=5)
+    self.assertEqual(self._State(environment), self._State(restored))
+
@@ -1,8 +1,28 @@
 """Environment for trading agents."""
 
+import collections
+import time
+
+import numpy as np
+
+import src.model.asset as asset
 import src.model.environment.environment_time as env_time
+import src.model.environment.market_data as market_data
+import src.model.environment.scheduler as scheduler
 import src.model.trader.experimentalagent as exp_agent
 import src.model.wallet as wallet
+import src.util.enum as enum
+import src.util.events as events
+import src.util.rng as rng
+
+
+# How individual agents are chosen to trade.
+SchedulingMode = enum.enum(
+  # Every agent trades once per timestep, in the order they were generated.
+  ROUND_ROBIN='round_robin',
+  # Agents trade at random times with the arrival rate of their strategy.
+  EVENT='event',
+)
 
 
 class TradingEnvironment(object):
@@ -11,7 +31,28 @@ class TradingEnvironment(object):
   inf = float('inf')
 
   def __init__(self, *args, **kwargs):
-    """Initialize the trading environment."""
+    """Initialize the trading environment.
+
+    Args:
+      time: Time reference for the environment.
+      exchanges: Exchanges where agents trade.
+      vectorize: (optional) Invoke strategies that support it for all their
+        agents at once instead of one agent at a time.
+      seed: (optional) Seed of the agents' random number streams. Runs with
+        the same seed are reproducible.
+      scheduling: (optional) SchedulingMode of individual agents. Defaults to
+        round robin.
+      profiler: (optional) Profiler timing the phases of each timestep. It is
+        also attached to exchanges that have no profiler.
+      events: (optional) events.EventBuffer receiving a step event at the
+        start of each timestep. It is also attached to exchanges that have
+        no event buffer or only the buffer created for their logger. If only
+        a logger is given, a buffer logging the events at the end of each
+        timestep is created.
+      metrics: (optional) metrics.MetricsRecorder sampling the simulation at
+        the end of each timestep.
+      logger: (optional) Logger for the simulation.
+    """
     # Time definition for the environment.
     self.time = kwargs['time']
     # Markets in the environment.
@@ -20,13 +61,133 @@ class TradingEnvironment(object):
     for exchange in self.exchanges:
       # exchange.time = self.time  # cyclic dep?
       pass
+    # Indicators shared by the agents' strategies.
+    self.market_data = market_data.MarketData(self.time)
     # Agents in the environment.
     self.agents = []
+    # Holdings of all generated agents.
+    self.wallet_bank = wallet.WalletBank(asset.GetAllSymbols())
+    # (strategy class name, start, end) of each range of wallets in the bank.
+    self.wallet_groups = []
+    # Agents that trade one at a time.
+    self.individual_agents = []
+    # Strategies invoked for a whole cohort of agents at once, mapped to the
+    # wallets of the cohort.
+    if 'vectorize' in kwargs:
+      self.vectorize = kwargs['vectorize']
+    else:
+      self.vectorize = False
+    self.cohorts = collections.OrderedDict()
+    # Every agent and cohort draws from its own random number stream.
+    self.rng_streams = rng.RngStreams(kwargs.get('seed'))
+    # Strategy -> numpy.random.Generator of its cohort.
+    self.cohort_rngs = {}
+    # Scheduling of individual agents.
+    self.scheduling = kwargs.get('scheduling', SchedulingMode.ROUND_ROBIN)
+    if self.scheduling not in (SchedulingMode.ROUND_ROBIN,
+                               SchedulingMode.EVENT):
+      raise ValueError('Unknown scheduling mode \'%s\'' % self.scheduling)
+    self.scheduler = scheduler.EventScheduler(
+        self.time, self.rng_streams.GetRandom(rng.SCHEDULER_STREAM, 0))
     # Logging.
     if 'logger' in kwargs:
       self.logger = kwargs['logger']
     else:
       self.logger = None
+    # Structured events, formatted off the hot path.
+    self.events = kwargs.get('events')
+    if self.events is None and self.logger:
+      self.events = events.EventBuffer(
+          consumers=[events.LogConsumer(self.logger)])
+    if self.events:
+      for exchange in self.exchanges:
+        if getattr(exchange, 'events_from_logger', False):
+          # Log the exchange's events in order with the steps.
+          exchange.events.Flush()
+          exchange.events = None
+          exchange.events_from_logger = False
+        if getattr(exchange, 'events', None) is None:
+          exchange.events = self.events
+    # Instrumentation.
+    self.profiler = kwargs.get('profiler')
+    if self.profiler:
+      for exchange in self.exchanges:
+        if getattr(exchange, 'profiler', None) is None:
+          exchange.profiler = self.profiler
+    # Metrics sampled while the simulation runs.
+    self.metrics = kwargs.get('metrics')
+
+  def __getstate__(self):
+    """Store generated agents as arrays when pickled.
+
+    Pickling millions of agent objects one by one is slow, so agents created
+    by GenerateAgents are stored as arrays of strategy and wallet indices.
+    """
+    state = self.__dict__.copy()
+    if not all(self._IsGenerated(agent) for agent in self.agents):
+      return state
+    strategies = []
+    strategy_indices = {}
+    agent_strategies = np.empty(len(self.agents), dtype=np.int32)
+    # Position of each agent's random number stream, -1 for agents without.
+    agent_rng_counts = np.full(len(self.agents), -1, dtype=np.int64)
+    positions = {}
+    for i, agent in enumerate(self.agents):
+      if id(agent.strategy) not in strategy_indices:
+        strategy_indices[id(agent.strategy)] = len(strategies)
+        strategies.append(agent.strategy)
+      agent_strategies[i] = strategy_indices[id(agent.strategy)]
+      if agent.rng is not None:
+        agent_rng_counts[i] = agent.rng.count
+      positions[id(agent)] = i
+    state['agents'] = {
+        'strategies': strategies,
+        'strategy_indices': agent_strategies,
+        'wallet_indices': np.array(
+            [agent.wallet.index for agent in self.agents], dtype=np.int64),
+        'rng_counts': agent_rng_counts,
+        'individual': np.array(
+            [positions[id(agent)] for agent in self.individual_agents],
+            dtype=np.int64),
+    }
+    del state['individual_agents']
+    state['cohorts'] = collections.OrderedDict(
+        (strategy, np.array([wallet.index for wallet in wallets],
+                            dtype=np.int64))
+        for strategy, wallets in self.cohorts.items())
+    return state
+
+  def __setstate__(self, state):
+    """Recreate agents stored as arrays."""
+    self.__dict__.update(state)
+    if 'individual_agents' in state:
+      return
+    agents = state['agents']
+    strategies = agents['strategies']
+    self.agents = [
+        exp_agent.ExperimentalAgent(
+            strategies[strategy_index],
+            initialWallet=wallet.BankWallet(self.wallet_bank, wallet_index),
+            initialExchanges=self.exchanges,
+            rng=self.rng_streams.GetStream(rng.AGENT_STREAM, i, rng_count)
+            if rng_count >= 0 else None)
+        for i, (strategy_index, wallet_index, rng_count) in enumerate(zip(
+            agents['strategy_indices'].tolist(),
+            agents['wallet_indices'].tolist(),
+            agents['rng_counts'].tolist()))]
+    self.individual_agents = [
+        self.agents[i] for i in agents['individual'].tolist()]
+    self.cohorts = collections.OrderedDict(
+        (strategy, [wallet.BankWallet(self.wallet_bank, i)
+                    for i in indices.tolist()])
+        for strategy, indices in state['cohorts'].items())
+
+  def _IsGenerated(self, agent):
+    """Whether an agent is like the agents created by GenerateAgents."""
+    return (type(agent) is exp_agent.ExperimentalAgent and
+            agent.exchanges is self.exchanges and
+            isinstance(agent.wallet, wallet.BankWallet) and
+            agent.wallet.bank is self.wallet_bank)
 
   def GetTime(self):
     """Return time object used in this environment."""
@@ -46,11 +207,34 @@ class TradingEnvironment(object):
     """
     # Create agents using the strategy distribution.
     for strategy, ratio in strategy_distribution.items():
-      for _ in range(int(ratio * num_agents)):
-        trading_account = wallet.Wallet(initial_funds)
+      strategy.SetMarketData(self.market_data)
+      start = len(self.wallet_bank)
+      trading_accounts = self.wallet_bank.AddWallets(
+          int(ratio * num_agents), initial_funds)
+      self.wallet_groups.append(
+          (strategy.__class__.__name__, start, len(self.wallet_bank)))
+      in_cohort = self.vectorize and strategy.supports_cohorts
+      if in_cohort and strategy not in self.cohorts:
+        self.cohort_rngs[strategy] = self.rng_streams.GetGenerator(
+            rng.COHORT_STREAM, len(self.cohorts))
+        self.cohorts[strategy] = []
+      for trading_account in trading_accounts:
+        if in_cohort:
+          # Agents in a cohort draw from the cohort's generator.
+          agent_rng = None
+        else:
+          agent_rng = self.rng_streams.GetStream(
+              rng.AGENT_STREAM, len(self.agents))
         agent = exp_agent.ExperimentalAgent(
-            strategy, initialWallet=trading_account, initialExchanges=self.exchanges)
+            strategy, initialWallet=trading_account,
+            initialExchanges=self.exchanges, rng=agent_rng)
         self.agents.append(agent)
+        if in_cohort:
+          self.cohorts[strategy].append(trading_account)
+        else:
+          self.individual_agents.append(agent)
+          if self.scheduling == SchedulingMode.EVENT:
+            self.scheduler.Add(len(self.agents) - 1, strategy.arrival_rate)
       # logging
       if self.logger:
         self.logger.info('Generated %d agents with %s.' % (
@@ -64,16 +248,53 @@ class TradingEnvironment(object):
     """
     steps_taken = 0
     while steps_taken < timesteps:
-      # logging
-      if self.logger:
-        self.logger.debug('TIMESTEP %d' % steps_taken)
-        for exchange in self.exchanges:
-          self.logger.debug('  Stock prices on %s:' % exchange.__class__.__name__)
-          for symbol in exchange.GetSymbols():
-            self.logger.debug('    %s %d' % (symbol, exchange.GetPrice(symbol)))
+      if self.events:
+        self.events.Emit(events.STEP, self.time.GetCurrentTime(), None,
+                         amount=steps_taken)
+      profiler = self.profiler
+      if profiler:
+        step_start = time.perf_counter()
+      # Cohorts of agents trade.
+      for strategy, wallets in self.cohorts.items():
+        if profiler:
+          start = time.perf_counter()
+        strategy.InvokeCohort(
+            self.exchanges, wallets, self.cohort_rngs[strategy])
+        if profiler:
+          profiler.Record(
+              'strategy.%s.cohort' % strategy.__class__.__name__, start)
       # Agents trade.
-      for agent in self.agents:
-        agent.Trade()
+      if self.scheduling == SchedulingMode.EVENT:
+        self.scheduler.RunUntil(
+            self.time.TimeDelta(self.time.GetCurrentTime(), 1), self.agents,
+            profiler)
+      elif profiler:
+        for agent in self.individual_agents:
+          start = time.perf_counter()
+          agent.Trade()
+          profiler.Record(
+              'strategy.%s' % agent.strategy.__class__.__name__, start)
+      else:
+        for agent in self.individual_agents:
+          agent.Trade()
+      # Exchanges finish the timestep.
+      for exchange in self.exchanges:
+        if profiler:
+          start = time.perf_counter()
+        exchange.EndTimestep()
+        if profiler:
+          profiler.Record('exchange.end_timestep', start)
+      if self.events:
+        self.events.Flush()
+      if self.metrics:
+        if profiler:
+          start = time.perf_counter()
+        self.metrics.Sample(self)
+        if profiler:
+          profiler.Record('environment.metrics', start)
+      if profiler:
+        profiler.Record('environment.step', step_start)
+        profiler.EndStep(self.time.GetCurrentTime())
       # Update timestep.
       self.time.Step()
       steps_taken += 1
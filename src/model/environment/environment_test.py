@@ -0,0 +1,127 @@
+import collections
+import logging
+import random
+import unittest
+
+import src.model.asset as asset
+import src.model.environment.environment as env
+import src.model.environment.environment_time as env_time
+import src.model.market.simulated_exchange as sim_exchange
+import src.model.trader.strategies.strategies as strategies
+import src.util.events as events
+
+
+class _ListHandler(logging.Handler):
+  """Collects the formatted log messages."""
+
+  def __init__(self):
+    logging.Handler.__init__(self)
+    self.messages = []
+
+  def emit(self, record):
+    self.messages.append(record.getMessage())
+
+
+class TestTradingEnvironment(unittest.TestCase):
+  """Test cases for the trading environment."""
+
+  def _Run(self, seed, vectorize=False,
+           scheduling=env.SchedulingMode.ROUND_ROBIN, event_buffer=None,
+           logger=None):
+    """Runs a small simulation and returns its trade history."""
+    time_obj = env_time.IntegerTime(start_time=0, time_unit=1)
+    exchange = sim_exchange.SimulatedExchange(
+        time=time_obj, symbols=[asset.Symbols.BTC],
+        history={asset.Symbols.BTC: [(-1, 20, -1)]}, logger=logger)
+    environment = env.TradingEnvironment(
+        time=time_obj, exchanges=[exchange], vectorize=vectorize, seed=seed,
+        scheduling=scheduling, events=event_buffer, logger=logger)
+    environment.GenerateAgents(
+        50, {strategies.RandomStrategy(): 0.6,
+             strategies.BandedMomentumStrategy(history_range=5): 0.4},
+        {asset.Symbols.USD: 1000, asset.Symbols.BTC: 10})
+    environment.Run(timesteps=10)
+    return list(exchange.history[asset.Symbols.BTC])
+
+  def test_Run_ReproducibleFromSeed(self):
+    """Runs with the same seed are identical, whatever the global state."""
+    for vectorize in (False, True):
+      random.seed(1)
+      first = self._Run(seed=3, vectorize=vectorize)
+      random.seed(2)
+      self.assertEqual(first, self._Run(seed=3, vectorize=vectorize))
+      self.assertGreater(len(first), 1)
+      self.assertNotEqual(first, self._Run(seed=4, vectorize=vectorize))
+
+  def test_Run_EventScheduling(self):
+    """Agents scheduled by events trade reproducibly."""
+    first = self._Run(seed=3, scheduling=env.SchedulingMode.EVENT)
+    self.assertGreater(len(first), 1)
+    self.assertEqual(
+        first, self._Run(seed=3, scheduling=env.SchedulingMode.EVENT))
+    self.assertNotEqual(first, self._Run(seed=3))
+
+  def test_Run_EventScheduling_IdleAgentsRarelyInvoked(self):
+    """Agents without funds are rarely woken when scheduled by events."""
+    invocations = collections.Counter()
+
+    class CountingStrategy(strategies.RandomStrategy):
+
+      def Invoke(self, exchanges, wallet, rng=None):
+        invocations[id(wallet)] += 1
+        return strategies.RandomStrategy.Invoke(self, exchanges, wallet, rng)
+
+    time_obj = env_time.IntegerTime(start_time=0, time_unit=1)
+    exchange = sim_exchange.SimulatedExchange(
+        time=time_obj, symbols=[asset.Symbols.BTC],
+        history={asset.Symbols.BTC: [(-1, 20, -1)]})
+    environment = env.TradingEnvironment(
+        time=time_obj, exchanges=[exchange], seed=3,
+        scheduling=env.SchedulingMode.EVENT)
+    environment.GenerateAgents(
+        20, {CountingStrategy(): 1.0},
+        {asset.Symbols.USD: 1000, asset.Symbols.BTC: 10})
+    environment.GenerateAgents(
+        20, {CountingStrategy(): 1.0},
+        {asset.Symbols.USD: 0, asset.Symbols.BTC: 0})
+    environment.Run(timesteps=100)
+    funded = sum(invocations[id(agent.wallet)]
+                 for agent in environment.agents[:20])
+    idle = sum(invocations[id(agent.wallet)]
+               for agent in environment.agents[20:])
+    self.assertGreater(funded, 1500)
+    self.assertLess(idle, funded / 10)
+
+  def test_Run_LoggerOnly(self):
+    """With only a logger, steps are logged before their orders and fills."""
+    logger = logging.getLogger('environment_test.logger_only')
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    handler = _ListHandler()
+    logger.addHandler(handler)
+    try:
+      history = self._Run(seed=3, logger=logger)
+    finally:
+      logger.removeHandler(handler)
+    steps = [m for m in handler.messages if m.startswith('TIMESTEP')]
+    self.assertEqual(['TIMESTEP %d' % i for i in range(10)], steps)
+    # Orders of a step are logged after the step.
+    first_step = handler.messages.index('TIMESTEP 0')
+    self.assertFalse([m for m in handler.messages[:first_step]
+                      if m.startswith(('Placed', 'Trade'))])
+    # Each step is followed by the last price of the previous steps.
+    step = handler.messages.index('TIMESTEP 9')
+    last_price = [price for t, price, _ in history if t < 9][-1]
+    self.assertEqual('    %s %s' % (asset.Symbols.BTC, last_price),
+                     handler.messages[step + 1])
+    self.assertEqual(len(history) - 1, len(
+        [m for m in handler.messages if m.startswith('Trade executed')]))
+
+  def test_Run_EventsSharedWithExchanges(self):
+    """Steps and the exchange's fills go to the environment's events."""
+    metrics = events.MetricsConsumer()
+    history = self._Run(
+        seed=3, event_buffer=events.EventBuffer(consumers=[metrics]))
+    self.assertEqual(10, metrics.counts[events.STEP])
+    # The initial history entry is not a fill.
+    self.assertEqual(len(history) - 1, metrics.num_fills[asset.Symbols.BTC])
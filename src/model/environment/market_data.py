@@ -0,0 +1,213 @@
+"""Market data service that shares derived signals between agents."""
+
+import numpy as np
+
+import src.model.market.candles as candles
+import src.util.rolling as rolling
+
+
+class MarketData(object):
+  """Memoizes indicators computed from exchange candles.
+
+  Every indicator is computed at most once per (exchange, symbol, indicator,
+  window, candle size) until the time steps or a new trade is executed for
+  the symbol. Agents on the same market therefore share one computation per
+  tick instead of each rebuilding it from the history.
+  """
+
+  def __init__(self, time):
+    """Initialize the service.
+
+    Args:
+      time: Time reference of the environment.
+    """
+    self.time = time
+    # Time the cached values were computed at.
+    self.cache_time = None
+    # (exchange, symbol, indicator, window, candle_size) ->
+    # (number of trades, value).
+    self.cache = {}
+    # (exchange, symbol, candle_size) -> _CandleFeed.
+    self.feeds = {}
+
+  def _Get(self, compute, exchange, symbol, window, candle_size):
+    """Gets a memoized indicator value, computing it if needed.
+
+    Args:
+      compute: Function computing the indicator from a list of OHLCV candles.
+      exchange: Exchange the asset is traded on.
+      symbol: Name of the asset.
+      window: Number of candles the indicator is computed over.
+      candle_size: Number of time units per candle.
+
+    Returns:
+      The indicator value.
+    """
+    now = self.time.GetCurrentTime()
+    if now != self.cache_time:
+      # Time stepped. Drop all cached values.
+      self.cache.clear()
+      self.cache_time = now
+    key = (exchange, symbol, compute, window, candle_size)
+    num_trades = exchange.GetNumTrades(symbol)
+    cached = self.cache.get(key)
+    if cached is not None and cached[0] == num_trades:
+      return cached[1]
+    ohlcv = exchange.GetCandles(symbol, window, candle_size)
+    value = compute(ohlcv)
+    self.cache[key] = (num_trades, value)
+    return value
+
+  def SMA(self, exchange, symbol, window, candle_size=1):
+    """Simple moving average of the closing prices."""
+    return self._Get(_SMA, exchange, symbol, window, candle_size)
+
+  def EMA(self, exchange, symbol, window, candle_size=1):
+    """Exponential moving average of the closing prices in the window.
+
+    Uses a smoothing factor of 2 / (window + 1), starting at the oldest
+    closing price in the window.
+    """
+    return self._Get(_EMA, exchange, symbol, window, candle_size)
+
+  def Volatility(self, exchange, symbol, window, candle_size=1):
+    """Standard deviation of the log returns between closing prices."""
+    return self._Get(_Volatility, exchange, symbol, window, candle_size)
+
+  def VWAP(self, exchange, symbol, window, candle_size=1):
+    """Volume-weighted average of the candles' typical prices."""
+    return self._Get(_VWAP, exchange, symbol, window, candle_size)
+
+  def Rolling(self, exchange, symbol, window, candle_size=1):
+    """Rolling statistics of the closing prices of completed candles.
+
+    The first call subscribes to the closing prices of the asset. After that,
+    the window is updated with the candles completed since the last call, so
+    the cost per call does not depend on the window length. Windows of the
+    same size are shared by all callers.
+
+    Args:
+      exchange: Exchange the asset is traded on.
+      symbol: Name of the asset.
+      window: Number of candles in the window.
+      candle_size: Number of time units per candle.
+
+    Returns:
+      RollingWindow of the latest closing prices, excluding the current
+      candle, which can still change.
+    """
+    key = (exchange, symbol, candle_size)
+    feed = self.feeds.get(key)
+    if feed is None:
+      feed = _CandleFeed(exchange, symbol, candle_size,
+                         self.time.TimeDelta(0, candle_size))
+      self.feeds[key] = feed
+    feed.Update(self.time.GetCurrentTime())
+    return feed.GetWindow(window)
+
+
+class _CandleFeed(object):
+  """Pushes closing prices of completed candles to rolling windows."""
+
+  def __init__(self, exchange, symbol, candle_size, length):
+    """Initialize the feed.
+
+    Args:
+      exchange: Exchange the asset is traded on.
+      symbol: Name of the asset.
+      candle_size: Number of time units per candle.
+      length: Length of one candle in time units of the exchange's time.
+    """
+    self.exchange = exchange
+    self.symbol = symbol
+    self.candle_size = candle_size
+    self.length = length
+    # Window size -> RollingWindow.
+    self.windows = {}
+    # Time of the last update and timestamp of the last pushed candle.
+    self.time = None
+    self.last_timestamp = None
+
+  def _GetCompletedCandles(self, limit):
+    """Gets up to limit completed candles, oldest first."""
+    # The last candle contains the current time and is not completed yet.
+    return self.exchange.GetCandles(
+        self.symbol, limit + 1, self.candle_size)[:-1]
+
+  def Update(self, now):
+    """Push the candles completed since the last update to all windows."""
+    if now == self.time:
+      return
+    self.time = now
+    if not self.windows:
+      return
+    if self.last_timestamp is None:
+      limit = max(self.windows)
+    else:
+      limit = int((now - self.last_timestamp) // self.length) + 1
+    for candle in self._GetCompletedCandles(limit):
+      timestamp = candle[candles.TIMESTAMP]
+      if self.last_timestamp is not None and timestamp <= self.last_timestamp:
+        continue
+      for window in self.windows.values():
+        window.Push(candle[candles.CLOSE])
+      self.last_timestamp = timestamp
+
+  def GetWindow(self, size):
+    """Gets the window of the given size, filling it on first use."""
+    window = self.windows.get(size)
+    if window is None:
+      window = rolling.RollingWindow(size)
+      completed = self._GetCompletedCandles(size)
+      for candle in completed:
+        window.Push(candle[candles.CLOSE])
+      if completed:
+        # The feed is up to date, so this is also the latest pushed candle.
+        self.last_timestamp = completed[-1][candles.TIMESTAMP]
+      self.windows[size] = window
+    return window
+
+
+def _Closes(ohlcv):
+  """Closing prices of the candles as an array."""
+  return np.array([candle[candles.CLOSE] for candle in ohlcv], dtype=float)
+
+
+def _SMA(ohlcv):
+  """Computes the simple moving average of the candles."""
+  if not ohlcv:
+    return None
+  return _Closes(ohlcv).mean()
+
+
+def _EMA(ohlcv):
+  """Computes the exponential moving average of the candles."""
+  if not ohlcv:
+    return None
+  alpha = 2.0 / (len(ohlcv) + 1)
+  ema = ohlcv[0][candles.CLOSE]
+  for candle in ohlcv[1:]:
+    ema += alpha * (candle[candles.CLOSE] - ema)
+  return ema
+
+
+def _Volatility(ohlcv):
+  """Computes the volatility of the candles."""
+  closes = _Closes(ohlcv)
+  closes = closes[closes > 0]
+  if len(closes) < 2:
+    return 0.0
+  return np.diff(np.log(closes)).std()
+
+
+def _VWAP(ohlcv):
+  """Computes the volume-weighted average price of the candles."""
+  if not ohlcv:
+    return None
+  candle_array = np.array(ohlcv, dtype=float)
+  volumes = np.maximum(candle_array[:, candles.VOLUME], 0)
+  if volumes.sum() <= 0:
+    return candle_array[-1, candles.CLOSE]
+  typical_prices = candle_array[
+      :, [candles.HIGH, candles.LOW, candles.CLOSE]].mean(axis=1)
+  return np.dot(typical_prices, volumes) / volumes.sum()
@@ -0,0 +1,89 @@
+import unittest
+
+import src.model.asset as asset
+import src.model.environment.environment_time as env_time
+import src.model.environment.market_data as market_data
+import src.model.market.simulated_exchange as sim_exchange
+import src.model.wallet as wallet
+
+
+class TestMarketData(unittest.TestCase):
+  """Test cases for the shared indicator cache."""
+
+  def setUp(self):
+    """Test set up. Called before each test case."""
+    self.time_obj = env_time.IntegerTime(start_time=0, time_unit=1)
+    history = {asset.Symbols.BTC: [(1, 10, 1), (2, 20, 1), (3, 30, 2)]}
+    self.exchange = sim_exchange.SimulatedExchange(
+        time=self.time_obj, symbols=[asset.Symbols.BTC], history=history)
+    for _ in range(3):
+      self.time_obj.Step()
+    self.market_data = market_data.MarketData(self.time_obj)
+    # Count candle requests to the exchange.
+    self.num_requests = 0
+    get_candles = self.exchange.GetCandles
+    def CountingGetCandles(*args, **kwargs):
+      self.num_requests += 1
+      return get_candles(*args, **kwargs)
+    self.exchange.GetCandles = CountingGetCandles
+
+  def _Trade(self, price):
+    """Executes a trade on the exchange at the given price."""
+    amounts = {asset.Symbols.USD: 100, asset.Symbols.BTC: 1}
+    self.exchange.Buy(asset.Symbols.BTC, 1, wallet.Wallet(amounts), price=price)
+    self.exchange.Sell(asset.Symbols.BTC, 1, wallet.Wallet(amounts), price=price)
+
+  def test_Indicators(self):
+    """Indicators are computed from the candles in the window."""
+    self.assertEqual(20, self.market_data.SMA(self.exchange, asset.Symbols.BTC, 3))
+    self.assertEqual(25, self.market_data.SMA(self.exchange, asset.Symbols.BTC, 2))
+    self.assertEqual(22.5, self.market_data.EMA(self.exchange, asset.Symbols.BTC, 3))
+    self.assertEqual(
+        (10 + 20 + 2 * 30) / 4.0,
+        self.market_data.VWAP(self.exchange, asset.Symbols.BTC, 3))
+    self.assertGreater(
+        self.market_data.Volatility(self.exchange, asset.Symbols.BTC, 3), 0)
+
+  def test_SMA_ComputedOncePerTick(self):
+    """Repeated queries in the same tick are served from the cache."""
+    for _ in range(5):
+      self.market_data.SMA(self.exchange, asset.Symbols.BTC, 3)
+    self.assertEqual(1, self.num_requests)
+
+  def test_SMA_InvalidatedByTrade(self):
+    """New trades invalidate cached values."""
+    self.market_data.SMA(self.exchange, asset.Symbols.BTC, 3)
+    self._Trade(60)
+    self.assertEqual(30, self.market_data.SMA(self.exchange, asset.Symbols.BTC, 3))
+    self.assertEqual(2, self.num_requests)
+
+  def test_SMA_InvalidatedByTimeStep(self):
+    """Stepping time invalidates cached values."""
+    self.market_data.SMA(self.exchange, asset.Symbols.BTC, 3)
+    self.time_obj.Step()
+    self.assertEqual(80 / 3.0, self.market_data.SMA(self.exchange, asset.Symbols.BTC, 3))
+    self.assertEqual(2, self.num_requests)
+
+  def test_Rolling_CompletedCandles(self):
+    """Rolling windows contain the closes of completed candles only."""
+    window = self.market_data.Rolling(self.exchange, asset.Symbols.BTC, 3)
+    # The candle at time 3 is still open.
+    self.assertEqual([2, 15], [len(window), window.Mean()])
+    self.time_obj.Step()
+    self._Trade(60)
+    window = self.market_data.Rolling(self.exchange, asset.Symbols.BTC, 3)
+    self.assertEqual(20, window.Mean())
+    self.assertEqual(30, window.Max())
+
+  def test_Rolling_UpdatedIncrementally(self):
+    """Only candles completed since the last update are requested."""
+    self.market_data.Rolling(self.exchange, asset.Symbols.BTC, 100)
+    self.num_requests = 0
+    for _ in range(10):
+      self.time_obj.Step()
+      window = self.market_data.Rolling(self.exchange, asset.Symbols.BTC, 100)
+    self.assertEqual(10, self.num_requests)
+    # Candles without trades repeat the last close.
+    self.assertEqual(12, len(window))
+    self.assertEqual(30, window.Max())
+    self.assertEqual(10, window.Min())
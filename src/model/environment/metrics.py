@@ -0,0 +1,209 @@
+"""Aggregate metrics of a simulation, sampled while it runs.
+
+A MetricsRecorder attached to a TradingEnvironment samples the price, traded
+volume and spread of every market and the wealth distribution of every
+strategy class into fixed-size arrays. When the arrays are full, pairs of
+samples are merged and the sampling interval doubles, so a run of any
+length keeps at most `capacity` samples, evenly spaced in time.
+"""
+
+import numpy as np
+
+import src.model.asset as asset
+import src.model.market.candles as candles
+import src.model.wallet as wallet
+import src.util.stats as stats
+
+
+# Wealth quantiles sampled by default.
+DEFAULT_QUANTILES = (0.1, 0.25, 0.5, 0.75, 0.9)
+
+
+class MetricsRecorder(object):
+  """Samples aggregate metrics of a TradingEnvironment.
+
+  Markets are the (exchange, symbol) pairs of the environment and groups are
+  the strategy classes of its generated agents. The wealth of an agent is
+  the cash in its wallet plus its shares at the current prices. Funds
+  reserved for open orders are held by the exchange and not counted.
+  """
+
+  # Default maximum number of samples.
+  DEFAULT_CAPACITY = 1024
+
+  def __init__(self, capacity=DEFAULT_CAPACITY, interval=1,
+               quantiles=DEFAULT_QUANTILES):
+    """Initialize the recorder.
+
+    Args:
+      capacity: (optional) Maximum number of samples. Must be even.
+      interval: (optional) Number of timesteps between samples at the start
+        of the run.
+      quantiles: (optional) Wealth quantiles to sample, between 0 and 1.
+    """
+    if capacity < 2 or capacity % 2:
+      raise ValueError('Metrics capacity must be an even number.')
+    self.capacity = capacity
+    self.interval = interval
+    self.quantiles = np.asarray(quantiles, dtype=np.float64)
+    # Number of recorded samples.
+    self.size = 0
+    # Timesteps since the last sample.
+    self.steps = 0
+    # (exchange index, symbol) of each market, set on the first sample.
+    self.markets = None
+    # Strategy class names, set on the first sample, and the indices of
+    # their wallets in the wallet bank.
+    self.group_names = []
+    self.groups = None
+    self._num_wallets = None
+    # Sample arrays, allocated on the first sample.
+    self.timestamps = np.zeros(0)
+    self.prices = np.zeros((0, 0))
+    self.volumes = np.zeros((0, 0))
+    self.spreads = np.zeros((0, 0))
+    self.wealth_quantiles = np.zeros((0, 0, len(self.quantiles)))
+    self.wealth_gini = np.zeros((0, 0))
+
+  def _Allocate(self, environment):
+    """Create the sample arrays for the environment's markets and groups."""
+    self.markets = [(i, symbol)
+                    for i, exchange in enumerate(environment.exchanges)
+                    for symbol in exchange.GetSymbols()]
+    self.group_names = sorted(set(
+        name for name, _, _ in environment.wallet_groups))
+    num_markets = len(self.markets)
+    num_groups = len(self.group_names)
+    self.timestamps = np.zeros(self.capacity)
+    self.prices = np.zeros((self.capacity, num_markets))
+    self.volumes = np.zeros((self.capacity, num_markets))
+    self.spreads = np.zeros((self.capacity, num_markets))
+    self.wealth_quantiles = np.zeros(
+        (self.capacity, num_groups, len(self.quantiles)))
+    self.wealth_gini = np.zeros((self.capacity, num_groups))
+
+  def _GetGroups(self, environment):
+    """Gets the wallet indices of each group, rebuilt when agents are added."""
+    num_wallets = len(environment.wallet_bank)
+    if self.groups is None or num_wallets != self._num_wallets:
+      ranges = dict((name, []) for name in self.group_names)
+      for name, start, end in environment.wallet_groups:
+        if name in ranges:
+          ranges[name].append(np.arange(start, end))
+      self.groups = [
+          np.concatenate(ranges[name]) if ranges[name]
+          else np.zeros(0, dtype=np.int64) for name in self.group_names]
+      self._num_wallets = num_wallets
+    return self.groups
+
+  def Sample(self, environment):
+    """Called by the environment at the end of every timestep."""
+    self.steps += 1
+    if self.steps < self.interval:
+      return
+    if self.markets is None:
+      self._Allocate(environment)
+    if self.size == self.capacity:
+      self._Downsample()
+      if self.steps < self.interval:
+        return
+    self._Record(environment, self.size)
+    self.size += 1
+    self.steps = 0
+
+  def _Record(self, environment, row):
+    """Record the current metrics in the given row."""
+    self.timestamps[row] = environment.time.GetCurrentTime()
+    # Prices of the symbols, from the first exchange that trades them.
+    symbol_prices = {}
+    for column, (i, symbol) in enumerate(self.markets):
+      exchange = environment.exchanges[i]
+      price = exchange.GetPrice(symbol)
+      symbol_prices.setdefault(symbol, price)
+      self.prices[row, column] = price
+      self.volumes[row, column] = sum(
+          candle[candles.VOLUME]
+          for candle in exchange.GetCandles(symbol, limit=self.steps))
+      depth = exchange.GetDepth(symbol, levels=1)
+      if depth['bids'] and depth['asks']:
+        spread = depth['asks'][0][0] - depth['bids'][0][0]
+        self.spreads[row, column] = spread if np.isfinite(spread) else np.nan
+      else:
+        self.spreads[row, column] = np.nan
+    # Wealth of every wallet, including funds reserved for its orders.
+    bank = environment.wallet_bank
+    wealth = bank.GetColumn(asset.Symbols.USD).copy()
+    for symbol, price in symbol_prices.items():
+      if symbol in bank.columns:
+        wealth += bank.GetColumn(symbol) * price
+    # Funds held by the exchanges for resting orders.
+    for exchange in environment.exchanges:
+      for owner, reserved in getattr(exchange, 'reserved', {}).items():
+        if isinstance(owner, wallet.BankWallet) and owner.bank is bank:
+          wealth[owner.index] += reserved.GetAmount(asset.Symbols.USD) + sum(
+              reserved.GetAmount(symbol) * price
+              for symbol, price in symbol_prices.items())
+    for g, indices in enumerate(self._GetGroups(environment)):
+      if not len(indices):
+        self.wealth_quantiles[row, g] = np.nan
+        self.wealth_gini[row, g] = np.nan
+        continue
+      group_wealth = np.sort(wealth[indices])
+      positions = np.round(self.quantiles * (len(group_wealth) - 1))
+      self.wealth_quantiles[row, g] = group_wealth[positions.astype(np.int64)]
+      self.wealth_gini[row, g] = stats.Gini(np.maximum(group_wealth, 0))
+
+  def _Downsample(self):
+    """Merge pairs of samples and double the sampling interval.
+
+    A merged sample keeps the later sample's levels and the total volume of
+    both samples.
+    """
+    half = self.capacity // 2
+    for levels in (self.timestamps, self.prices, self.spreads,
+                   self.wealth_quantiles, self.wealth_gini):
+      levels[:half] = levels[1::2]
+    self.volumes[:half] = self.volumes[0::2] + self.volumes[1::2]
+    self.size = half
+    self.interval *= 2
+
+  def GetSeries(self):
+    """Gets the recorded samples.
+
+    Returns:
+      Dict of arrays with one row per sample: 'timestamps', 'prices',
+      'volumes' and 'spreads' with a column per market, 'wealth_quantiles'
+      by group and quantile, and 'wealth_gini' by group. 'market_exchanges',
+      'market_symbols', 'groups' and 'quantiles' label the columns, and
+      'interval' is the current number of timesteps per sample. The arrays
+      are empty if nothing was sampled yet.
+    """
+    markets = self.markets or []
+    return {
+        'timestamps': self.timestamps[:self.size],
+        'prices': self.prices[:self.size],
+        'volumes': self.volumes[:self.size],
+        'spreads': self.spreads[:self.size],
+        'wealth_quantiles': self.wealth_quantiles[:self.size],
+        'wealth_gini': self.wealth_gini[:self.size],
+        'market_exchanges': np.array([i for i, _ in markets], dtype=np.int64),
+        'market_symbols': np.array(
+            [symbol for _, symbol in markets], dtype=str),
+        'groups': np.array(self.group_names, dtype=str),
+        'quantiles': self.quantiles,
+        'interval': np.array(self.interval),
+    }
+
+  def Save(self, path):
+    """Write the recorded samples to a compressed .npz file."""
+    np.savez_compressed(path, **self.GetSeries())
+
+
+def Load(path):
+  """Reads samples written by MetricsRecorder.Save.
+
+  Returns:
+    Dict of arrays like MetricsRecorder.GetSeries.
+  """
+  with np.load(path) as series:
+    return dict((name, series[name]) for name in series.files)
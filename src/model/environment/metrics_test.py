@@ -0,0 +1,115 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+import src.model.asset as asset
+import src.model.environment.environment as env
+import src.model.environment.environment_time as env_time
+import src.model.environment.metrics as metrics
+import src.model.market.simulated_exchange as sim_exchange
+import src.model.trader.strategies.strategies as strategies
+import src.util.stats as stats
+
+
+class TestMetricsRecorder(unittest.TestCase):
+  """Test cases for metrics sampled during a simulation."""
+
+  def _Run(self, recorder, timesteps, vectorize=False):
+    """Runs a small simulation with the recorder and returns it."""
+    time_obj = env_time.IntegerTime(start_time=0, time_unit=1)
+    exchange = sim_exchange.SimulatedExchange(
+        time=time_obj, symbols=[asset.Symbols.BTC],
+        history={asset.Symbols.BTC: [(-1, 20, -1)]})
+    environment = env.TradingEnvironment(
+        time=time_obj, exchanges=[exchange], vectorize=vectorize, seed=1,
+        metrics=recorder)
+    environment.GenerateAgents(
+        40, {strategies.RandomStrategy(): 0.5,
+             strategies.BandedMomentumStrategy(history_range=5): 0.25,
+             strategies.BandedMomentumStrategy(momentum=False,
+                                               history_range=5): 0.25},
+        {asset.Symbols.USD: 1000, asset.Symbols.BTC: 10})
+    environment.Run(timesteps=timesteps)
+    return environment
+
+  def test_SamplesEveryStep(self):
+    """Prices, volumes and wealth are sampled at the end of each step."""
+    recorder = metrics.MetricsRecorder()
+    environment = self._Run(recorder, timesteps=10)
+    exchange = environment.exchanges[0]
+    series = recorder.GetSeries()
+
+    self.assertEqual(list(range(10)), series['timestamps'].tolist())
+    self.assertEqual(exchange.GetPrice(asset.Symbols.BTC),
+                     series['prices'][-1, 0])
+    history = exchange.history[asset.Symbols.BTC]
+    self.assertAlmostEqual(history.Amounts()[1:].sum(),
+                           series['volumes'][:, 0].sum())
+    self.assertEqual(['BandedMomentumStrategy', 'RandomStrategy'],
+                     series['groups'].tolist())
+    # Wealth of the random traders at the end of the run, including the
+    # funds reserved for their resting orders.
+    price = series['prices'][-1, 0]
+    random_wealth = np.array([
+        agent.wallet.GetAmount(asset.Symbols.USD) +
+        exchange.GetReserved(agent.wallet, asset.Symbols.USD) +
+        (agent.wallet.GetAmount(asset.Symbols.BTC) +
+         exchange.GetReserved(agent.wallet, asset.Symbols.BTC)) * price
+        for agent in environment.agents[:20]])
+    self.assertTrue(exchange.reserved)
+    self.assertAlmostEqual(stats.Gini(random_wealth),
+                           series['wealth_gini'][-1, 1])
+    # The median of 20 agents is the 11th.
+    self.assertEqual(np.sort(random_wealth)[10],
+                     series['wealth_quantiles'][-1, 1, 2])
+
+  def test_Downsample_FixedSize(self):
+    """Full arrays are halved and the sampling interval doubles."""
+    recorder = metrics.MetricsRecorder(capacity=4)
+    environment = self._Run(recorder, timesteps=11, vectorize=True)
+    series = recorder.GetSeries()
+
+    # Steps 0-3 are sampled, then 1, 3, 5 and 7 are kept after the first
+    # downsample and 3 and 7 after the second.
+    self.assertEqual(4, recorder.interval)
+    self.assertEqual([3, 7], series['timestamps'].tolist())
+    history = environment.exchanges[0].history[asset.Symbols.BTC]
+    timestamps = history.Timestamps()
+    self.assertAlmostEqual(
+        history.Amounts()[(timestamps >= 0) & (timestamps <= 7)].sum(),
+        series['volumes'][:, 0].sum())
+
+  def test_SaveAndLoad(self):
+    """Samples are written to an .npz file and read back."""
+    recorder = metrics.MetricsRecorder()
+    self._Run(recorder, timesteps=3)
+    tmp_dir = tempfile.mkdtemp()
+    try:
+      path = os.path.join(tmp_dir, 'metrics.npz')
+      recorder.Save(path)
+      series = metrics.Load(path)
+    finally:
+      shutil.rmtree(tmp_dir)
+    for name, values in recorder.GetSeries().items():
+      np.testing.assert_array_equal(values, series[name])
+
+  def test_NoSamples(self):
+    """The series of a recorder without samples are empty."""
+    recorder = metrics.MetricsRecorder()
+    self._Run(recorder, timesteps=0)
+    series = recorder.GetSeries()
+    self.assertEqual((0,), series['timestamps'].shape)
+    self.assertEqual(0, len(series['prices']))
+    self.assertEqual(0, len(series['groups']))
+
+  def test_OddCapacity(self):
+    """Capacities that cannot be halved are rejected."""
+    with self.assertRaises(ValueError):
+      metrics.MetricsRecorder(capacity=5)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,103 @@
+"""Discrete-event scheduling of agents."""
+
+import heapq
+import time
+
+import src.model.trader.strategies.strategies as strategies
+
+
+class EventScheduler(object):
+  """Wakes agents at random times instead of every timestep.
+
+  Each agent acts as a Poisson process with the arrival rate of its strategy,
+  i.e. the times between its actions are exponentially distributed. Wake-up
+  times are kept in a heap, so the cost of a timestep depends on the number
+  of actions in it, not on the number of agents. Agents act in the order of
+  their wake-up times, which favors no agent over another.
+
+  Agents whose strategy reports them as idle are woken half as often after
+  each idle action, down to 1/2**MAX_IDLE_BACKOFF of their rate, until they
+  trade again. Idle agents, e.g. without anything to trade, then cost almost
+  nothing, but still notice when orders they placed before are filled.
+
+  Agents are referred to by their index in the environment's list of agents.
+  """
+
+  # Maximum number of times the rate of an idle agent is halved.
+  MAX_IDLE_BACKOFF = 8
+
+  def __init__(self, time, rng):
+    """Initialize an empty schedule.
+
+    Args:
+      time: Time reference of the environment.
+      rng: random.Random used for the times between actions.
+    """
+    self.time = time
+    self.rng = rng
+    # Heap of (wake-up time, agent index).
+    self.events = []
+    # Agent index -> number of consecutive idle actions.
+    self.idle_counts = {}
+
+  def __len__(self):
+    """Number of scheduled agents."""
+    return len(self.events)
+
+  def _NextTime(self, time, rate):
+    """Draws the time of the next action after the given time."""
+    return self.time.TimeDelta(time, self.rng.expovariate(rate))
+
+  def Add(self, index, rate):
+    """Schedule an agent for the first time.
+
+    Args:
+      index: Index of the agent.
+      rate: Expected number of actions of the agent per time unit. Agents
+        with a rate of 0 are never woken.
+    """
+    if rate > 0:
+      heapq.heappush(
+          self.events, (self._NextTime(self.time.GetCurrentTime(), rate), index))
+
+  def RunUntil(self, end_time, agents, profiler=None):
+    """Let the agents due before the given time act.
+
+    Agents with a rate above 1 can act several times before end_time. Idle
+    agents are rescheduled with a lower rate.
+
+    Args:
+      end_time: Time until which agents act, exclusive.
+      agents: Agents of the environment, indexed like the schedule.
+      profiler: (optional) Profiler timing the agents' strategies.
+
+    Returns:
+      Number of actions.
+    """
+    events = self.events
+    num_actions = 0
+    while events and events[0][0] < end_time:
+      wake_time, index = events[0]
+      agent = agents[index]
+      if profiler:
+        start = time.perf_counter()
+        result = agent.Trade()
+        profiler.Record(
+            'strategy.%s' % agent.strategy.__class__.__name__, start)
+        profiler.Count('scheduler.heap_ops')
+      else:
+        result = agent.Trade()
+      num_actions += 1
+      rate = agent.strategy.arrival_rate
+      if result == strategies.IDLE:
+        idle_count = min(self.idle_counts.get(index, 0) + 1,
+                         self.MAX_IDLE_BACKOFF)
+        self.idle_counts[index] = idle_count
+        rate /= 2 ** idle_count
+      elif self.idle_counts:
+        self.idle_counts.pop(index, None)
+      if rate > 0:
+        heapq.heapreplace(events, (self._NextTime(wake_time, rate), index))
+      else:
+        heapq.heappop(events)
+    return num_actions
@@ -0,0 +1,96 @@
+import random
+import unittest
+
+import src.model.environment.environment_time as env_time
+import src.model.environment.scheduler as scheduler
+import src.model.trader.strategies.strategies as strategies
+
+
+class FakeStrategy(object):
+  """Strategy with only an arrival rate."""
+
+  def __init__(self, arrival_rate):
+    self.arrival_rate = arrival_rate
+
+
+class FakeAgent(object):
+  """Agent that records when it trades."""
+
+  def __init__(self, index, arrival_rate, log, idle=False):
+    self.index = index
+    self.strategy = FakeStrategy(arrival_rate)
+    self.log = log
+    self.idle = idle
+
+  def Trade(self):
+    self.log.append(self.index)
+    if self.idle:
+      return strategies.IDLE
+
+
+class TestEventScheduler(unittest.TestCase):
+  """Test cases for the event scheduler."""
+
+  def setUp(self):
+    """Test set up. Called before each test case."""
+    self.time_obj = env_time.IntegerTime(start_time=0, time_unit=1)
+    self.log = []
+
+  def _Schedule(self, rates, seed=0):
+    """Creates agents with the given arrival rates and schedules them."""
+    agents = [FakeAgent(i, rate, self.log) for i, rate in enumerate(rates)]
+    events = scheduler.EventScheduler(self.time_obj, random.Random(seed))
+    for i, rate in enumerate(rates):
+      events.Add(i, rate)
+    return agents, events
+
+  def test_ActionsFollowRates(self):
+    """Agents act about as often as their arrival rate."""
+    agents, events = self._Schedule([0, 0.5, 2])
+    self.assertEqual(2, len(events))
+    num_actions = events.RunUntil(1000, agents)
+    self.assertEqual(len(self.log), num_actions)
+    self.assertNotIn(0, self.log)
+    self.assertAlmostEqual(500, self.log.count(1), delta=75)
+    self.assertAlmostEqual(2000, self.log.count(2), delta=150)
+
+  def test_IdleAgentsBackOff(self):
+    """Idle agents are woken less and less often until they trade."""
+    agents, events = self._Schedule([1, 1])
+    agents[1].idle = True
+    events.RunUntil(1000, agents)
+    self.assertGreater(self.log.count(0), 900)
+    self.assertLess(self.log.count(1), 20)
+    self.assertEqual({1: events.MAX_IDLE_BACKOFF}, events.idle_counts)
+    # The agent is woken at its full rate again after it trades.
+    agents[1].idle = False
+    events.RunUntil(3000, agents)
+    self.assertEqual({}, events.idle_counts)
+    self.assertGreater(self.log.count(1), 1500)
+
+  def test_RunUntil_ExcludesEndTime(self):
+    """Only agents due before the end time act."""
+    agents, events = self._Schedule([1] * 100)
+    events.RunUntil(1, agents)
+    for wake_time, _ in events.events:
+      self.assertGreaterEqual(wake_time, 1)
+
+  def test_NoOrderBias(self):
+    """The first agent in the list does not always act first."""
+    first_agents = set()
+    for seed in range(10):
+      del self.log[:]
+      agents, events = self._Schedule([1] * 10, seed=seed)
+      events.RunUntil(5, agents)
+      first_agents.add(self.log[0])
+    self.assertGreater(len(first_agents), 1)
+
+  def test_Reproducible(self):
+    """Schedules with the same seed are identical."""
+    agents, events = self._Schedule([1, 2, 3], seed=4)
+    events.RunUntil(20, agents)
+    first = list(self.log)
+    del self.log[:]
+    agents, events = self._Schedule([1, 2, 3], seed=4)
+    events.RunUntil(20, agents)
+    self.assertEqual(first, self.log)
@@ -0,0 +1,286 @@
+"""Trading environment sharded by symbol across worker processes."""
+
+import collections
+import copy
+import logging
+import multiprocessing
+import traceback
+
+import numpy as np
+
+import src.model.environment.environment as env
+import src.model.environment.environment_time as env_time
+import src.model.market.simulated_exchange as sim_exchange
+
+
+# Symbols, number of agents and random seed of one shard.
+ShardConfig = collections.namedtuple(
+    'ShardConfig', 'index symbols num_agents seed')
+
+
+def PartitionSymbols(symbols, num_shards):
+  """Splits symbols into round-robin groups, one group per shard.
+
+  Args:
+    symbols: Symbols to split.
+    num_shards: Maximum number of groups.
+
+  Returns:
+    List of non-empty lists of symbols.
+  """
+  num_shards = max(1, min(num_shards, len(symbols)))
+  return [list(symbols[i::num_shards]) for i in range(num_shards)]
+
+
+def BuildShard(config, strategy_distribution, initial_funds, initial_prices,
+               vectorize=False):
+  """Creates the environment of one shard.
+
+  The shard has one simulated exchange for its symbols and its own agents,
+  which only trade on that exchange. Pass this function to
+  ShardedEnvironment with functools.partial to fix the other arguments.
+
+  Args:
+    config: ShardConfig of the shard.
+    strategy_distribution: Distribution of trading strategies.
+    initial_funds: Starting funds for each agent.
+    initial_prices: Maps each symbol to its starting price.
+    vectorize: (optional) Invoke strategies for cohorts of agents.
+
+  Returns:
+    TradingEnvironment of the shard.
+  """
+  time_obj = env_time.IntegerTime(start_time=0, time_unit=1)
+  history = dict((symbol, [(-1, initial_prices[symbol], -1)])
+                 for symbol in config.symbols)
+  exchange = sim_exchange.SimulatedExchange(
+      time=time_obj, symbols=config.symbols, history=history)
+  environment = env.TradingEnvironment(
+      time=time_obj, exchanges=[exchange], vectorize=vectorize,
+      seed=config.seed)
+  # Strategies keep references to the shard's market data, so shards that
+  # run in the same process need their own copies.
+  environment.GenerateAgents(
+      config.num_agents, copy.deepcopy(strategy_distribution), initial_funds)
+  return environment
+
+
+class _Shard(object):
+  """Environment of one shard."""
+
+  def __init__(self, build_shard, config):
+    """Build the shard's environment.
+
+    Args:
+      build_shard: Function creating a TradingEnvironment from a ShardConfig.
+        The environment's agents draw from streams seeded with config.seed.
+      config: ShardConfig of the shard.
+    """
+    self.environment = build_shard(config)
+
+  def Step(self):
+    """Run one timestep and return the shard's prices."""
+    self.environment.Run(timesteps=1)
+    return self.GetPrices()
+
+  def GetPrices(self):
+    """Maps the shard's symbols to (price, number of trades)."""
+    prices = {}
+    for exchange in self.environment.exchanges:
+      for symbol in exchange.GetSymbols():
+        prices[symbol] = (exchange.GetPrice(symbol),
+                          exchange.GetNumTrades(symbol))
+    return prices
+
+  def GetHistories(self):
+    """Maps the shard's symbols to their trade history."""
+    histories = {}
+    for exchange in self.environment.exchanges:
+      for symbol in exchange.GetSymbols():
+        histories[symbol] = exchange.GetHistory(symbol, limit=None)
+    return histories
+
+
+def _RunWorker(conn, build_shard, config):
+  """Serves requests for one shard until it is closed.
+
+  Every request is a (method name, args) tuple. Replies are (True, result),
+  or (False, traceback) if the request failed.
+  """
+  try:
+    shard = _Shard(build_shard, config)
+    conn.send((True, None))
+  except Exception:
+    conn.send((False, traceback.format_exc()))
+    conn.close()
+    return
+  while True:
+    method, args = conn.recv()
+    if method is None:
+      break
+    try:
+      conn.send((True, getattr(shard, method)(*args)))
+    except Exception:
+      conn.send((False, traceback.format_exc()))
+  conn.close()
+
+
+class _LocalShard(object):
+  """Shard run in the current process, with the interface of _RemoteShard."""
+
+  def __init__(self, build_shard, config):
+    self.shard = _Shard(build_shard, config)
+    self.result = None
+
+  def Send(self, method, *args):
+    """Call a method of the shard."""
+    self.result = getattr(self.shard, method)(*args)
+
+  def Receive(self):
+    """Gets the result of the last call."""
+    return self.result
+
+  def Close(self):
+    """Nothing to stop."""
+
+
+class _RemoteShard(object):
+  """Shard run in a worker process."""
+
+  def __init__(self, build_shard, config):
+    self.conn, worker_conn = multiprocessing.Pipe()
+    self.index = config.index
+    self.process = multiprocessing.Process(
+        target=_RunWorker, args=(worker_conn, build_shard, config))
+    self.process.daemon = True
+    self.process.start()
+    worker_conn.close()
+    self.Receive()
+
+  def Send(self, method, *args):
+    """Ask the worker to call a method of the shard."""
+    self.conn.send((method, args))
+
+  def Receive(self):
+    """Wait for the result of the last call."""
+    ok, result = self.conn.recv()
+    if not ok:
+      raise Exception('Shard %d failed:\n%s' % (self.index, result))
+    return result
+
+  def Close(self):
+    """Stop the worker process."""
+    if self.process.is_alive():
+      self.conn.send((None, ()))
+      self.process.join()
+    self.conn.close()
+
+
+class ShardedEnvironment(object):
+  """Runs independent shards of a market in parallel.
+
+  Symbols are partitioned across shards. Each shard owns the order books,
+  history and agents of its symbols, so agents' orders always go to the shard
+  that owns the symbol. All shards finish a timestep before the time of the
+  environment steps, and their prices are gathered after every timestep.
+
+  Each shard is seeded from the environment's seed, so results for a fixed
+  seed do not depend on the number of processes or their scheduling.
+  """
+
+  inf = float('inf')
+
+  def __init__(self, build_shard, symbols, num_shards, num_agents, seed=None,
+               processes=True, logger=None):
+    """Start the shards.
+
+    Args:
+      build_shard: Function creating the TradingEnvironment of a shard from a
+        ShardConfig, such as a functools.partial of BuildShard. Must be
+        picklable to run in worker processes.
+      symbols: Symbols traded in the environment.
+      num_shards: Number of shards to split the symbols into.
+      num_agents: Total number of agents, split across the shards in
+        proportion to their number of symbols.
+      seed: (optional) Seed for the shards' random number generators.
+      processes: (optional) Run each shard in a worker process. If False, all
+        shards run in the current process.
+      logger: (optional) Logger for the simulation.
+    """
+    self.time = env_time.IntegerTime(start_time=0, time_unit=1)
+    self.logger = logger
+    groups = PartitionSymbols(list(symbols), num_shards)
+    seeds = np.random.SeedSequence(seed).spawn(len(groups))
+    self.configs = []
+    num_symbols = sum(len(group) for group in groups)
+    assigned = 0
+    for index, group in enumerate(groups):
+      end = num_agents * sum(len(g) for g in groups[:index + 1]) // num_symbols
+      self.configs.append(ShardConfig(
+          index=index, symbols=group, num_agents=end - assigned,
+          seed=int(seeds[index].generate_state(1)[0])))
+      assigned = end
+    shard_class = _RemoteShard if processes else _LocalShard
+    self.shards = []
+    try:
+      for config in self.configs:
+        self.shards.append(shard_class(build_shard, config))
+    except Exception:
+      self.Close()
+      raise
+    # Symbol -> (price, number of trades) after the last timestep.
+    self.prices = self._Gather('GetPrices')
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    self.Close()
+
+  def _Gather(self, method):
+    """Calls a method on all shards and merges their results."""
+    for shard in self.shards:
+      shard.Send(method)
+    results = {}
+    for shard in self.shards:
+      results.update(shard.Receive())
+    return results
+
+  def GetTime(self):
+    """Return time object used in this environment."""
+    return self.time
+
+  def GetPrice(self, symbol):
+    """Gets the price of a symbol after the last timestep."""
+    return self.prices[symbol][0]
+
+  def GetNumTrades(self, symbol):
+    """Gets the number of trades of a symbol after the last timestep."""
+    return self.prices[symbol][1]
+
+  def GetHistories(self):
+    """Maps every symbol to its [[timestamp, price]] history."""
+    return self._Gather('GetHistories')
+
+  def Run(self, timesteps=inf):
+    """Run the simulation for specified number of timesteps.
+
+    Args:
+      timesteps: (optional) Number of time steps to run the simulation.
+    """
+    steps_taken = 0
+    while steps_taken < timesteps:
+      # Barrier: all shards finish the timestep before time steps.
+      self.prices = self._Gather('Step')
+      if self.logger and self.logger.isEnabledFor(logging.DEBUG):
+        self.logger.debug('TIMESTEP %d', steps_taken)
+        for symbol in sorted(self.prices):
+          self.logger.debug('    %s %d', symbol, self.GetPrice(symbol))
+      self.time.Step()
+      steps_taken += 1
+
+  def Close(self):
+    """Stop the shards' worker processes."""
+    for shard in self.shards:
+      shard.Close()
+    self.shards = []
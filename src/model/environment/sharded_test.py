@@ -0,0 +1,52 @@
+import unittest
+
+import src.model.asset as asset
+import src.model.environment.sharded as sharded
+import src.model.trader.strategies.strategies as strategies
+
+
+SYMBOLS = ['s%d' % i for i in range(5)]
+
+
+def _BuildShard(config):
+  """Builds a small shard for the tests."""
+  return sharded.BuildShard(
+      config,
+      {strategies.RandomStrategy(): 0.5,
+       strategies.BandedMomentumStrategy(history_range=5): 0.5},
+      dict([(asset.Symbols.USD, 1000)] + [(symbol, 10) for symbol in SYMBOLS]),
+      dict((symbol, 20) for symbol in SYMBOLS))
+
+
+class TestShardedEnvironment(unittest.TestCase):
+  """Test cases for the sharded environment."""
+
+  def _Run(self, seed, processes, num_shards=3):
+    """Runs a sharded simulation and returns its histories."""
+    with sharded.ShardedEnvironment(
+        _BuildShard, SYMBOLS, num_shards=num_shards, num_agents=60,
+        seed=seed, processes=processes) as environment:
+      environment.Run(timesteps=5)
+      self.assertEqual(5, environment.GetTime().GetCurrentTime())
+      return environment.GetHistories()
+
+  def test_PartitionSymbols(self):
+    """Symbols are split round-robin without empty shards."""
+    self.assertEqual([['s0', 's3'], ['s1', 's4'], ['s2']],
+                     sharded.PartitionSymbols(SYMBOLS, 3))
+    self.assertEqual(5, len(sharded.PartitionSymbols(SYMBOLS, 8)))
+
+  def test_AgentsSplitBySymbols(self):
+    """Agents are split across shards in proportion to their symbols."""
+    environment = sharded.ShardedEnvironment(
+        _BuildShard, SYMBOLS, num_shards=3, num_agents=60, processes=False)
+    self.assertEqual([24, 24, 12],
+                     [config.num_agents for config in environment.configs])
+    self.assertEqual(set(SYMBOLS), set(environment.prices))
+
+  def test_Deterministic(self):
+    """Results for a seed do not depend on worker processes."""
+    local = self._Run(seed=7, processes=False)
+    self.assertEqual(local, self._Run(seed=7, processes=False))
+    self.assertEqual(local, self._Run(seed=7, processes=True))
+    self.assertEqual(set(SYMBOLS), set(local))
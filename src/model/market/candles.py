@@ -0,0 +1,295 @@
+"""Incrementally maintained price candles for the simulated exchange."""
+
+import numpy as np
+
+
+# Indices of the values in a candle tuple.
+TIMESTAMP, OPEN, HIGH, LOW, CLOSE, VOLUME = range(6)
+
+# Batches of at least this many trades are added with NumPy.
+MIN_VECTORIZED_TRADES = 64
+
+# Maximum number of trades read from a history at a time.
+MAX_CHUNK_TRADES = 1 << 16
+
+
+class CandleSeries(object):
+  """OHLCV candles of one size for one asset.
+
+  Candles are aligned to a fixed grid. Candle k contains the trades with
+  timestamps in ((k - 1) * length, k * length] and is labeled with the end of
+  its interval. Intervals without trades repeat the previous closing price
+  with zero volume.
+
+  Trades are added one at a time in timestamp order, so keeping the series
+  up to date costs O(1) per trade.
+  """
+
+  def __init__(self, length):
+    """Initialize an empty series.
+
+    Args:
+      length: Length of one candle in time units of the exchange's time.
+    """
+    self.length = length
+    # Index of the first candle on the grid.
+    self.first_index = None
+    # Candle values, one item per candle.
+    self.opens = []
+    self.highs = []
+    self.lows = []
+    self.closes = []
+    self.volumes = []
+
+  def __len__(self):
+    """Number of candles in the series."""
+    return len(self.closes)
+
+  def GetIndex(self, timestamp):
+    """Gets the index of the candle containing the given timestamp."""
+    # Round up, since a candle contains the end of its interval.
+    return int(-(-timestamp // self.length))
+
+  def AddTrade(self, timestamp, price, amount):
+    """Add a trade to the series.
+
+    Args:
+      timestamp: Time of the trade. Must not be before earlier trades.
+      price: Price per unit of the trade.
+      amount: Amount traded.
+    """
+    index = self.GetIndex(timestamp)
+    if self.first_index is None:
+      # First trade in the series.
+      self.first_index = index
+      last_index = index - 1
+    else:
+      last_index = self.first_index + len(self.closes) - 1
+    if index <= last_index:
+      # Trade is in the latest candle.
+      if price > self.highs[-1]:
+        self.highs[-1] = price
+      if price < self.lows[-1]:
+        self.lows[-1] = price
+      self.closes[-1] = price
+      self.volumes[-1] += amount
+      return
+    # Intervals without trades keep the last closing price.
+    if self.closes:
+      last_close = self.closes[-1]
+      num_empty = index - last_index - 1
+      self.opens.extend([last_close] * num_empty)
+      self.highs.extend([last_close] * num_empty)
+      self.lows.extend([last_close] * num_empty)
+      self.closes.extend([last_close] * num_empty)
+      self.volumes.extend([0] * num_empty)
+    # Start a new candle with this trade.
+    self.opens.append(price)
+    self.highs.append(price)
+    self.lows.append(price)
+    self.closes.append(price)
+    self.volumes.append(amount)
+
+  def AddTrades(self, timestamps, prices, amounts):
+    """Add a batch of trades to the series in one vectorized pass.
+
+    Trades are grouped into candles with a single sort-free scan over the
+    timestamps, so building the candles for millions of trades takes
+    milliseconds.
+
+    Args:
+      timestamps: Array of trade times in non-decreasing order. The first
+        trade must not be before earlier trades in the series.
+      prices: Array of prices per unit.
+      amounts: Array of amounts traded.
+    """
+    timestamps = np.asarray(timestamps)
+    prices = np.asarray(prices, dtype=float)
+    amounts = np.asarray(amounts)
+    if not len(timestamps):
+      return
+    indices = -(-timestamps // self.length).astype(np.int64)
+    if self.closes:
+      # Trades in the latest stored candle are added one at a time.
+      last_index = self.first_index + len(self.closes) - 1
+      num_in_last = int(np.searchsorted(indices, last_index, side='right'))
+      for i in range(num_in_last):
+        self.AddTrade(timestamps[i].item(), prices[i].item(),
+                      amounts[i].item())
+      if num_in_last == len(indices):
+        return
+      indices = indices[num_in_last:]
+      prices = prices[num_in_last:]
+      amounts = amounts[num_in_last:]
+      last_close = self.closes[-1]
+    else:
+      self.first_index = int(indices[0])
+      last_index = self.first_index - 1
+      last_close = 0
+    # Group trades in the same candle.
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(indices)) + 1))
+    ends = np.append(starts[1:], len(indices)) - 1
+    # Positions of the traded candles among the new candles.
+    positions = indices[starts] - last_index - 1
+    num_candles = int(positions[-1]) + 1
+    # Every candle closes at the last traded price up to that candle.
+    traded = np.full(num_candles, -1, dtype=np.int64)
+    traded[positions] = np.arange(len(positions))
+    last_traded = np.maximum.accumulate(traded)
+    closes = np.where(
+        last_traded >= 0, prices[ends][np.maximum(last_traded, 0)], last_close)
+    # Candles without trades are flat at the closing price.
+    opens = closes.copy()
+    opens[positions] = prices[starts]
+    highs = closes.copy()
+    highs[positions] = np.maximum.reduceat(prices, starts)
+    lows = closes.copy()
+    lows[positions] = np.minimum.reduceat(prices, starts)
+    volumes = np.zeros(num_candles, dtype=amounts.dtype)
+    volumes[positions] = np.add.reduceat(amounts, starts)
+    self.opens.extend(opens.tolist())
+    self.highs.extend(highs.tolist())
+    self.lows.extend(lows.tolist())
+    self.closes.extend(closes.tolist())
+    self.volumes.extend(volumes.tolist())
+
+  def _GetRange(self, end_time, limit):
+    """Gets the range of candle indices to return for a query.
+
+    Returns:
+      (start, end) candle indices, both inclusive. The range is empty if
+      start > end.
+    """
+    if self.first_index is None:
+      return 0, -1
+    end = self.GetIndex(end_time)
+    start = self.first_index
+    if limit is not None:
+      start = max(start, end - limit + 1)
+    return start, end
+
+  def GetCloses(self, end_time, limit=None):
+    """Gets closing prices of the candles up to the given time.
+
+    Args:
+      end_time: Time contained in the last candle.
+      limit: (optional) Maximum number of candles. All candles if None.
+
+    Returns:
+      List of [timestamp, closing price] candles, oldest first.
+    """
+    start, end = self._GetRange(end_time, limit)
+    stored_end = self.first_index + len(self.closes) - 1 if self.closes else -1
+    candles = []
+    closes = self.closes
+    for index in range(start, end + 1):
+      if index <= stored_end:
+        close = closes[index - self.first_index]
+      else:
+        # No trades since the last stored candle.
+        close = closes[-1]
+      candles.append([index * self.length, close])
+    return candles
+
+  def GetCandles(self, end_time, limit=None):
+    """Gets OHLCV candles up to the given time.
+
+    Args:
+      end_time: Time contained in the last candle.
+      limit: (optional) Maximum number of candles. All candles if None.
+
+    Returns:
+      List of (timestamp, open, high, low, close, volume) tuples, oldest first.
+    """
+    start, end = self._GetRange(end_time, limit)
+    candles = []
+    for index in range(start, end + 1):
+      i = index - self.first_index
+      if i < len(self.closes):
+        candles.append((index * self.length, self.opens[i], self.highs[i],
+                        self.lows[i], self.closes[i], self.volumes[i]))
+      else:
+        # No trades since the last stored candle.
+        close = self.closes[-1]
+        candles.append((index * self.length, close, close, close, close, 0))
+    return candles
+
+
+class CandleStore(object):
+  """Candles of several sizes for one asset, kept in sync with its history.
+
+  A series for a candle size is built from the history the first time it is
+  requested. After that, every series is updated with new trades only, so
+  any number of candle sizes stay warm at the same time.
+  """
+
+  def __init__(self, time):
+    """Initialize the store.
+
+    Args:
+      time: Time reference of the exchange.
+    """
+    self.time = time
+    # Candle size -> CandleSeries.
+    self.series = {}
+    # History the candles are built from and number of trades added.
+    self.history = None
+    self.num_trades = 0
+
+  def Sync(self, history):
+    """Add new trades in the history to all candle series.
+
+    Args:
+      history: TradeHistory or list of (timestamp, price, amount) records.
+    """
+    if history is not self.history or len(history) < self.num_trades:
+      # History was replaced. Rebuild the candles on demand.
+      self.history = history
+      self.num_trades = len(history)
+      self.series = {}
+      return
+    if len(history) == self.num_trades:
+      return
+    for series in self.series.values():
+      _AddRecords(series, history, self.num_trades, len(history))
+    self.num_trades = len(history)
+
+  def GetSeries(self, candle_size):
+    """Gets the series for the given candle size, building it if needed.
+
+    Args:
+      candle_size: Number of time units per candle.
+
+    Returns:
+      CandleSeries containing all synced trades.
+    """
+    series = self.series.get(candle_size)
+    if series is None:
+      series = CandleSeries(self.time.TimeDelta(0, candle_size))
+      _AddRecords(series, self.history, 0, self.num_trades)
+      self.series[candle_size] = series
+    return series
+
+
+def _AddRecords(series, history, start, end):
+  """Add the trade records history[start:end] to the candle series.
+
+  Args:
+    series: CandleSeries to add the trades to.
+    history: TradeHistory or list of (timestamp, price, amount) tuples.
+    start: Index of the first record to add.
+    end: Index after the last record to add.
+  """
+  if end - start < MIN_VECTORIZED_TRADES:
+    for timestamp, price, amount in history[start:end]:
+      series.AddTrade(timestamp, price, amount)
+    return
+  if hasattr(history, 'Columns'):
+    # Columnar history. Read the columns in chunks, so trades that are read
+    # from disk do not all have to fit in memory.
+    for chunk_start in range(start, end, MAX_CHUNK_TRADES):
+      series.AddTrades(*history.Columns(
+          chunk_start, min(chunk_start + MAX_CHUNK_TRADES, end)))
+    return
+  records = np.array(history[start:end], dtype=float)
+  series.AddTrades(records[:, 0], records[:, 1], records[:, 2])
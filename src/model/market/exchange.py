@@ -1,3 +1,17 @@
+import collections
+
+import src.util.enum as enum
+
+
+# Sides of an order.
+OrderSide = enum.enum(
+  BUY='buy',
+  SELL='sell',
+)
+
+# Order submitted in a batch. A price of None places a market order.
+OrderRequest = collections.namedtuple(
+    'OrderRequest', 'side, symbol, amount, wallet, price')
 
 
 class Exchange(object):
@@ -21,6 +35,14 @@ class Exchange(object):
     """
     raise NotImplementedError()
 
+  def GetCandles(self, symbol, limit, candle_size):
+    """Get OHLCV candles for the asset with given name."""
+    raise NotImplementedError()
+
+  def GetNumTrades(self, symbol):
+    """Get the number of trades in the history of the given asset."""
+    raise NotImplementedError()
+
   def Buy(self, *args, **kwargs):
     """Submit a buy order for some asset on this exchange."""
     raise NotImplementedError()
@@ -28,3 +50,11 @@ class Exchange(object):
   def Sell(self, *args, **kwargs):
     """Submit a sell order for some asset on this exchange."""
     raise NotImplementedError()
+
+  def SubmitOrders(self, orders):
+    """Submit a batch of OrderRequests on this exchange."""
+    raise NotImplementedError()
+
+  def EndTimestep(self):
+    """Called by the environment before time moves to the next step."""
+    pass
@@ -0,0 +1,131 @@
+"""Bulk loading of trade histories from files.
+
+Histories are parsed or memory-mapped straight into typed columns and handed
+to TradeHistory.FromArrays, so no Python object is created per trade.
+Supported formats:
+
+  - Columnar directories with one .npy file per column, written by
+    SaveColumns. The columns are memory-mapped, so loading takes about as
+    long as checking that the timestamps are sorted.
+  - CSV files with a header naming the timestamp, price and amount columns.
+    Other columns are ignored. Rows are parsed by NumPy's C parser.
+  - Tape files written by tape.TapeWriter.
+"""
+
+import os
+
+import numpy as np
+
+import src.model.market.tape as tape
+import src.model.market.trade_history as trade_history
+
+
+# Columns of a trade history, in the order of its records.
+COLUMNS = ('timestamp', 'price', 'amount')
+
+
+def CheckSorted(timestamps):
+  """Checks that trade times are sorted, as bisecting the history requires.
+
+  Args:
+    timestamps: Array of trade times.
+
+  Raises:
+    ValueError: If a trade is before the trade preceding it.
+  """
+  unsorted = np.flatnonzero(timestamps[1:] < timestamps[:-1])
+  if len(unsorted):
+    raise ValueError('Trade history is not sorted by time at record %d.' %
+                     (unsorted[0] + 1))
+
+
+def _FromColumns(timestamps, prices, amounts):
+  """Creates a trade history from columns after checking them."""
+  CheckSorted(timestamps)
+  return trade_history.TradeHistory.FromArrays(timestamps, prices, amounts)
+
+
+def LoadCsv(path, delimiter=','):
+  """Parses a trade history from a CSV file.
+
+  Args:
+    path: Path of the CSV file. The first line names the columns.
+    delimiter: (optional) Delimiter of the values.
+
+  Returns:
+    TradeHistory with the trades in the file.
+  """
+  with open(path) as csv_file:
+    names = [name.strip() for name in csv_file.readline().split(delimiter)]
+  for name in COLUMNS:
+    if name not in names:
+      raise ValueError('History file %s has no %s column.' % (path, name))
+  values = np.loadtxt(
+      path, delimiter=delimiter, skiprows=1, dtype=np.float64, ndmin=2,
+      usecols=[names.index(name) for name in COLUMNS])
+  return _FromColumns(*[np.ascontiguousarray(values[:, i])
+                        for i in range(len(COLUMNS))])
+
+
+def SaveColumns(history, path):
+  """Writes a trade history as a directory of column files.
+
+  Args:
+    history: TradeHistory to write.
+    path: Path of the directory. It is created if it does not exist.
+  """
+  if not os.path.isdir(path):
+    os.makedirs(path)
+  np.save(os.path.join(path, 'timestamp.npy'), history.Timestamps())
+  np.save(os.path.join(path, 'price.npy'), history.Prices())
+  np.save(os.path.join(path, 'amount.npy'), history.Amounts())
+
+
+def LoadColumns(path):
+  """Memory-maps a trade history written by SaveColumns.
+
+  Columns are read from disk on access and only copied when a trade is
+  appended to the history.
+
+  Args:
+    path: Path of the directory.
+
+  Returns:
+    TradeHistory backed by the column files.
+  """
+  return _FromColumns(*[
+      np.load(os.path.join(path, '%s.npy' % name), mmap_mode='r')
+      for name in COLUMNS])
+
+
+def LoadHistory(path):
+  """Loads a trade history in any supported format.
+
+  Args:
+    path: Path of a columnar directory, a .csv file or a .tape file.
+
+  Returns:
+    TradeHistory with the trades in the file.
+  """
+  if os.path.isdir(path):
+    return LoadColumns(path)
+  extension = os.path.splitext(path)[1].lower()
+  if extension == '.csv':
+    return LoadCsv(path)
+  if extension == '.tape':
+    history = tape.LoadHistory(path)
+    CheckSorted(history.Timestamps())
+    return history
+  raise ValueError('Unknown history format of %s.' % path)
+
+
+def LoadHistories(paths):
+  """Loads the trade histories of several symbols.
+
+  Args:
+    paths: Maps each symbol to the path of its history.
+
+  Returns:
+    Dict of symbol to TradeHistory, which can be given to an exchange.
+  """
+  return dict((symbol, LoadHistory(path)) for symbol, path in paths.items())
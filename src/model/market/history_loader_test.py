@@ -0,0 +1,91 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+import src.model.asset as asset
+import src.model.environment.environment_time as env_time
+import src.model.market.history_loader as history_loader
+import src.model.market.simulated_exchange as sim_exchange
+import src.model.market.tape as tape
+import src.model.market.trade_history as trade_history
+
+
+class TestHistoryLoader(unittest.TestCase):
+  """Test cases for loading trade histories from files."""
+
+  def setUp(self):
+    """Test set up. Called before each test case."""
+    self.tmp_dir = tempfile.mkdtemp()
+
+  def tearDown(self):
+    """Test tear down. Called after each test case."""
+    shutil.rmtree(self.tmp_dir)
+
+  def _WriteCsv(self, name, text):
+    """Writes a CSV file in the test directory and returns its path."""
+    path = os.path.join(self.tmp_dir, name)
+    with open(path, 'w') as csv_file:
+      csv_file.write(text)
+    return path
+
+  def test_LoadCsv_ColumnsByName(self):
+    """CSV columns are found by name and other columns are ignored."""
+    path = self._WriteCsv(
+        'btc.csv', 'amount,id,timestamp,price\n2,7,1,10.5\n3,8,2,11\n')
+    history = history_loader.LoadCsv(path)
+    self.assertEqual([(1, 10.5, 2), (2, 11, 3)], list(history))
+    self.assertEqual(np.float64, history.Timestamps().dtype)
+
+  def test_LoadCsv_MissingColumn(self):
+    """CSV files without a required column are rejected."""
+    path = self._WriteCsv('btc.csv', 'timestamp,price\n1,10\n')
+    with self.assertRaises(ValueError):
+      history_loader.LoadCsv(path)
+
+  def test_Unsorted(self):
+    """Histories that are not sorted by time are rejected."""
+    path = self._WriteCsv(
+        'btc.csv', 'timestamp,price,amount\n1,10,1\n3,10,1\n2,10,1\n')
+    with self.assertRaisesRegex(ValueError, 'at record 2'):
+      history_loader.LoadHistory(path)
+
+  def test_Columns_RoundTrip(self):
+    """Histories saved as columns are memory-mapped back."""
+    history = trade_history.TradeHistory([(0, 10, 1), (1, 11, 2)])
+    path = os.path.join(self.tmp_dir, 'btc')
+    history_loader.SaveColumns(history, path)
+    loaded = history_loader.LoadHistory(path)
+    self.assertEqual(list(history), list(loaded))
+    # The columns are read-only views of the files.
+    self.assertFalse(loaded.Timestamps().flags.writeable)
+    # Appending copies the columns.
+    loaded.Append(2, 12, 1)
+    self.assertEqual(3, len(loaded))
+    self.assertEqual(2, len(history_loader.LoadColumns(path)))
+
+  def test_LoadHistories_SeedExchange(self):
+    """Loaded histories of several formats seed an exchange."""
+    tape_path = os.path.join(self.tmp_dir, 'eth.tape')
+    with tape.TapeWriter(tape_path) as writer:
+      writer.Write(0, 30, 1)
+    csv_path = self._WriteCsv('btc.csv', 'timestamp,price,amount\n0,20,1\n')
+    histories = history_loader.LoadHistories(
+        {asset.Symbols.BTC: csv_path, 'ETH': tape_path})
+    exchange = sim_exchange.SimulatedExchange(
+        time=env_time.IntegerTime(start_time=1, time_unit=1),
+        symbols=[asset.Symbols.BTC, 'ETH'], history=histories)
+    self.assertEqual(20, exchange.GetPrice(asset.Symbols.BTC))
+    self.assertEqual(30, exchange.GetPrice('ETH'))
+
+  def test_UnknownFormat(self):
+    """Files of unknown formats are rejected."""
+    path = self._WriteCsv('btc.txt', '')
+    with self.assertRaises(ValueError):
+      history_loader.LoadHistory(path)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,218 @@
+"""Price-level order book for the simulated exchange."""
+
+import bisect
+import collections
+
+
+# Sides of the order book.
+BID = 'bid'
+ASK = 'ask'
+
+
+class PriceLevel(object):
+  """Orders at one price, with their total amount."""
+
+  __slots__ = ('price', 'orders', 'amount', 'count')
+
+  def __init__(self, price):
+    self.price = price
+    # FIFO queue of orders at this price. May contain removed orders, which
+    # are flagged as removed. The first order is never a removed order.
+    self.orders = collections.deque()
+    # Total unfilled amount of the orders.
+    self.amount = 0
+    # Number of orders that were not removed.
+    self.count = 0
+
+  def DropRemoved(self):
+    """Drop removed orders from the front of the queue."""
+    orders = self.orders
+    while orders and orders[0].removed:
+      orders.popleft()
+
+
+class OrderBook(object):
+  """One side (bids or asks) of an order book.
+
+  Orders are grouped into price levels. Each price level is a FIFO queue, so
+  orders are matched with price-time priority. The price levels are kept in a
+  sorted list of keys with the best price at the end, which makes looking up
+  and removing the best level O(1). Each level keeps the total amount of its
+  orders up to date, so market depth is read without walking the orders.
+
+  Orders removed from the middle of a level (e.g. cancelled orders) are
+  deleted lazily: they are flagged as removed and dropped once they reach the
+  front of the level. Orders must have a removed attribute, which is False
+  while they are in the book.
+
+  The book is not thread-safe. The simulation is single-threaded, so no
+  locking is done.
+  """
+
+  def __init__(self, side):
+    """Initialize an empty side of the book.
+
+    Args:
+      side: BID or ASK.
+    """
+    if side not in (BID, ASK):
+      raise ValueError('Unknown order book side \'%s\'' % side)
+    self.side = side
+    # Bids are keyed by price and asks by -price so the best level is last.
+    self._sign = 1 if side == BID else -1
+    # Price -> PriceLevel.
+    self._levels = {}
+    # Sorted level keys (sign * price). Best price is the last item.
+    self._keys = []
+    # Number of orders in the book.
+    self._size = 0
+
+  def __len__(self):
+    """Number of orders in the book."""
+    return self._size
+
+  def __iter__(self):
+    """Iterate over orders from best to worst priority."""
+    for key in reversed(self._keys):
+      for order in self._levels[key * self._sign].orders:
+        if not order.removed:
+          yield order
+
+  def _GetLevel(self, price):
+    """Get the level for the given price, creating it if needed."""
+    level = self._levels.get(price)
+    if level is None:
+      level = PriceLevel(price)
+      self._levels[price] = level
+      bisect.insort(self._keys, self._sign * price)
+    return level
+
+  def Put(self, order):
+    """Add an order to the back of its price level.
+
+    Args:
+      order: Order with a price attribute.
+    """
+    level = self._GetLevel(order.price)
+    level.orders.append(order)
+    level.amount += order.amount
+    level.count += 1
+    self._size += 1
+
+  def _RemoveLevel(self, level):
+    """Remove a level without orders from the book."""
+    del self._levels[level.price]
+    key = self._sign * level.price
+    del self._keys[bisect.bisect_left(self._keys, key)]
+
+  def Remove(self, order):
+    """Remove an order from anywhere in the book.
+
+    The order is flagged as removed and its amount is set to zero.
+
+    Args:
+      order: Order in this book.
+    """
+    level = self._levels[order.price]
+    level.amount -= order.amount
+    level.count -= 1
+    order.amount = 0
+    order.removed = True
+    self._size -= 1
+    if not level.count:
+      self._RemoveLevel(level)
+    else:
+      level.DropRemoved()
+
+  def BestPrice(self):
+    """Gets the best price in the book, or None if the book is empty."""
+    if not self._keys:
+      return None
+    return self._keys[-1] * self._sign
+
+  def Peek(self):
+    """Gets the order with the highest priority without removing it.
+
+    Returns:
+      The best order, or None if the book is empty.
+    """
+    if not self._keys:
+      return None
+    return self._levels[self._keys[-1] * self._sign].orders[0]
+
+  def FillBest(self, amount):
+    """Fills the order with the highest priority in place.
+
+    The order's amount is reduced by the given amount. The order is removed
+    from the book once it is completely filled.
+
+    Args:
+      amount: Amount of the order that was filled.
+
+    Returns:
+      The filled order.
+    """
+    level = self._levels[self._keys[-1] * self._sign]
+    order = level.orders[0]
+    order.amount -= amount
+    level.amount -= amount
+    if order.amount <= 0:
+      self.Pop()
+    return order
+
+  def Pop(self):
+    """Removes and returns the order with the highest priority.
+
+    Returns:
+      The best order, or None if the book is empty.
+    """
+    if not self._keys:
+      return None
+    price = self._keys[-1] * self._sign
+    level = self._levels[price]
+    order = level.orders.popleft()
+    level.amount -= order.amount
+    level.count -= 1
+    if not level.count:
+      # Price level is empty. Remove it.
+      del self._levels[price]
+      self._keys.pop()
+    else:
+      level.DropRemoved()
+    self._size -= 1
+    return order
+
+  def GetAmountAtOrBetter(self, price, amount=None):
+    """Gets the total amount of orders at the given price or better.
+
+    Args:
+      price: Worst price to include.
+      amount: (optional) Stop adding levels once this amount is reached.
+
+    Returns:
+      Total amount of the orders at the included price levels.
+    """
+    worst_key = self._sign * price
+    total = 0
+    for key in reversed(self._keys):
+      if key < worst_key or (amount is not None and total >= amount):
+        break
+      total += self._levels[key * self._sign].amount
+    return total
+
+  def GetDepth(self, levels=None):
+    """Gets the aggregated amounts of the best price levels.
+
+    Args:
+      levels: (optional) Maximum number of price levels. All if None.
+
+    Returns:
+      List of (price, total amount, number of orders) tuples, best first.
+    """
+    keys = self._keys
+    num_levels = len(keys) if levels is None else min(levels, len(keys))
+    depth = []
+    for i in range(1, num_levels + 1):
+      level = self._levels[keys[-i] * self._sign]
+      depth.append((level.price, level.amount, level.count))
+    return depth
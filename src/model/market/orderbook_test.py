@@ -0,0 +1,98 @@
+import unittest
+
+import src.model.market.orderbook as orderbook
+
+
+class FakeOrder(object):
+  """Minimal order for testing the book."""
+
+  def __init__(self, id, price, amount=1):
+    self.id = id
+    self.price = price
+    self.amount = amount
+    self.removed = False
+
+
+class TestOrderBook(unittest.TestCase):
+  """Test cases for the price-level order book."""
+
+  def test_EmptyBook(self):
+    """Empty book has no best price or order."""
+    book = orderbook.OrderBook(orderbook.BID)
+    self.assertEqual(0, len(book))
+    self.assertIsNone(book.BestPrice())
+    self.assertIsNone(book.Peek())
+    self.assertIsNone(book.Pop())
+
+  def test_Bids_HighestPriceFirst(self):
+    """Bids are ordered by descending price, then arrival."""
+    book = orderbook.OrderBook(orderbook.BID)
+    book.Put(FakeOrder(id=1, price=5))
+    book.Put(FakeOrder(id=2, price=7))
+    book.Put(FakeOrder(id=3, price=5))
+    book.Put(FakeOrder(id=4, price=float('inf')))
+    self.assertEqual(float('inf'), book.BestPrice())
+    self.assertEqual([4, 2, 1, 3], [order.id for order in book])
+    self.assertEqual([4, 2, 1, 3], [book.Pop().id for _ in range(4)])
+    self.assertEqual(0, len(book))
+
+  def test_Asks_LowestPriceFirst(self):
+    """Asks are ordered by ascending price, then arrival."""
+    book = orderbook.OrderBook(orderbook.ASK)
+    book.Put(FakeOrder(id=1, price=5))
+    book.Put(FakeOrder(id=2, price=3))
+    book.Put(FakeOrder(id=3, price=3))
+    book.Put(FakeOrder(id=4, price=-float('inf')))
+    self.assertEqual(-float('inf'), book.BestPrice())
+    self.assertEqual([4, 2, 3, 1], [book.Pop().id for _ in range(4)])
+
+  def test_FillBest_PartialFillKeepsPriority(self):
+    """Partially filled order stays at the front of its level."""
+    book = orderbook.OrderBook(orderbook.ASK)
+    book.Put(FakeOrder(id=1, price=3, amount=5))
+    book.Put(FakeOrder(id=2, price=3, amount=5))
+    filled = book.FillBest(2)
+    self.assertEqual(1, filled.id)
+    self.assertEqual(3, filled.amount)
+    self.assertIs(filled, book.Peek())
+    self.assertEqual(2, len(book))
+
+  def test_FillBest_FilledOrderRemoved(self):
+    """Completely filled order is removed from the book."""
+    book = orderbook.OrderBook(orderbook.BID)
+    book.Put(FakeOrder(id=1, price=3, amount=5))
+    book.Put(FakeOrder(id=2, price=2, amount=5))
+    book.FillBest(5)
+    self.assertEqual(2, book.Peek().id)
+    self.assertEqual(2, book.BestPrice())
+    self.assertEqual(1, len(book))
+
+  def test_GetDepth_AggregatesLevels(self):
+    """Depth has the total amount and order count of the best levels."""
+    book = orderbook.OrderBook(orderbook.BID)
+    book.Put(FakeOrder(id=1, price=3, amount=5))
+    book.Put(FakeOrder(id=2, price=4, amount=1))
+    book.Put(FakeOrder(id=3, price=3, amount=2))
+    book.Put(FakeOrder(id=4, price=1, amount=2))
+    self.assertEqual([(4, 1, 1), (3, 7, 2)], book.GetDepth(2))
+    # Fills update the totals.
+    book.FillBest(1)
+    book.FillBest(2)
+    self.assertEqual([(3, 5, 2), (1, 2, 1)], book.GetDepth())
+
+  def test_Remove_OrderSkippedAndLevelUpdated(self):
+    """Removed orders leave the depth and are skipped when matching."""
+    book = orderbook.OrderBook(orderbook.ASK)
+    orders = [FakeOrder(id=i, price=3, amount=1) for i in range(3)]
+    for order in orders:
+      book.Put(order)
+    book.Put(FakeOrder(id=3, price=4, amount=1))
+    book.Remove(orders[1])
+    self.assertEqual([(3, 2, 2), (4, 1, 1)], book.GetDepth())
+    self.assertEqual([0, 2, 3], [order.id for order in book])
+    book.Pop()
+    self.assertEqual(2, book.Pop().id)
+    # Removing the last order of a level removes the level.
+    book.Remove(book.Peek())
+    self.assertEqual(0, len(book))
+    self.assertIsNone(book.BestPrice())
@@ -0,0 +1,352 @@
+"""Exchange that replays recorded market data.
+
+Recorded trades and quotes are read in chunks of bounded size, from a tape
+file or a CSV file, and replayed in step with the exchange's time. Agents'
+orders rest in the exchange's book as on SimulatedExchange and are filled
+against the replayed market at the end of each timestep.
+"""
+
+import itertools
+
+import numpy as np
+
+import src.model.asset as asset
+import src.model.market.orderbook as orderbook
+import src.model.market.simulated_exchange as sim_exchange
+import src.model.market.tape as tape
+import src.model.market.trade_history as trade_history
+import src.util.events as events
+
+
+# Default number of records read at once.
+DEFAULT_CHUNK_SIZE = 65536
+
+# Replayed record. Trades have a price and an amount, quotes the best bid and
+# ask with their sizes. Missing values are NaN.
+REPLAY_DTYPE = np.dtype([
+    ('timestamp', '<f8'),
+    ('price', '<f8'),
+    ('amount', '<f8'),
+    ('bid', '<f8'),
+    ('bid_size', '<f8'),
+    ('ask', '<f8'),
+    ('ask_size', '<f8'),
+])
+
+
+def _ToReplayRecords(columns, length):
+  """Creates REPLAY_DTYPE records from a dict or array of named columns."""
+  records = np.empty(length, dtype=REPLAY_DTYPE)
+  for name in REPLAY_DTYPE.names:
+    if name in columns:
+      records[name] = columns[name]
+    else:
+      records[name] = np.nan
+  return records
+
+
+def ReadTapeChunks(path, chunk_size=DEFAULT_CHUNK_SIZE):
+  """Reads the trades of a tape file in chunks.
+
+  Args:
+    path: Path of a tape file written by tape.TapeWriter.
+    chunk_size: (optional) Number of trades per chunk.
+
+  Yields:
+    Arrays of REPLAY_DTYPE records without quotes.
+  """
+  with open(path, 'rb') as tape_file:
+    while True:
+      records = np.fromfile(tape_file, dtype=tape.RECORD_DTYPE,
+                            count=chunk_size)
+      if not len(records):
+        return
+      yield _ToReplayRecords(
+          {name: records[name] for name in tape.RECORD_DTYPE.names},
+          len(records))
+
+
+def ReadCsvChunks(path, chunk_size=DEFAULT_CHUNK_SIZE):
+  """Reads the trades and quotes of a CSV file in chunks.
+
+  The first line names the columns, which are fields of REPLAY_DTYPE in any
+  order. A timestamp column is required. Missing columns and empty values
+  are NaN, so trade and quote rows can be mixed in one file.
+
+  Args:
+    path: Path of the CSV file.
+    chunk_size: (optional) Number of rows per chunk.
+
+  Yields:
+    Arrays of REPLAY_DTYPE records.
+  """
+  with open(path) as csv_file:
+    names = [name.strip() for name in csv_file.readline().split(',')]
+    for name in names:
+      if name not in REPLAY_DTYPE.names:
+        raise ValueError('Unknown replay column \'%s\'' % name)
+    if 'timestamp' not in names:
+      raise ValueError('Replay file has no timestamp column.')
+    while True:
+      lines = list(itertools.islice(csv_file, chunk_size))
+      if not lines:
+        return
+      values = np.genfromtxt(lines, delimiter=',', dtype=np.float64)
+      values = values.reshape(len(lines), len(names))
+      yield _ToReplayRecords(
+          {name: values[:, i] for i, name in enumerate(names)}, len(lines))
+
+
+class ReplayFeed(object):
+  """Replays chunks of records in time order.
+
+  Only the current chunk is kept in memory, so feeds of any length are
+  replayed in bounded memory.
+  """
+
+  def __init__(self, chunks):
+    """Initialize the feed.
+
+    Args:
+      chunks: Iterable of REPLAY_DTYPE arrays, such as ReadTapeChunks or
+        ReadCsvChunks. Records must be sorted by time.
+    """
+    self._chunks = iter(chunks)
+    self._chunk = None
+    # Index of the next record in the current chunk.
+    self._offset = 0
+    self._last_timestamp = -np.inf
+
+  def _NextChunk(self):
+    """Reads the next non-empty chunk. Returns False at the end of the feed."""
+    for chunk in self._chunks:
+      if not len(chunk):
+        continue
+      timestamps = chunk['timestamp']
+      if (timestamps[0] < self._last_timestamp or
+          np.any(timestamps[1:] < timestamps[:-1])):
+        raise ValueError('Replay records are not sorted by time.')
+      self._last_timestamp = timestamps[-1]
+      self._chunk = chunk
+      self._offset = 0
+      return True
+    self._chunk = None
+    return False
+
+  def Peek(self):
+    """Gets the next record, or None at the end of the feed."""
+    if self._chunk is None and not self._NextChunk():
+      return None
+    return self._chunk[self._offset]
+
+  def Advance(self, end):
+    """Replays the records before the given time.
+
+    Args:
+      end: Time up to which records are replayed, exclusive.
+
+    Yields:
+      Arrays of consecutive records, each a view of one chunk.
+    """
+    while self._chunk is not None or self._NextChunk():
+      stop = int(np.searchsorted(
+          self._chunk['timestamp'], end, side='left'))
+      if stop > self._offset:
+        yield self._chunk[self._offset:stop]
+        self._offset = stop
+      if stop < len(self._chunk):
+        return
+      self._chunk = None
+
+
+class ReplayExchange(sim_exchange.SimulatedExchange):
+  """Exchange whose market is replayed from recorded data.
+
+  The last price and volume of each timestep's replayed trades are added to
+  the history, so prices, candles and indicators follow the recording.
+  Agents' orders are matched with each
+  other as on SimulatedExchange. Orders that are still in the book at the
+  end of a timestep are filled against the replayed market of that
+  timestep: against the latest quote if the data has quotes, and otherwise
+  at the price of the timestep's last replayed trade, up to its traded
+  volume on each side. Agents decide on data up to the previous timestep,
+  so there is no look-ahead. Fills against the replay are not added to the
+  history, which only contains the recorded trades and agents' trades with
+  each other.
+
+  IOC and FOK orders are cancelled before the end of the timestep and only
+  trade with other agents.
+  """
+
+  def __init__(self, *args, **kwargs):
+    """Initialize the exchange.
+
+    Records before the exchange's current time are added to the history.
+
+    Args:
+      time: Time reference used on this exchange.
+      symbols: Symbols traded on this exchange.
+      feeds: Maps each symbol to a ReplayFeed or an iterable of chunks of
+        REPLAY_DTYPE records.
+      history: (optional) History for assets on this exchange before the
+        replayed data. Defaults to the records before the current time, or
+        the price of the first record.
+      replay_history: (optional) Add every replayed trade to the history
+        instead of only the last price and the total volume of each
+        timestep. The history then holds 24 bytes per replayed trade and
+        grows with the size of the data, unless the symbol has a tape and a
+        history_window is given. Defaults to False, so the history grows
+        with the number of timesteps, but candles shorter than a timestep
+        and the prices within a timestep are not kept.
+      Other arguments are those of SimulatedExchange.
+    """
+    time_obj = kwargs['time']
+    self.feeds = {}
+    for symbol, feed in kwargs['feeds'].items():
+      if not isinstance(feed, ReplayFeed):
+        feed = ReplayFeed(feed)
+      self.feeds[symbol] = feed
+    self.replay_history = kwargs.get('replay_history', False)
+    # Latest [bid, bid size, ask, ask size] of each symbol with quotes. The
+    # sizes are reduced by fills against the quote.
+    self.quotes = {}
+    history = dict(kwargs.get('history', {}))
+    for symbol in kwargs['symbols']:
+      if symbol not in self.feeds:
+        raise ValueError('No replay feed given for symbol \'%s\'' % symbol)
+      if symbol in history:
+        continue
+      # Start with the records before the current time.
+      symbol_history = trade_history.TradeHistory()
+      self._ReplayRecords(symbol, symbol_history, time_obj.GetCurrentTime())
+      if not len(symbol_history):
+        first = self.feeds[symbol].Peek()
+        if first is not None and np.isfinite(first['price']):
+          symbol_history.Append(first['timestamp'], first['price'], 0)
+      history[symbol] = symbol_history
+    kwargs['history'] = history
+    sim_exchange.SimulatedExchange.__init__(self, *args, **kwargs)
+
+  def GetQuote(self, symbol):
+    """Gets the latest replayed quote for the given stock.
+
+    Returns:
+      (bid, bid size, ask, ask size) tuple, or None if no quote was
+      replayed.
+    """
+    quote = self.quotes.get(symbol)
+    return tuple(quote) if quote is not None else None
+
+  def EndTimestep(self):
+    """Replay the timestep's records, then end the timestep."""
+    end = self.time.TimeDelta(self.time.GetCurrentTime(), 1)
+    for symbol in self.symbols:
+      self._Replay(symbol, end)
+    sim_exchange.SimulatedExchange.EndTimestep(self)
+
+  def _ReplayRecords(self, symbol, history, end):
+    """Add the replayed trades before end to a history.
+
+    The latest replayed quote is kept in self.quotes.
+
+    Returns:
+      (last price, volume) of the replayed trades, or None if there were no
+      trades.
+    """
+    last_trade = None
+    volume = 0.0
+    for records in self.feeds[symbol].Advance(end):
+      quoted = np.isfinite(records['bid']) | np.isfinite(records['ask'])
+      if quoted.any():
+        quote = records[np.flatnonzero(quoted)[-1]]
+        bid, ask = quote['bid'].item(), quote['ask'].item()
+        self.quotes[symbol] = [
+            bid, quote['bid_size'].item() if np.isfinite(bid) else 0.0,
+            ask, quote['ask_size'].item() if np.isfinite(ask) else 0.0]
+      trades = records[np.isfinite(records['price'])]
+      if not len(trades):
+        continue
+      if self.replay_history:
+        history.Extend(
+            trades['timestamp'], trades['price'], trades['amount'])
+      last_trade = (trades['timestamp'][-1].item(),
+                    trades['price'][-1].item())
+      volume += trades['amount'].sum().item()
+    if last_trade is None:
+      return None
+    if not self.replay_history:
+      history.Append(last_trade[0], last_trade[1], volume)
+    return last_trade[1], volume
+
+  def _Replay(self, symbol, end):
+    """Replay the records before end and fill resting orders against them."""
+    trade = self._ReplayRecords(symbol, self._GetTradeHistory(symbol), end)
+    quote = self.quotes.get(symbol)
+    if quote is None:
+      if trade is None:
+        return
+      # Liquidity at the last traded price.
+      price, volume = trade
+      quote = [price, volume, price, volume]
+    self._MatchReplay(symbol, quote)
+    self._OrdersProcessed(symbol)
+
+  def _MatchReplay(self, symbol, quote):
+    """Fill the best orders in the book against a replayed quote.
+
+    Args:
+      symbol: Name of the stock.
+      quote: [bid, bid size, ask, ask size] list. The sizes are reduced by
+        the filled amounts.
+    """
+    bid_q = self.bids[symbol]
+    while quote[3] > 0 and len(bid_q) and bid_q.Peek().price >= quote[2]:
+      bid = bid_q.Peek()
+      amount = min(bid.amount, quote[3])
+      self._ExecuteReplayTrade(amount, quote[2], bid)
+      quote[3] -= amount
+    ask_q = self.asks[symbol]
+    while quote[1] > 0 and len(ask_q) and ask_q.Peek().price <= quote[0]:
+      ask = ask_q.Peek()
+      amount = min(ask.amount, quote[1])
+      self._ExecuteReplayTrade(amount, quote[0], ask)
+      quote[1] -= amount
+
+  def _ExecuteReplayTrade(self, amount, price, order):
+    """Fill the best order on one side of the book against the replay.
+
+    The other side of the trade is the replayed market, which is outside the
+    simulation.
+
+    Args:
+      amount: Amount of asset being traded.
+      price: Price per unit of asset.
+      order: The best bid or ask.
+    """
+    symbol = order.symbol
+    cash = price * amount
+    if order.side == orderbook.BID:
+      if order.price == self.inf:
+        # Market order -- take cash now.
+        order.wallet.RemoveAmount(asset.Symbols.USD, cash)
+      else:
+        # Limit order -- cash was reserved on exchange. Return the change.
+        expected_cash = order.price * amount
+        self._TakeReserved(order.wallet, asset.Symbols.USD, expected_cash)
+        order.wallet.AddAmount(asset.Symbols.USD, expected_cash - cash)
+      order.wallet.AddAmount(symbol, amount)
+      self.bids[symbol].FillBest(amount)
+      bid_id, ask_id = order.id, -1
+    else:
+      # Shares were reserved on exchange.
+      self._TakeReserved(order.wallet, symbol, amount)
+      order.wallet.AddAmount(asset.Symbols.USD, cash)
+      self.asks[symbol].FillBest(amount)
+      bid_id, ask_id = -1, order.id
+    if order.amount <= 0:
+      del self.orders[order.id]
+    if self.events:
+      self.events.Emit(events.FILL, self.time.GetCurrentTime(), symbol,
+                       bid_id, ask_id, price, amount)
+    if self.profiler:
+      self.profiler.Count('exchange.replay_fills')
@@ -0,0 +1,211 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+import src.model.asset as asset
+import src.model.environment.environment as env
+import src.model.environment.environment_time as env_time
+import src.model.market.replay as replay
+import src.model.market.tape as tape
+import src.model.trader.strategies.strategies as strategies
+import src.model.wallet as wallet
+
+
+class TestReplayFeed(unittest.TestCase):
+  """Test cases for reading and replaying recorded data."""
+
+  def setUp(self):
+    """Test set up. Called before each test case."""
+    self.tmp_dir = tempfile.mkdtemp()
+
+  def tearDown(self):
+    """Test tear down. Called after each test case."""
+    shutil.rmtree(self.tmp_dir)
+
+  def test_TapeChunks(self):
+    """A tape is read in chunks of trades without quotes."""
+    path = os.path.join(self.tmp_dir, 'btc.tape')
+    with tape.TapeWriter(path) as writer:
+      for t in range(5):
+        writer.Write(t, 10 + t, 1)
+    chunks = list(replay.ReadTapeChunks(path, chunk_size=2))
+    self.assertEqual([2, 2, 1], [len(chunk) for chunk in chunks])
+    self.assertEqual(14, chunks[-1]['price'][0])
+    self.assertTrue(np.isnan(chunks[0]['bid']).all())
+
+  def test_CsvChunks_TradesAndQuotes(self):
+    """Trade and quote rows of a CSV file are read with NaN for gaps."""
+    path = os.path.join(self.tmp_dir, 'btc.csv')
+    with open(path, 'w') as csv_file:
+      csv_file.write('timestamp,price,amount,bid,ask\n')
+      csv_file.write('0,10,2,,\n')
+      csv_file.write('1,,,9,11\n')
+      csv_file.write('2,10.5,1,,\n')
+    chunks = list(replay.ReadCsvChunks(path, chunk_size=2))
+    self.assertEqual([2, 1], [len(chunk) for chunk in chunks])
+    self.assertEqual(9, chunks[0]['bid'][1])
+    self.assertTrue(np.isnan(chunks[0]['price'][1]))
+    self.assertTrue(np.isnan(chunks[0]['bid_size']).all())
+    self.assertEqual(10.5, chunks[1]['price'][0])
+
+  def test_Advance_AcrossChunks(self):
+    """Records are replayed up to a time across chunk boundaries."""
+    chunks = [replay._ToReplayRecords({'timestamp': ts, 'price': ts}, len(ts))
+              for ts in ([0, 1, 1], [1, 2], [4])]
+    feed = replay.ReplayFeed(chunks)
+    self.assertEqual([[0]], [r['timestamp'].tolist() for r in feed.Advance(1)])
+    self.assertEqual([[1, 1], [1]],
+                     [r['timestamp'].tolist() for r in feed.Advance(2)])
+    self.assertEqual([], list(feed.Advance(2)))
+    self.assertEqual(2, feed.Peek()['timestamp'])
+    self.assertEqual([[2], [4]],
+                     [r['timestamp'].tolist() for r in feed.Advance(10)])
+    self.assertIsNone(feed.Peek())
+
+  def test_Advance_UnsortedRecords(self):
+    """Records out of time order are rejected."""
+    chunks = [replay._ToReplayRecords({'timestamp': ts}, len(ts))
+              for ts in ([0, 2], [1])]
+    feed = replay.ReplayFeed(chunks)
+    with self.assertRaises(ValueError):
+      list(feed.Advance(10))
+
+
+class TestReplayExchange(unittest.TestCase):
+  """Test cases for trading against replayed data."""
+
+  def _Records(self, **columns):
+    """Makes replay records from lists of values."""
+    return replay._ToReplayRecords(columns, len(columns['timestamp']))
+
+  def setUp(self):
+    """Test set up. Called before each test case."""
+    self.time_obj = env_time.IntegerTime(start_time=1, time_unit=1)
+    initial_balance = {asset.Symbols.USD: 100, asset.Symbols.BTC: 100}
+    self.buyer_wallet = wallet.Wallet(initial_balance)
+    self.seller_wallet = wallet.Wallet(initial_balance)
+
+  def _NewExchange(self, records, **kwargs):
+    """Creates a replay exchange for BTC from chunks of records."""
+    return replay.ReplayExchange(
+        time=self.time_obj, symbols=[asset.Symbols.BTC],
+        feeds={asset.Symbols.BTC: records}, **kwargs)
+
+  def test_HistoryFollowsReplay(self):
+    """Replayed trades are added to the history at the end of each step."""
+    exchange = self._NewExchange([self._Records(
+        timestamp=[0, 1, 1, 2], price=[10, 11, 12, 13], amount=[1, 1, 1, 1])],
+        replay_history=True)
+    # Records before the start time are the initial history.
+    self.assertEqual(10, exchange.GetPrice(asset.Symbols.BTC))
+    exchange.EndTimestep()
+    self.assertEqual(12, exchange.GetPrice(asset.Symbols.BTC))
+    self.assertEqual(3, exchange.GetNumTrades(asset.Symbols.BTC))
+    self.time_obj.Step()
+    exchange.EndTimestep()
+    self.assertEqual(13, exchange.GetPrice(asset.Symbols.BTC))
+
+  def test_ReplayHistoryPerStep(self):
+    """By default, each step adds one trade with its volume."""
+    exchange = self._NewExchange([self._Records(
+        timestamp=[0, 1, 1], price=[10, 11, 12], amount=[1, 2, 3])])
+    exchange.EndTimestep()
+    self.assertEqual([(0, 10, 1), (1, 12, 5)],
+                     list(exchange.history[asset.Symbols.BTC]))
+
+  def test_RestingOrdersFilledAgainstTrades(self):
+    """Crossing orders are filled at the replayed price up to its volume."""
+    exchange = self._NewExchange([self._Records(
+        timestamp=[0, 1, 1], price=[10, 11, 12], amount=[1, 1, 1])])
+    bid_id = exchange.Buy(asset.Symbols.BTC, 3, self.buyer_wallet, price=13)
+    exchange.Sell(asset.Symbols.BTC, 1, self.seller_wallet, price=15)
+    exchange.EndTimestep()
+
+    # The bid bought the step's volume of 2 at the last price.
+    self.assertEqual(102, self.buyer_wallet.GetAmount(asset.Symbols.BTC))
+    self.assertEqual(100 - 3 * 13 + 2 * 13 - 2 * 12,
+                     self.buyer_wallet.GetAmount(asset.Symbols.USD))
+    depth = exchange.GetDepth(asset.Symbols.BTC)
+    self.assertEqual([(13, 1, 1)], depth['bids'])
+    # The ask above the replayed price stays in the book.
+    self.assertEqual([(15, 1, 1)], depth['asks'])
+    # Fills against the replay are not in the history.
+    self.assertEqual(2, exchange.GetNumTrades(asset.Symbols.BTC))
+    self.assertTrue(exchange.Cancel(bid_id))
+
+  def test_RestingOrdersFilledAgainstQuotes(self):
+    """Orders crossing the replayed quote are filled at the quote."""
+    exchange = self._NewExchange(
+        [self._Records(timestamp=[0, 1], price=[10, np.nan],
+                       amount=[1, np.nan], bid=[np.nan, 9],
+                       bid_size=[np.nan, 2], ask=[np.nan, 11],
+                       ask_size=[np.nan, 5])])
+    exchange.Buy(asset.Symbols.BTC, 1, self.buyer_wallet, price=7)
+    exchange.Sell(asset.Symbols.BTC, 3, self.seller_wallet, price=8)
+    exchange.EndTimestep()
+
+    self.assertEqual((9, 0, 11, 5), exchange.GetQuote(asset.Symbols.BTC))
+    self.assertEqual(100 + 2 * 9,
+                     self.seller_wallet.GetAmount(asset.Symbols.USD))
+    depth = exchange.GetDepth(asset.Symbols.BTC)
+    self.assertEqual([(8, 1, 1)], depth['asks'])
+    # The bid below the replayed ask stays in the book.
+    self.assertEqual([(7, 1, 1)], depth['bids'])
+
+  def test_LongTape_BoundedHistory(self):
+    """Replaying a long tape keeps a bounded history in memory."""
+    tmp_dir = tempfile.mkdtemp()
+    try:
+      path = os.path.join(tmp_dir, 'recorded.tape')
+      with tape.TapeWriter(path) as writer:
+        for t in range(5000):
+          writer.Write(t // 50, 20 + t % 7, 1)
+      # By default, one trade per timestep.
+      self.time_obj = env_time.IntegerTime(start_time=0, time_unit=1)
+      exchange = self._NewExchange(replay.ReadTapeChunks(path, chunk_size=256))
+      # With every replayed trade, older trades are kept on a tape.
+      history_tape = tape.TapeWriter(os.path.join(tmp_dir, 'btc.tape'))
+      full_exchange = self._NewExchange(
+          replay.ReadTapeChunks(path, chunk_size=256), replay_history=True,
+          tapes={asset.Symbols.BTC: history_tape}, history_window=64)
+      for _ in range(100):
+        exchange.EndTimestep()
+        full_exchange.EndTimestep()
+        self.time_obj.Step()
+      # The history starts with the price of the first record.
+      history = exchange.history[asset.Symbols.BTC]
+      self.assertEqual(101, len(history))
+      self.assertEqual((99, 20 + 4999 % 7, 50), history[-1])
+      full_history = full_exchange.history[asset.Symbols.BTC]
+      self.assertEqual(5001, len(full_history))
+      self.assertLessEqual(len(full_history._timestamps), 128)
+      self.assertEqual(tape.ReadTape(path)['price'].tolist(),
+                       full_history.Prices()[1:].tolist())
+      history_tape.Close()
+    finally:
+      shutil.rmtree(tmp_dir)
+
+  def test_EnvironmentRun(self):
+    """Agents trade on a replay exchange in a simulation."""
+    rng = np.random.default_rng(0)
+    timestamps = np.repeat(np.arange(20), 5)
+    prices = 20 + np.cumsum(rng.integers(-1, 2, size=len(timestamps)))
+    chunks = [self._Records(timestamp=timestamps[i:i + 7],
+                            price=prices[i:i + 7],
+                            amount=np.ones(len(timestamps[i:i + 7])))
+              for i in range(0, len(timestamps), 7)]
+    exchange = self._NewExchange(chunks)
+    environment = env.TradingEnvironment(
+        time=self.time_obj, exchanges=[exchange], seed=0)
+    environment.GenerateAgents(
+        20, {strategies.RandomStrategy(): 1.0},
+        {asset.Symbols.USD: 1000, asset.Symbols.BTC: 10})
+    environment.Run(timesteps=10)
+    self.assertEqual(prices[54], exchange.GetPrice(asset.Symbols.BTC))
+
+
+if __name__ == '__main__':
+  unittest.main()
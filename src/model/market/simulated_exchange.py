@@ -1,17 +1,68 @@
+import heapq
+import time
 
-
-import bisect
-import collections
-import Queue
+import numpy as np
 
 import src.model.asset as asset
+import src.model.market.candles as candles
 import src.model.market.exchange as exchange
+import src.model.market.orderbook as orderbook
+import src.model.market.tape as tape_lib
+import src.model.market.trade_history as trade_history
 import src.model.wallet as wallet
-
-
-# Define order object.
-Order = collections.namedtuple(
-    'Order', 'id, symbol, price, amount, wallet')
+import src.util.enum as enum
+import src.util.events as events
+
+
+# How orders are matched on the exchange.
+MatchingMode = enum.enum(
+  # Orders are matched as soon as they are placed.
+  CONTINUOUS='continuous',
+  # Orders are collected and matched at one price per symbol at the end of
+  # each timestep.
+  AUCTION='auction',
+)
+
+# How long orders stay in the book.
+TimeInForce = enum.enum(
+  # Good till cancelled.
+  GTC='gtc',
+  # Immediate or cancel: the unfilled part is cancelled right away.
+  IOC='ioc',
+  # Fill or kill: the order is cancelled unless it can be filled at once.
+  FOK='fok',
+  # Good till time: the order is cancelled after a number of time units.
+  GTT='gtt',
+)
+
+
+class Order(object):
+  """Order resting on the exchange.
+
+  The amount is the unfilled part of the order. It is reduced in place as the
+  order is filled, so the order keeps its place in the book. Cancelled orders
+  are flagged as removed until the book drops them.
+  """
+
+  __slots__ = ('id', 'side', 'symbol', 'price', 'amount', 'wallet', 'removed')
+
+  def __init__(self, id, side, symbol, price, amount, wallet, removed=False):
+    self.id = id
+    self.side = side
+    self.symbol = symbol
+    self.price = price
+    self.amount = amount
+    self.wallet = wallet
+    self.removed = removed
+
+  def __reduce__(self):
+    # Pickle compactly as a constructor call.
+    return Order, (self.id, self.side, self.symbol, self.price, self.amount,
+                   self.wallet, self.removed)
+
+  def __repr__(self):
+    return 'Order(id=%r, side=%r, symbol=%r, price=%r, amount=%r)' % (
+        self.id, self.side, self.symbol, self.price, self.amount)
 
 
 class SimulatedExchange(exchange.Exchange):
@@ -26,37 +77,83 @@ class SimulatedExchange(exchange.Exchange):
     Args:
       time: Time reference used on this exchange.
       symbols: Symbols traded on this exchange.
-      history: History for assets on this exchange.
+      history: History for assets on this exchange. Maps each symbol to a
+        TradeHistory or a list of (timestamp, price, amount) tuples.
+      tapes: (optional) Maps symbols to TapeWriters that record every trade.
+      history_window: (optional) Number of latest trades of a symbol with a
+        tape kept in memory. Older trades are read from the tape. The whole
+        history is kept in memory if None.
+      matching: (optional) MatchingMode of the exchange. Defaults to
+        continuous matching.
+      profiler: (optional) Profiler timing the exchange's phases.
+      events: (optional) events.EventBuffer receiving order, cancel and fill
+        events. If only a logger is given, a buffer logging the events at
+        the end of each timestep is created. An environment replaces it with
+        its own buffer.
     """
     # Time reference for this exchange.
     self.time = kwargs['time']
     # List of stocks on this exchange.
     self.symbols = kwargs['symbols']
     self.history = kwargs['history']
-    self.cached_history = {}
+    # Candles are kept up to date with the history.
+    self.candles = {}
     # Make sure there is history for every symbol.
     for symbol in self.symbols:
       if (symbol not in self.history) or (len(self.history[symbol]) == 0):
         raise ValueError('No history given for symbol \'%s\'' % symbol)
-      # Candles are cached in (timestamp, candle_size, candles) format.
-      self.cached_history[symbol] = (None, None, None)
-    # Order queues.
+      self._GetTradeHistory(symbol)
+      self.candles[symbol] = candles.CandleStore(self.time)
+    # Order books.
     self.bids = {}
     self.asks = {}
     # Keep track of order arrival.
     self.trade_id = 0
+    # Orders in the books by id.
+    self.orders = {}
+    # Heap of (expiration time, order id) for good-till-time orders.
+    self.expirations = []
     # Initialize orderbook for each stock.
     for symbol in self.symbols:
       # orderbook for this symbol
-      self.bids[symbol] = Queue.PriorityQueue()  #populate?
-      self.asks[symbol] = Queue.PriorityQueue()  #populate?
+      self.bids[symbol] = orderbook.OrderBook(orderbook.BID)
+      self.asks[symbol] = orderbook.OrderBook(orderbook.ASK)
     # Trade pool where assets are held for trade.
     self.wallet = wallet.Wallet()
+    # Owner's wallet -> Wallet with the owner's part of the trade pool.
+    self.reserved = {}
+    # Tapes where executed trades are recorded.
+    if 'tapes' in kwargs:
+      self.tapes = kwargs['tapes']
+    else:
+      self.tapes = {}
+    # Histories of symbols with a tape keep only their latest trades.
+    history_window = kwargs.get('history_window')
+    if history_window is not None:
+      for symbol, tape in self.tapes.items():
+        self.history[symbol] = tape_lib.TapeHistory(
+            tape, self._GetTradeHistory(symbol), window=history_window)
+    # Matching mode.
+    if 'matching' in kwargs:
+      self.matching = kwargs['matching']
+    else:
+      self.matching = MatchingMode.CONTINUOUS
+    if self.matching not in (MatchingMode.CONTINUOUS, MatchingMode.AUCTION):
+      raise ValueError('Unknown matching mode \'%s\'' % self.matching)
     # Logging
     if 'logger' in kwargs:
       self.logger = kwargs['logger']
     else:
       self.logger = None
+    # Structured events, formatted off the order path. A buffer created for
+    # the logger is replaced by the buffer of the environment, if any.
+    self.events = kwargs.get('events')
+    self.events_from_logger = self.events is None and bool(self.logger)
+    if self.events_from_logger:
+      self.events = events.EventBuffer(
+          consumers=[events.LogConsumer(self.logger)])
+    # Instrumentation.
+    self.profiler = kwargs.get('profiler')
 
   def GetSymbols(self):
     """Get list of all stocks traded on this exchange."""
@@ -74,8 +171,29 @@ class SimulatedExchange(exchange.Exchange):
     if symbol not in self.symbols:
       raise Exception('%s not on this exchange.' % symbol)
     # Return last trading price.
-    last_trade = self.history[symbol][-1]
-    return last_trade[1]
+    return self._GetTradeHistory(symbol).LastPrice()
+
+  def GetNumTrades(self, symbol):
+    """Get the number of trades in the history of the given stock."""
+    return len(self._GetTradeHistory(symbol))
+
+  def _GetTradeHistory(self, symbol):
+    """Gets the columnar trade history for the given stock."""
+    history = self.history[symbol]
+    if not isinstance(history, trade_history.TradeHistory):
+      # Convert history given as a list of trade records.
+      history = trade_history.TradeHistory(history)
+      self.history[symbol] = history
+    return history
+
+  def _GetTape(self, symbol):
+    """Gets the tape to write trades of the given stock to, if any.
+
+    None if there is no tape or the history writes the trades to it.
+    """
+    if isinstance(self.history[symbol], tape_lib.TapeHistory):
+      return None
+    return self.tapes.get(symbol)
 
   def GetOrderbook(self, symbol):
     """Gets pending bids and asks for specified asset.
@@ -84,115 +202,85 @@ class SimulatedExchange(exchange.Exchange):
       symbol: Name of the stock.
     
     Returns:
-      All pending trades for this stock.
+      All pending trades for this stock, in priority order.
     """
-    all_bids = [item[-1] for item in self.bids[symbol].queue]
-    all_asks = [item[-1] for item in self.asks[symbol].queue]
+    all_bids = list(self.bids[symbol])
+    all_asks = list(self.asks[symbol])
     orderbook = {
         'bids': all_bids,
         'asks': all_asks,
     }
     return orderbook
 
+  def _GetCandleSeries(self, symbol, candle_size):
+    """Gets up-to-date candles of the given size for the asset."""
+    candle_store = self.candles[symbol]
+    candle_store.Sync(self._GetTradeHistory(symbol))
+    return candle_store.GetSeries(candle_size)
+
+  def GetDepth(self, symbol, levels=10):
+    """Gets aggregated bids and asks at the best price levels.
+
+    Totals are kept up to date as orders are placed and filled, so this
+    costs O(levels) regardless of the number of orders in the book.
+
+    Args:
+      symbol: Name of the stock.
+      levels: (optional) Number of price levels per side. All if None.
+
+    Returns:
+      Dict with 'bids' and 'asks' lists of (price, total amount, number of
+      orders) tuples, best price first.
+    """
+    depth = {
+        'bids': self.bids[symbol].GetDepth(levels),
+        'asks': self.asks[symbol].GetDepth(levels),
+    }
+    return depth
+
   def GetHistory(self, symbol, limit=25, candle_size=1):
     """Get trade history for specified for asset.
 
+    Candles are aligned to multiples of the candle size and labeled with the
+    end of their interval. The last candle contains the current time.
+
     Args:
       symbol: Name of the asset.
-      limit: Number of candles to retrieve.
+      limit: Number of candles to retrieve. All candles if None.
       candle_size: Number of time units per candle.
 
     Returns:
       List of (timestamp, closing price) candles.
     """
-    # Current time on the exchange.
-    now = self.time.GetCurrentTime()
-
-    # Check the cache for candles.
-    cached_history = self.cached_history[symbol]  # (timestamp, candle_size, candles)
-    # Saved as (cache_timestamp, size_of_cached_candles, cached_candles) item.
-    if cached_history[0] == now and cached_history[1] == candle_size:
-      if len(cached_history[2]) >= limit:
-        # Return cached candles.
-        return cached_history[2][-limit:]
-
-    # Make sure history exists for this asset.
-    history = self.history[symbol]
-    if len(history) == 0:
-      return []
-    # History records are (timestamp, price, amount) tuples.
-    first_trade_timestamp = history[0][0]
-
-    # Determine time range for the candles.
-    # Candles end on current time.
-    candles_end = now
-    # Candles start limit number of candles before end point.
-    if limit is None:
-      candles_start = self.time.TimeDelta(first_trade_timestamp, -1)
-    else:
-      candles_start = self.time.TimeDelta(candles_end, -(candle_size * limit))
-
-    # Make sure candle range is within history.
-    if candles_start < first_trade_timestamp:
-      # Not enough history for requested number of candles.
-      # Start candles in first interval containing history.
-      history_length = now - first_trade_timestamp
-      candle_length = self.time.TimeDelta(0, candle_size)
-      if candle_length <= history_length:
-        dist_to_candle_end = history_length % candle_length
-        dist_to_candle_start = candle_length - dist_to_candle_end
-      else:
-        # Candle size is greater than available history.
-        dist_to_candle_start = candle_length - history_length
-      # Adjust start of candles range.
-      candles_start = first_trade_timestamp - dist_to_candle_start
-
-    # Binary search to find the first record within the candles' time range.
-    # The candles contain price info from time (start, end].
-    # Exclude records with timestamp == start_candles (i.e. bisect right).
-    history_idx = bisect.bisect_right(history, (candles_start, self.inf, self.inf))
-
-    # Create dummy candle with initial price.
-    # Needed if first real candle has no trades (use previous candle price).
-    if history_idx > 0:
-      # Use last price point before candles start.
-      initial_price = history[history_idx - 1][1]
-    else:
-      # Use first historical price point.
-      initial_price = history[0][1]
-    dummy_candle = [-1, initial_price]
-
-    # Create candles with timestamps from (candles_start, candles_end].
-    time_idx = self.time.TimeDelta(candles_start, candle_size)
-    candles = [dummy_candle]
-    while time_idx <= candles_end:
-        # Create candle for this interval.
-        candle = [time_idx, None]
-        for record in history[history_idx:]:
-          # Each record is a (timestamp, price, amount) tuple.
-          if record[0] <= time_idx:
-            # Record is in this candle's interval.
-            candle[1] = record[1]
-            history_idx += 1
-          else:
-            break
-        # Make sure the candle has data.
-        if candle[1] is None:
-          # Use price of last candle. Dummy candle needed here.
-          candle[1] = candles[-1][1]
-        # Save candle and go to next time interval.
-        candles.append(candle)
-        time_idx = self.time.TimeDelta(time_idx, candle_size)
-
-    # Remove dummy candle.
-    candles = candles[1:]
-    # Cache the computed results.
-    to_cache = (now, candle_size, candles)
-    self.cached_history[symbol] = to_cache
-    # Return results.
-    return candles
-
-  def Buy(self, symbol, amount, wallet, price=inf):
+    if self.profiler:
+      start = time.perf_counter()
+    series = self._GetCandleSeries(symbol, candle_size)
+    closes = series.GetCloses(self.time.GetCurrentTime(), limit)
+    if self.profiler:
+      self.profiler.Record('exchange.get_history', start)
+    return closes
+
+  def GetCandles(self, symbol, limit=25, candle_size=1):
+    """Get OHLCV candles for the specified asset.
+
+    Args:
+      symbol: Name of the asset.
+      limit: Number of candles to retrieve. All candles if None.
+      candle_size: Number of time units per candle.
+
+    Returns:
+      List of (timestamp, open, high, low, close, volume) candles.
+    """
+    if self.profiler:
+      start = time.perf_counter()
+    series = self._GetCandleSeries(symbol, candle_size)
+    ohlcv = series.GetCandles(self.time.GetCurrentTime(), limit)
+    if self.profiler:
+      self.profiler.Record('exchange.get_candles', start)
+    return ohlcv
+
+  def Buy(self, symbol, amount, wallet, price=inf,
+          time_in_force=TimeInForce.GTC, expire_after=None):
     """Place buy order for desired amount of stock.
     
     Note: Price is for limit orders only.
@@ -214,9 +302,301 @@ class SimulatedExchange(exchange.Exchange):
       amount: Number of shares to buy.
       wallet: The buyer's wallet which contains cash to buy.
       price: (optional) The buyer's bidding price.
+      time_in_force: (optional) TimeInForce of the order.
+      expire_after: (optional) Number of time units a GTT order stays in the
+        book.
+
+    Returns:
+      Id of the order, which can be used to cancel it.
+    """
+    if self.profiler:
+      start = time.perf_counter()
+    self._CheckTimeInForce(time_in_force, expire_after)
+    bid = self._ReserveBid(symbol, amount, wallet, price)
+    if self.profiler:
+      self.profiler.Record('exchange.validate', start)
+    if bid is None:
+      raise Exception('Buy error: Wallet contains insufficient USD.')
+    if self.events:
+      self.events.Emit(events.BID, self.time.GetCurrentTime(), symbol,
+                       bid.id, -1, price, amount)
+    self._PlaceOrder(bid, time_in_force, expire_after)
+    if self.profiler:
+      self.profiler.Record('exchange.buy', start)
+    return bid.id
+
+  def Sell(self, symbol, amount, wallet, price=-inf,
+           time_in_force=TimeInForce.GTC, expire_after=None):
+    """Place order for desired amount of given stock.
+
+    Note: Price is for limit orders only.
+
+    Limit order:
+      - Sell given amount of stock for the specified price.
+      - The stock amount is transferred to pool for trade.
+
+    Market order:
+      - Sell given amount of stock at the best available price (i.e the price
+        is not specified).
+      - The stock amount is transferred to pool for trade.
+
+    Args:
+      symbol: Name of the stock to sell.
+      amount: Number of shares to sell.
+      wallet: The seller's wallet which contains shares to sell.
+      price: (optional) The seller's asking price.
+      time_in_force: (optional) TimeInForce of the order.
+      expire_after: (optional) Number of time units a GTT order stays in the
+        book.
+
+    Returns:
+      Id of the order, which can be used to cancel it.
+    """
+    if self.profiler:
+      start = time.perf_counter()
+    self._CheckTimeInForce(time_in_force, expire_after)
+    ask = self._ReserveAsk(symbol, amount, wallet, price)
+    if self.profiler:
+      self.profiler.Record('exchange.validate', start)
+    if ask is None:
+      raise Exception('Sell error: Wallet contains insufficient %s.' % symbol)
+    if self.events:
+      self.events.Emit(events.ASK, self.time.GetCurrentTime(), symbol,
+                       ask.id, -1, price, amount)
+    self._PlaceOrder(ask, time_in_force, expire_after)
+    if self.profiler:
+      self.profiler.Record('exchange.sell', start)
+    return ask.id
+
+  def Cancel(self, order_id):
+    """Cancel an order and return its reserved funds to the owner.
+
+    Args:
+      order_id: Id of the order returned by Buy or Sell.
+
+    Returns:
+      True if the order was cancelled, False if it was no longer in the book.
+    """
+    order = self.orders.pop(order_id, None)
+    if order is None:
+      return False
+    self._ReleaseOrder(order)
+    if order.side == orderbook.BID:
+      self.bids[order.symbol].Remove(order)
+    else:
+      self.asks[order.symbol].Remove(order)
+    if self.events:
+      self.events.Emit(events.CANCEL, self.time.GetCurrentTime(),
+                       order.symbol, order_id)
+    return True
+
+  def _CheckTimeInForce(self, time_in_force, expire_after):
+    """Check that an order's time in force can be used on this exchange.
+
+    Called before any funds are reserved for the order.
+
+    Raises:
+      ValueError: If the time in force is unknown, needs continuous matching
+        or is GTT without expire_after.
+    """
+    if time_in_force == TimeInForce.GTC:
+      return
+    if time_in_force == TimeInForce.GTT:
+      if expire_after is None:
+        raise ValueError('GTT orders need expire_after.')
+    elif time_in_force in (TimeInForce.IOC, TimeInForce.FOK):
+      if self.matching != MatchingMode.CONTINUOUS:
+        raise ValueError(
+            '%s orders need continuous matching.' % time_in_force)
+    else:
+      raise ValueError('Unknown time in force \'%s\'' % time_in_force)
+
+  def _PlaceOrder(self, order, time_in_force, expire_after):
+    """Put a new order in the book and match it.
+
+    Args:
+      order: Order with reserved funds.
+      time_in_force: TimeInForce of the order, checked by _CheckTimeInForce.
+      expire_after: Number of time units a GTT order stays in the book.
+    """
+    if time_in_force == TimeInForce.GTT:
+      expire_time = self.time.TimeDelta(
+          self.time.GetCurrentTime(), expire_after)
+      heapq.heappush(self.expirations, (expire_time, order.id))
+      if self.profiler:
+        self.profiler.Count('exchange.heap_ops')
+    elif time_in_force == TimeInForce.FOK:
+      # Kill the order unless the opposite side can fill all of it.
+      if order.side == orderbook.BID:
+        opposite = self.asks[order.symbol]
+      else:
+        opposite = self.bids[order.symbol]
+      available = opposite.GetAmountAtOrBetter(order.price, order.amount)
+      if available < order.amount:
+        self._ReleaseOrder(order)
+        return
+    self._AddToBook(order)
+    # Process orders.
+    if self.matching == MatchingMode.CONTINUOUS:
+      self._ProcessOrders(order.symbol)
+    if time_in_force in (TimeInForce.IOC, TimeInForce.FOK):
+      # Cancel the unfilled part.
+      self.Cancel(order.id)
+
+  def _AddToBook(self, order):
+    """Add an order to its book and to the index of orders."""
+    if order.side == orderbook.BID:
+      # Buy orders are prioritized by (-price, timestamp).
+      self.bids[order.symbol].Put(order)
+    else:
+      # Sell orders are prioritized by (price, timestamp).
+      self.asks[order.symbol].Put(order)
+    self.orders[order.id] = order
+    if self.profiler:
+      self.profiler.Count('exchange.orders')
+
+  def GetReserved(self, owner, symbol):
+    """Get the amount of an asset reserved for a wallet's resting orders.
+
+    Args:
+      owner: Wallet that placed the orders.
+      symbol: Name of the asset.
+
+    Returns:
+      Amount of the asset the exchange holds for the wallet's orders.
+    """
+    reserved = self.reserved.get(owner)
+    if reserved is None:
+      return 0
+    return reserved.GetAmount(symbol)
+
+  def _Reserve(self, owner, symbol, amount):
+    """Move funds for an order from the owner's wallet to the trade pool."""
+    owner.RemoveAmount(symbol, amount)
+    self.wallet.AddAmount(symbol, amount)
+    reserved = self.reserved.get(owner)
+    if reserved is None:
+      reserved = self.reserved[owner] = wallet.Wallet()
+    reserved.AddAmount(symbol, amount)
+
+  def _TakeReserved(self, owner, symbol, amount):
+    """Take funds reserved for an owner's order out of the trade pool."""
+    self.wallet.RemoveAmount(symbol, amount)
+    self.reserved[owner].RemoveAmount(symbol, amount)
+
+  def _ReleaseOrder(self, order):
+    """Return the funds reserved for the unfilled part of an order."""
+    if order.side == orderbook.BID:
+      if order.price != self.inf:
+        # Limit order. Return reserved cash.
+        cash = order.price * order.amount
+        self._TakeReserved(order.wallet, asset.Symbols.USD, cash)
+        order.wallet.AddAmount(asset.Symbols.USD, cash)
+    else:
+      # Return reserved shares.
+      self._TakeReserved(order.wallet, order.symbol, order.amount)
+      order.wallet.AddAmount(order.symbol, order.amount)
+
+  def _ExpireOrders(self):
+    """Cancel good-till-time orders that expire before the next timestep."""
+    next_time = self.time.TimeDelta(self.time.GetCurrentTime(), 1)
+    expirations = self.expirations
+    while expirations and expirations[0][0] <= next_time:
+      _, order_id = heapq.heappop(expirations)
+      if self.profiler:
+        self.profiler.Count('exchange.heap_ops')
+      self.Cancel(order_id)
+
+  def SubmitOrders(self, orders):
+    """Submit a batch of buy and sell orders.
+
+    Orders are handled in arrival order. The funds for each order are
+    reserved right before it is matched, so the fills are the same as when
+    each order is placed with Buy or Sell, even if an order is only
+    affordable after an earlier order in the batch was filled. Orders the
+    owner cannot afford are rejected instead of raising an exception.
+
+    Matching after each order only checks the top of the book, and candle
+    updates run once per symbol for the whole batch. In auction mode the
+    orders wait for the auction at the end of the timestep.
+
+    Args:
+      orders: Iterable of exchange.OrderRequest.
+
+    Returns:
+      List with the id of each accepted order and None for rejected orders.
+
+    Raises:
+      Exception: If a symbol is not on this exchange or a side is unknown.
+        Nothing in the batch is placed.
+    """
+    if self.profiler:
+      start = time.perf_counter()
+    requests = list(orders)
+    # Check the whole batch before reserving any funds.
+    for request in requests:
+      if request.symbol not in self.symbols:
+        raise Exception('%s not on this exchange.' % request.symbol)
+      if request.side not in (exchange.OrderSide.BUY, exchange.OrderSide.SELL):
+        raise ValueError('Unknown order side \'%s\'' % request.side)
+    if self.profiler:
+      self.profiler.Record('exchange.validate', start)
+    # Reserve funds, insert and match one order at a time.
+    continuous = self.matching == MatchingMode.CONTINUOUS
+    symbols = set()
+    order_ids = []
+    for request in requests:
+      if request.side == exchange.OrderSide.BUY:
+        price = self.inf if request.price is None else request.price
+        order = self._ReserveBid(
+            request.symbol, request.amount, request.wallet, price)
+      else:
+        price = -self.inf if request.price is None else request.price
+        order = self._ReserveAsk(
+            request.symbol, request.amount, request.wallet, price)
+      if order is None:
+        order_ids.append(None)
+        continue
+      if self.events:
+        self.events.Emit(
+            events.BID if order.side == orderbook.BID else events.ASK,
+            self.time.GetCurrentTime(), order.symbol, order.id, -1, price,
+            request.amount)
+      self._AddToBook(order)
+      if continuous:
+        self._MatchOrders(order.symbol)
+      symbols.add(order.symbol)
+      order_ids.append(order.id)
+    for symbol in symbols:
+      self._OrdersProcessed(symbol)
+    if self.profiler:
+      self.profiler.Record('exchange.submit_orders', start)
+    return order_ids
+
+  def EndTimestep(self):
+    """Run the call auctions, cancel expired orders and flush events."""
+    if self.matching == MatchingMode.AUCTION:
+      for symbol in self.symbols:
+        self._RunAuction(symbol)
+        self._OrdersProcessed(symbol)
+    self._ExpireOrders()
+    if self.events:
+      self.events.Flush()
+
+  def _ReserveBid(self, symbol, amount, wallet, price):
+    """Reserve the buyer's cash and create a buy order.
+
+    Args:
+      symbol: Name of the stock to buy.
+      amount: Number of shares to buy.
+      wallet: The buyer's wallet which contains cash to buy.
+      price: The buyer's bidding price. Market orders use inf.
+
+    Returns:
+      The new buy order, or None if the buyer has insufficient cash.
     """
     # Determine amount of cash needed for the order.
-    if price is self.inf:
+    if price == self.inf:
       # This is a market order. Take cash when trade executes.
       cash_for_trade = 0
     else:
@@ -226,71 +606,49 @@ class SimulatedExchange(exchange.Exchange):
     # The exchange withholds required amount of cash from the buyer.
     # Make sure the buyer has enough cash.
     if wallet.GetAmount(asset.Symbols.USD) < cash_for_trade:
-      raise Exception('Buy error: Wallet contains insufficient USD.')
+      return None
     # Reserve the buyer's cash for the order.
-    wallet.RemoveAmount(asset.Symbols.USD, cash_for_trade)
-    self.wallet.AddAmount(asset.Symbols.USD, cash_for_trade)
+    self._Reserve(wallet, asset.Symbols.USD, cash_for_trade)
 
-    # Place new bid.
+    # Create new bid.
     self.trade_id += 1
-    order = Order(
+    return Order(
         id=self.trade_id,
+        side=orderbook.BID,
         symbol=symbol,
         price=price,
         amount=amount,
         wallet=wallet,
     )
-    # Sort buy orders by (-price, timestamp).
-    self.bids[symbol].put((-order.price, order.id, order))
-    if self.logger:
-      self.logger.debug(
-          'Placed bid: (price: %s, amount: %s)' % (price, amount))
-    # Process orders.
-    self._ProcessOrders(symbol)
-
-  def Sell(self, symbol, amount, wallet, price=-inf):
-    """Place order for desired amount of given stock.
-
-    Note: Price is for limit orders only.
 
-    Limit order:
-      - Sell given amount of stock for the specified price.
-      - The stock amount is transferred to pool for trade.
-
-    Market order:
-      - Sell given amount of stock at the best available price (i.e the price
-        is not specified).
-      - The stock amount is transferred to pool for trade.
+  def _ReserveAsk(self, symbol, amount, wallet, price):
+    """Reserve the seller's shares and create a sell order.
 
     Args:
       symbol: Name of the stock to sell.
       amount: Number of shares to sell.
       wallet: The seller's wallet which contains shares to sell.
-      price: (optional) The seller's asking price.
+      price: The seller's asking price. Market orders use -inf.
+
+    Returns:
+      The new sell order, or None if the seller has insufficient shares.
     """
     # Take stocks to sell from the seller's wallet.
     if wallet.GetAmount(symbol) < amount:
-      raise Exception('Sell error: Wallet contains insufficient %s.' % symbol)
-    wallet.RemoveAmount(symbol, amount)
+      return None
     # put stocks on exchange
-    self.wallet.AddAmount(symbol,amount)
+    self._Reserve(wallet, symbol, amount)
 
-    # Place new ask.
+    # Create new ask.
     self.trade_id += 1
-    order = Order(
+    return Order(
         id=self.trade_id,
+        side=orderbook.ASK,
         symbol=symbol,
         price=price,
         amount=amount,
-        wallet=wallet
+        wallet=wallet,
     )
-    # prioritize sell orders by (price, timestamp)
-    self.asks[symbol].put((order.price, order.id, order))
-    if self.logger:
-      self.logger.debug(
-          'Placed ask: (price: %s, amount: %s)' % (order.price, order.amount))
-    # Process orders.
-    self._ProcessOrders(symbol)
 
   def _DetermineTradePrice(self, bid, ask):
     """Determines trading price for given bid and ask.
@@ -367,7 +725,9 @@ class SimulatedExchange(exchange.Exchange):
 
   def _ExecuteTrade(self, amount, price, bid, ask):
     """Exchange assets between buyer and seller.
-    
+
+    The bid and ask must be the best orders in their orderbooks.
+
     Args:
       amount: Amount of asset being traded.
       price: Price per unit of asset.
@@ -376,62 +736,63 @@ class SimulatedExchange(exchange.Exchange):
     """
     assert ask.symbol == bid.symbol
     symbol = ask.symbol
+    if self.profiler:
+      start = time.perf_counter()
 
     # Transfer cash from buyer to seller.
     cash = price * amount
-    if bid.price is self.inf:
+    if bid.price == self.inf:
       # Buy is market order -- take cash now.
       bid.wallet.RemoveAmount(asset.Symbols.USD, cash)
     else:
       # Buy is limit order -- cash was reserved on exchange.
       # Remove cash from exchange.
       expected_cash = bid.price * amount
-      self.wallet.RemoveAmount(asset.Symbols.USD, expected_cash)
+      self._TakeReserved(bid.wallet, asset.Symbols.USD, expected_cash)
       # Calculate change for buyer.
       leftover_cash = expected_cash - cash
       bid.wallet.AddAmount(asset.Symbols.USD, leftover_cash)
     ask.wallet.AddAmount(asset.Symbols.USD, cash)
 
     # Transfer shares to buyer.
-    self.wallet.RemoveAmount(symbol, amount)
+    self._TakeReserved(ask.wallet, symbol, amount)
     bid.wallet.AddAmount(symbol, amount)
 
-    # Put excess supply or demand back in orderbook.
-    excess_supply = ask.amount - amount
-    excess_demand = bid.amount - amount
-    if excess_supply > 0:
-      # Excess supply goes back in orderbook with original timestamp.
-      remaining_order = Order(
-          id=ask.id, symbol=ask.symbol, price=ask.price,
-          amount=excess_supply, wallet=ask.wallet)
-      ask_q = self.asks[symbol]
-      ask_q.put((remaining_order.price, remaining_order.id, remaining_order))
-    if excess_demand > 0:
-      # Excess demand goes back in orderbook with original timestamp.
-      remaining_order = Order(
-          id=bid.id, symbol=bid.symbol, price=bid.price,
-          amount=excess_demand, wallet=bid.wallet)
-      bid_q = self.bids[symbol]
-      bid_q.put((-remaining_order.price, remaining_order.id, remaining_order))
+    # Fill the orders in place. Filled orders are removed from the orderbook,
+    # partially filled orders keep their place.
+    self.bids[symbol].FillBest(amount)
+    self.asks[symbol].FillBest(amount)
+    if bid.amount <= 0:
+      del self.orders[bid.id]
+    if ask.amount <= 0:
+      del self.orders[ask.id]
+    if self.profiler:
+      self.profiler.Record('exchange.settle', start)
+      self.profiler.Count('exchange.fills')
 
   def _ProcessOrders(self, symbol):
     """Match pending bids and asks for given symbol."""
+    self._MatchOrders(symbol)
+    self._OrdersProcessed(symbol)
+
+  def _MatchOrders(self, symbol):
+    """Execute trades while the best bid and ask for given symbol cross."""
+    if self.profiler:
+      start = time.perf_counter()
     # Process all bids and asks.
     bid_q = self.bids[symbol]
     ask_q = self.asks[symbol]
-    while bid_q.qsize() and ask_q.qsize():
-      # Compare highest bid B to lowest ask S.
-      highest_bid = bid_q.get()[-1]  # order is last item in tuple
-      lowest_ask = ask_q.get()[-1]
+    history = self._GetTradeHistory(symbol)
+    tape = self._GetTape(symbol)
+    while len(bid_q) and len(ask_q):
+      # Compare highest bid B to lowest ask S. Orders stay in the book.
+      highest_bid = bid_q.Peek()
+      lowest_ask = ask_q.Peek()
 
       # Determine trade price based on B and S.
       trade_price = self._DetermineTradePrice(highest_bid, lowest_ask)
       # Stop processing orders if there is no "breakeven".
       if trade_price is None:
-        # Put orders back in the queue.
-        bid_q.put((-highest_bid.price, highest_bid.id, highest_bid))
-        ask_q.put((lowest_ask.price, lowest_ask.id, lowest_ask))
-        # Stop processing orders.
         break
 
       # Determine trade amount.
@@ -440,15 +801,80 @@ class SimulatedExchange(exchange.Exchange):
       # Execute the trade.
       self._ExecuteTrade(trade_amount, trade_price, highest_bid, lowest_ask)
 
-      if self.logger:
-        self.logger.debug(
-            'Trade executed (price: %s, amount: %s).' % (
-            trade_price, trade_amount))
-
       # Record trade history.
       timestamp = self.time.GetCurrentTime()
-      self.history[symbol].append((timestamp, trade_price, trade_amount))
-
-    # All matching trades resolved.
-    if self.logger:
-      self.logger.debug('Orders processed.')
+      history.Append(timestamp, trade_price, trade_amount)
+      if tape is not None:
+        tape.Write(timestamp, trade_price, trade_amount)
+      if self.events:
+        self.events.Emit(events.FILL, timestamp, symbol, highest_bid.id,
+                         lowest_ask.id, trade_price, trade_amount)
+    if self.profiler:
+      self.profiler.Record('exchange.match', start)
+
+  def _RunAuction(self, symbol):
+    """Match pending bids and asks for given symbol at a single price.
+
+    The clearing price is the limit price that maximizes the traded amount.
+    Ties are broken by the smallest imbalance between supply and demand and
+    then by the distance to the last trading price. All bids at or above the
+    clearing price and asks at or below it are filled at that price in
+    price-time priority.
+    """
+    bid_q = self.bids[symbol]
+    ask_q = self.asks[symbol]
+    if not len(bid_q) or not len(ask_q):
+      return
+    if bid_q.BestPrice() < ask_q.BestPrice():
+      # Best bid and ask do not cross.
+      return
+    last_price = self.GetPrice(symbol)
+    # Bids are in descending and asks in ascending price order.
+    bid_prices = np.array([order.price for order in bid_q], dtype=float)
+    bid_amounts = np.array([order.amount for order in bid_q], dtype=float)
+    ask_prices = np.array([order.price for order in ask_q], dtype=float)
+    ask_amounts = np.array([order.amount for order in ask_q], dtype=float)
+    # Candidate clearing prices are the limit prices.
+    prices = np.unique(np.concatenate((bid_prices, ask_prices)))
+    prices = prices[np.isfinite(prices)]
+    if not len(prices):
+      # Only market orders. Clear at the last trading price.
+      prices = np.array([last_price], dtype=float)
+    # Aggregated demand and supply at each candidate price.
+    num_bids = np.searchsorted(-bid_prices, -prices, side='right')
+    demand = np.concatenate(([0], np.cumsum(bid_amounts)))[num_bids]
+    num_asks = np.searchsorted(ask_prices, prices, side='right')
+    supply = np.concatenate(([0], np.cumsum(ask_amounts)))[num_asks]
+    volume = np.minimum(demand, supply)
+    best = np.lexsort(
+        (np.abs(prices - last_price), np.abs(demand - supply), -volume))[0]
+    clearing_price = prices[best].item()
+    remaining = volume[best].item()
+    if remaining <= 0:
+      return
+
+    # Fill crossing orders at the clearing price.
+    history = self._GetTradeHistory(symbol)
+    tape = self._GetTape(symbol)
+    timestamp = self.time.GetCurrentTime()
+    while remaining > 0 and len(bid_q) and len(ask_q):
+      highest_bid = bid_q.Peek()
+      lowest_ask = ask_q.Peek()
+      trade_amount = min(highest_bid.amount, lowest_ask.amount, remaining)
+      self._ExecuteTrade(trade_amount, clearing_price, highest_bid, lowest_ask)
+      history.Append(timestamp, clearing_price, trade_amount)
+      if tape is not None:
+        tape.Write(timestamp, clearing_price, trade_amount)
+      if self.events:
+        self.events.Emit(events.FILL, timestamp, symbol, highest_bid.id,
+                         lowest_ask.id, clearing_price, trade_amount)
+      remaining -= trade_amount
+
+    if self.events:
+      self.events.Emit(events.AUCTION, timestamp, symbol,
+                       price=clearing_price, amount=volume[best].item())
+
+  def _OrdersProcessed(self, symbol):
+    """Update candles for given symbol after orders were matched."""
+    # Add new trades to the candles.
+    self.candles[symbol].Sync(self._GetTradeHistory(symbol))
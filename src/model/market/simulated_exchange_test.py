@@ -3,8 +3,10 @@ import unittest
 
 import src.model.asset as asset
 import src.model.environment.environment_time as env_time
+import src.model.market.exchange as exchange
 import src.model.market.simulated_exchange as sim_exchange
 import src.model.wallet as wallet
+import src.util.events as events
 
 
 class TestSimulatedExchange_OrderProcessing(unittest.TestCase):
@@ -121,6 +123,17 @@ class TestSimulatedExchange_OrderProcessing(unittest.TestCase):
     # Buy order filled.
     self.assertTrue(len(orderbook['bids']) == 0)
 
+  def test_GetDepth_PartialFill(self):
+    """Depth shows the unfilled amount of a partially filled order."""
+    self.exchange.Buy(asset.Symbols.BTC, 3, self.buyer_wallet, price=5)
+    self.exchange.Buy(asset.Symbols.BTC, 1, self.buyer_wallet, price=4)
+    self.exchange.Sell(asset.Symbols.BTC, 2, self.seller_wallet, price=5)
+    self.exchange.Sell(asset.Symbols.BTC, 2, self.seller_wallet, price=6)
+
+    depth = self.exchange.GetDepth(asset.Symbols.BTC, levels=1)
+    self.assertEqual([(5, 1, 1)], depth['bids'])
+    self.assertEqual([(6, 2, 1)], depth['asks'])
+
   # END tests for trade amount calculation.
   # BEGIN tests for trade price calculation.
 
@@ -265,6 +278,327 @@ class TestSimulatedExchange_OrderProcessing(unittest.TestCase):
   # END tests for trade price calculation.
 
 
+class TestSimulatedExchange_SubmitOrders(unittest.TestCase):
+  """Test cases for submitting batches of orders."""
+
+  # Default asset amount in test agents' wallets.
+  DEFAULT_WALLET_AMOUNT = 100
+
+  def _CreateExchange(self):
+    """Creates an exchange with one symbol."""
+    time_obj = env_time.IntegerTime(start_time=0, time_unit=1)
+    history = {asset.Symbols.BTC: [(-1, 10, 0)]}
+    return sim_exchange.SimulatedExchange(
+        time=time_obj, symbols=[asset.Symbols.BTC], history=history)
+
+  def _CreateWallets(self, num_wallets):
+    """Creates wallets with default amounts of cash and shares."""
+    initial_balance = {
+        asset.Symbols.USD: self.DEFAULT_WALLET_AMOUNT,
+        asset.Symbols.BTC: self.DEFAULT_WALLET_AMOUNT,
+    }
+    return [wallet.Wallet(initial_balance) for _ in range(num_wallets)]
+
+  def test_SubmitOrders_SameFillsAsSequentialOrders(self):
+    """A batch of orders is filled like orders placed one at a time."""
+    # (side, amount, price) for each order. None is a market order.
+    orders = [
+        (exchange.OrderSide.BUY, 3, 9),
+        (exchange.OrderSide.SELL, 2, 11),
+        (exchange.OrderSide.SELL, 4, 8),
+        (exchange.OrderSide.BUY, 5, 12),
+        (exchange.OrderSide.BUY, 1, None),
+        (exchange.OrderSide.SELL, 2, None),
+    ]
+    # Place orders one at a time.
+    sequential_exchange = self._CreateExchange()
+    sequential_wallets = self._CreateWallets(len(orders))
+    for (side, amount, price), owner in zip(orders, sequential_wallets):
+      if side == exchange.OrderSide.BUY:
+        place_order = sequential_exchange.Buy
+      else:
+        place_order = sequential_exchange.Sell
+      if price is None:
+        place_order(asset.Symbols.BTC, amount, owner)
+      else:
+        place_order(asset.Symbols.BTC, amount, owner, price)
+    # Submit the same orders as a batch.
+    batch_exchange = self._CreateExchange()
+    batch_wallets = self._CreateWallets(len(orders))
+    requests = [
+        exchange.OrderRequest(side, asset.Symbols.BTC, amount, owner, price)
+        for (side, amount, price), owner in zip(orders, batch_wallets)]
+    order_ids = batch_exchange.SubmitOrders(requests)
+
+    self.assertEqual(list(range(1, len(orders) + 1)), order_ids)
+    self.assertEqual(
+        list(sequential_exchange.history[asset.Symbols.BTC]),
+        list(batch_exchange.history[asset.Symbols.BTC]))
+    for sequential_wallet, batch_wallet in zip(sequential_wallets, batch_wallets):
+      self.assertEqual(sequential_wallet.amounts, batch_wallet.amounts)
+
+  def test_SubmitOrders_UnaffordableOrderRejected(self):
+    """Orders the owner cannot afford are rejected."""
+    batch_exchange = self._CreateExchange()
+    buyer_wallet, seller_wallet = self._CreateWallets(2)
+    requests = [
+        exchange.OrderRequest(
+            exchange.OrderSide.BUY, asset.Symbols.BTC, 1, buyer_wallet,
+            self.DEFAULT_WALLET_AMOUNT + 1),
+        exchange.OrderRequest(
+            exchange.OrderSide.SELL, asset.Symbols.BTC,
+            self.DEFAULT_WALLET_AMOUNT + 1, seller_wallet, 1),
+        exchange.OrderRequest(
+            exchange.OrderSide.SELL, asset.Symbols.BTC, 1, seller_wallet, 1),
+    ]
+    order_ids = batch_exchange.SubmitOrders(requests)
+
+    self.assertEqual([None, None, 1], order_ids)
+    self.assertEqual(self.DEFAULT_WALLET_AMOUNT, buyer_wallet.GetAmount(asset.Symbols.USD))
+    orderbook = batch_exchange.GetOrderbook(asset.Symbols.BTC)
+    self.assertEqual(0, len(orderbook['bids']))
+    self.assertEqual(1, len(orderbook['asks']))
+
+  def test_SubmitOrders_AffordableAfterEarlierFill(self):
+    """Funds from a fill earlier in the batch pay for later orders."""
+    seller_wallet, = self._CreateWallets(1)
+    trader_wallet = wallet.Wallet({asset.Symbols.USD: 10})
+    batch_exchange = self._CreateExchange()
+    requests = [
+        exchange.OrderRequest(
+            exchange.OrderSide.SELL, asset.Symbols.BTC, 1, seller_wallet, 10),
+        exchange.OrderRequest(
+            exchange.OrderSide.BUY, asset.Symbols.BTC, 1, trader_wallet, 10),
+        exchange.OrderRequest(
+            exchange.OrderSide.SELL, asset.Symbols.BTC, 1, trader_wallet, 12),
+    ]
+    self.assertEqual([1, 2, 3], batch_exchange.SubmitOrders(requests))
+    self.assertEqual(0, trader_wallet.GetAmount(asset.Symbols.BTC))
+    self.assertEqual(
+        [(12, 1, 1)], batch_exchange.GetDepth(asset.Symbols.BTC)['asks'])
+
+  def test_SubmitOrders_InvalidRequestNothingReserved(self):
+    """A batch with an invalid request is rejected before reserving funds."""
+    batch_exchange = self._CreateExchange()
+    buyer_wallet, = self._CreateWallets(1)
+    for invalid_request in [
+        exchange.OrderRequest(
+            exchange.OrderSide.BUY, 'ETH', 1, buyer_wallet, 10),
+        exchange.OrderRequest('hold', asset.Symbols.BTC, 1, buyer_wallet, 10)]:
+      requests = [
+          exchange.OrderRequest(
+              exchange.OrderSide.BUY, asset.Symbols.BTC, 1, buyer_wallet, 10),
+          invalid_request,
+      ]
+      with self.assertRaises(Exception):
+        batch_exchange.SubmitOrders(requests)
+
+    self.assertEqual(self.DEFAULT_WALLET_AMOUNT, buyer_wallet.GetAmount(asset.Symbols.USD))
+    self.assertEqual(0, batch_exchange.wallet.GetAmount(asset.Symbols.USD))
+    self.assertEqual([], batch_exchange.GetDepth(asset.Symbols.BTC)['bids'])
+
+
+class TestSimulatedExchange_Auction(unittest.TestCase):
+  """Test cases for the call auction matching mode."""
+
+  # Default asset amount in test agents' wallets.
+  DEFAULT_WALLET_AMOUNT = 100
+
+  def setUp(self):
+    """Test set up. Called before each test case."""
+    time_obj = env_time.IntegerTime(start_time=0, time_unit=1)
+    history = {asset.Symbols.BTC: [(-1, 10, 0)]}
+    self.exchange = sim_exchange.SimulatedExchange(
+        time=time_obj, symbols=[asset.Symbols.BTC], history=history,
+        matching=sim_exchange.MatchingMode.AUCTION)
+    initial_balance = {
+        asset.Symbols.USD: self.DEFAULT_WALLET_AMOUNT,
+        asset.Symbols.BTC: self.DEFAULT_WALLET_AMOUNT,
+    }
+    self.wallets = [wallet.Wallet(initial_balance) for _ in range(5)]
+
+  def test_OrdersWaitForAuction(self):
+    """Crossing orders are not matched before the end of the timestep."""
+    self.exchange.Buy(asset.Symbols.BTC, 1, self.wallets[0], price=10)
+    self.exchange.Sell(asset.Symbols.BTC, 1, self.wallets[1], price=9)
+    orderbook = self.exchange.GetOrderbook(asset.Symbols.BTC)
+    self.assertEqual(1, len(orderbook['bids']))
+    self.assertEqual(1, len(orderbook['asks']))
+
+  def test_EndTimestep_AllCrossingOrdersFilledAtClearingPrice(self):
+    """The auction clears at the price with the most traded shares."""
+    self.exchange.Buy(asset.Symbols.BTC, 5, self.wallets[0], price=10)
+    self.exchange.Buy(asset.Symbols.BTC, 5, self.wallets[1], price=9)
+    self.exchange.Sell(asset.Symbols.BTC, 4, self.wallets[2], price=8)
+    self.exchange.Sell(asset.Symbols.BTC, 4, self.wallets[3], price=9)
+    self.exchange.Sell(asset.Symbols.BTC, 4, self.wallets[4], price=11)
+    self.exchange.EndTimestep()
+
+    # Demand and supply are both 8 shares at price 9.
+    clearing_price = 9
+    self.assertEqual(clearing_price, self.exchange.GetPrice(asset.Symbols.BTC))
+    # First buyer is filled and gets change for the higher bid.
+    self.assertEqual(self.DEFAULT_WALLET_AMOUNT - 5 * clearing_price,
+                     self.wallets[0].GetAmount(asset.Symbols.USD))
+    self.assertEqual(self.DEFAULT_WALLET_AMOUNT + 5,
+                     self.wallets[0].GetAmount(asset.Symbols.BTC))
+    # Second buyer is partially filled.
+    self.assertEqual(self.DEFAULT_WALLET_AMOUNT + 3,
+                     self.wallets[1].GetAmount(asset.Symbols.BTC))
+    # Both crossing sellers are filled at the clearing price.
+    for seller_wallet in self.wallets[2:4]:
+      self.assertEqual(self.DEFAULT_WALLET_AMOUNT + 4 * clearing_price,
+                       seller_wallet.GetAmount(asset.Symbols.USD))
+    # Remaining orders stay in the book.
+    orderbook = self.exchange.GetOrderbook(asset.Symbols.BTC)
+    self.assertEqual([2], [order.amount for order in orderbook['bids']])
+    self.assertEqual([4], [order.amount for order in orderbook['asks']])
+
+
+class TestSimulatedExchange_Cancel(unittest.TestCase):
+  """Test cases for order cancellation and time in force."""
+
+  # Default asset amount in test agents' wallets.
+  DEFAULT_WALLET_AMOUNT = 100
+
+  def setUp(self):
+    """Test set up. Called before each test case."""
+    self.time_obj = env_time.IntegerTime(start_time=0, time_unit=1)
+    history = {asset.Symbols.BTC: [(-1, 10, 0)]}
+    self.exchange = sim_exchange.SimulatedExchange(
+        time=self.time_obj, symbols=[asset.Symbols.BTC], history=history)
+    initial_balance = {
+        asset.Symbols.USD: self.DEFAULT_WALLET_AMOUNT,
+        asset.Symbols.BTC: self.DEFAULT_WALLET_AMOUNT,
+    }
+    self.buyer_wallet = wallet.Wallet(initial_balance)
+    self.seller_wallet = wallet.Wallet(initial_balance)
+
+  def test_Cancel_ReservedFundsReturned(self):
+    """Cancelled orders leave the book and return reserved funds."""
+    bid_id = self.exchange.Buy(asset.Symbols.BTC, 2, self.buyer_wallet, price=5)
+    ask_id = self.exchange.Sell(asset.Symbols.BTC, 3, self.seller_wallet, price=6)
+    self.assertTrue(self.exchange.Cancel(bid_id))
+    self.assertTrue(self.exchange.Cancel(ask_id))
+    # Orders can only be cancelled once.
+    self.assertFalse(self.exchange.Cancel(bid_id))
+
+    self.assertEqual(self.DEFAULT_WALLET_AMOUNT, self.buyer_wallet.GetAmount(asset.Symbols.USD))
+    self.assertEqual(self.DEFAULT_WALLET_AMOUNT, self.seller_wallet.GetAmount(asset.Symbols.BTC))
+    self.assertEqual(0, self.exchange.wallet.GetAmount(asset.Symbols.USD))
+    self.assertEqual(0, self.exchange.wallet.GetAmount(asset.Symbols.BTC))
+    depth = self.exchange.GetDepth(asset.Symbols.BTC)
+    self.assertEqual([], depth['bids'])
+    self.assertEqual([], depth['asks'])
+
+  def test_GetReserved_FollowsFillsAndCancels(self):
+    """Funds of resting orders are reserved for the wallet that placed them."""
+    bid_id = self.exchange.Buy(asset.Symbols.BTC, 4, self.buyer_wallet, price=5)
+    self.exchange.Sell(asset.Symbols.BTC, 3, self.seller_wallet, price=6)
+    self.assertEqual(20, self.exchange.GetReserved(self.buyer_wallet,
+                                                   asset.Symbols.USD))
+    self.assertEqual(3, self.exchange.GetReserved(self.seller_wallet,
+                                                  asset.Symbols.BTC))
+    self.assertEqual(0, self.exchange.GetReserved(self.seller_wallet,
+                                                  asset.Symbols.USD))
+
+    # The bid was placed first, so one share is bought at its price.
+    self.exchange.Sell(asset.Symbols.BTC, 1, self.seller_wallet, price=4)
+    self.assertEqual(15, self.exchange.GetReserved(self.buyer_wallet,
+                                                   asset.Symbols.USD))
+    self.assertEqual(3, self.exchange.GetReserved(self.seller_wallet,
+                                                  asset.Symbols.BTC))
+    self.assertTrue(self.exchange.Cancel(bid_id))
+    self.assertEqual(0, self.exchange.GetReserved(self.buyer_wallet,
+                                                  asset.Symbols.USD))
+    self.assertEqual(self.DEFAULT_WALLET_AMOUNT - 5,
+                     self.buyer_wallet.GetAmount(asset.Symbols.USD))
+
+  def test_Cancel_FilledOrder(self):
+    """Filled orders cannot be cancelled."""
+    bid_id = self.exchange.Buy(asset.Symbols.BTC, 2, self.buyer_wallet, price=5)
+    self.exchange.Sell(asset.Symbols.BTC, 2, self.seller_wallet, price=5)
+    self.assertFalse(self.exchange.Cancel(bid_id))
+
+  def test_ZeroAmountOrder_KeepsBookConsistent(self):
+    """Orders without an amount are not mistaken for cancelled orders."""
+    self.exchange.Buy(asset.Symbols.BTC, 5, self.buyer_wallet, price=10)
+    self.exchange.Buy(asset.Symbols.BTC, 0, self.buyer_wallet, price=10)
+    self.exchange.Buy(asset.Symbols.BTC, 3, self.buyer_wallet, price=10)
+    self.exchange.Sell(asset.Symbols.BTC, 20, self.seller_wallet, price=10)
+
+    self.assertEqual(108, self.buyer_wallet.GetAmount(asset.Symbols.BTC))
+    self.assertEqual(0, len(self.exchange.bids[asset.Symbols.BTC]))
+    self.assertEqual([], self.exchange.GetDepth(asset.Symbols.BTC)['bids'])
+    self.assertEqual([(10, 12, 1)],
+                     self.exchange.GetDepth(asset.Symbols.BTC)['asks'])
+
+  def test_ImmediateOrCancel_UnfilledPartCancelled(self):
+    """IOC order is filled as far as possible and the rest is cancelled."""
+    self.exchange.Sell(asset.Symbols.BTC, 1, self.seller_wallet, price=5)
+    self.exchange.Buy(
+        asset.Symbols.BTC, 3, self.buyer_wallet, price=5,
+        time_in_force=sim_exchange.TimeInForce.IOC)
+
+    self.assertEqual(self.DEFAULT_WALLET_AMOUNT + 1, self.buyer_wallet.GetAmount(asset.Symbols.BTC))
+    self.assertEqual(self.DEFAULT_WALLET_AMOUNT - 5, self.buyer_wallet.GetAmount(asset.Symbols.USD))
+    self.assertEqual([], self.exchange.GetDepth(asset.Symbols.BTC)['bids'])
+
+  def test_FillOrKill_NotEnoughSupply(self):
+    """FOK order is not placed if it cannot be filled completely."""
+    self.exchange.Sell(asset.Symbols.BTC, 1, self.seller_wallet, price=5)
+    self.exchange.Sell(asset.Symbols.BTC, 5, self.seller_wallet, price=7)
+    self.exchange.Buy(
+        asset.Symbols.BTC, 3, self.buyer_wallet, price=6,
+        time_in_force=sim_exchange.TimeInForce.FOK)
+
+    # No trade was executed.
+    self.assertEqual(self.DEFAULT_WALLET_AMOUNT, self.buyer_wallet.GetAmount(asset.Symbols.USD))
+    self.assertEqual(self.DEFAULT_WALLET_AMOUNT, self.buyer_wallet.GetAmount(asset.Symbols.BTC))
+    depth = self.exchange.GetDepth(asset.Symbols.BTC)
+    self.assertEqual([], depth['bids'])
+    self.assertEqual([(5, 1, 1), (7, 5, 1)], depth['asks'])
+
+  def test_GoodTillTime_Expires(self):
+    """GTT order is cancelled after the given number of time units."""
+    self.exchange.Buy(
+        asset.Symbols.BTC, 2, self.buyer_wallet, price=5,
+        time_in_force=sim_exchange.TimeInForce.GTT, expire_after=2)
+    # Order rests during the first time unit.
+    self.exchange.EndTimestep()
+    self.time_obj.Step()
+    self.assertEqual(1, len(self.exchange.GetDepth(asset.Symbols.BTC)['bids']))
+    # Order expires at the end of the second time unit.
+    self.exchange.EndTimestep()
+    self.time_obj.Step()
+    self.assertEqual([], self.exchange.GetDepth(asset.Symbols.BTC)['bids'])
+    self.assertEqual(self.DEFAULT_WALLET_AMOUNT, self.buyer_wallet.GetAmount(asset.Symbols.USD))
+
+  def test_InvalidTimeInForce_NothingReserved(self):
+    """Orders with an unusable time in force are rejected before reserving."""
+    auction_exchange = sim_exchange.SimulatedExchange(
+        time=self.time_obj, symbols=[asset.Symbols.BTC],
+        history={asset.Symbols.BTC: [(-1, 10, 0)]},
+        matching=sim_exchange.MatchingMode.AUCTION)
+    with self.assertRaises(ValueError):
+      auction_exchange.Buy(
+          asset.Symbols.BTC, 1, self.buyer_wallet, price=10,
+          time_in_force=sim_exchange.TimeInForce.IOC)
+    with self.assertRaises(ValueError):
+      self.exchange.Sell(
+          asset.Symbols.BTC, 3, self.seller_wallet, price=10,
+          time_in_force=sim_exchange.TimeInForce.GTT)
+    with self.assertRaises(ValueError):
+      self.exchange.Buy(asset.Symbols.BTC, 1, self.buyer_wallet, price=10,
+                        time_in_force='day')
+
+    self.assertEqual(self.DEFAULT_WALLET_AMOUNT, self.buyer_wallet.GetAmount(asset.Symbols.USD))
+    self.assertEqual(self.DEFAULT_WALLET_AMOUNT, self.seller_wallet.GetAmount(asset.Symbols.BTC))
+    for pool in (self.exchange.wallet, auction_exchange.wallet):
+      self.assertEqual(0, pool.GetAmount(asset.Symbols.USD))
+      self.assertEqual(0, pool.GetAmount(asset.Symbols.BTC))
+
+
 class TestSimulatedExchange_History(unittest.TestCase):
   """Test cases for simulated exchange."""
 
@@ -371,3 +705,107 @@ class TestSimulatedExchange_History(unittest.TestCase):
     self.assertTrue(len(candles) == 1)
     expected_price = history[-1][1]
     self.assertEqual(expected_price, candles[0][1])
+
+  def test_GetHistory_UpdatedWithNewTrades(self):
+    """Candles include trades executed after the previous query."""
+    wallet_amounts = {asset.Symbols.USD: 1000, asset.Symbols.BTC: 10}
+    buyer_wallet = wallet.Wallet(wallet_amounts)
+    seller_wallet = wallet.Wallet(wallet_amounts)
+    # Query candles of two sizes so both are kept up to date.
+    self.exchange.GetHistory(asset.Symbols.BTC, limit=2, candle_size=1)
+    self.exchange.GetHistory(asset.Symbols.BTC, limit=2, candle_size=2)
+    # Trade at t=1.
+    self.time_obj.Step()
+    trade_price = self.DEFAULT_MARKET_PRICE + 5
+    self.exchange.Buy(asset.Symbols.BTC, 1, buyer_wallet, price=trade_price)
+    self.exchange.Sell(asset.Symbols.BTC, 1, seller_wallet, price=trade_price)
+
+    candles = self.exchange.GetHistory(asset.Symbols.BTC, limit=2, candle_size=1)
+    self.assertEqual([[0, self.DEFAULT_MARKET_PRICE], [1, trade_price]], candles)
+    candles = self.exchange.GetHistory(asset.Symbols.BTC, limit=1, candle_size=2)
+    self.assertEqual([[2, trade_price]], candles)
+
+  def test_GetCandles_OHLCV(self):
+    """Candles contain open, high, low and close prices and volume."""
+    history = [(1, 10, 1), (2, 12, 2), (3, 8, 3), (4, 9, 4)]
+    self.exchange.history[asset.Symbols.BTC] = history
+    for _ in range(4):
+      self.time_obj.Step()
+
+    candles = self.exchange.GetCandles(asset.Symbols.BTC, candle_size=4)
+    self.assertEqual([(4, 10, 12, 8, 9, 10)], candles)
+
+  def test_GetHistory_AllCandlesFromLongHistory(self):
+    """All candles are built from a long history, including gaps."""
+    # Two trades every other time step for t=1..200.
+    num_steps = 200
+    history = []
+    for t in range(1, num_steps + 1):
+      if t % 2 == 0:
+        history.append((t, t, 1))
+        history.append((t, t + 1, 1))
+    self.exchange.history[asset.Symbols.BTC] = history
+    for _ in range(num_steps):
+      self.time_obj.Step()
+
+    candles = self.exchange.GetHistory(asset.Symbols.BTC, limit=None)
+    self.assertEqual(num_steps - 1, len(candles))
+    for timestamp, price in candles:
+      # Steps without trades keep the previous closing price.
+      last_trade_time = timestamp - timestamp % 2
+      self.assertEqual(last_trade_time + 1, price)
+
+
+class TestSimulatedExchange_Events(unittest.TestCase):
+  """Test cases for the structured events of the exchange."""
+
+  def setUp(self):
+    """Test set up. Called before each test case."""
+    self.time_obj = env_time.IntegerTime(start_time=0, time_unit=1)
+    history = {asset.Symbols.BTC: [(-1, 10, 0)]}
+    self.events = events.EventBuffer()
+    self.exchange = sim_exchange.SimulatedExchange(
+        time=self.time_obj, symbols=[asset.Symbols.BTC], history=history,
+        events=self.events)
+    initial_balance = {asset.Symbols.USD: 100, asset.Symbols.BTC: 100}
+    self.buyer_wallet = wallet.Wallet(initial_balance)
+    self.seller_wallet = wallet.Wallet(initial_balance)
+
+  def test_OrderFillAndCancelEvents(self):
+    """Placed, filled and cancelled orders are recorded as events."""
+    bid_id = self.exchange.Buy(asset.Symbols.BTC, 3, self.buyer_wallet, price=5)
+    ask_id = self.exchange.Sell(asset.Symbols.BTC, 2, self.seller_wallet, price=4)
+    self.exchange.Cancel(bid_id)
+
+    self.assertEqual([
+        (events.BID, 0, asset.Symbols.BTC, bid_id, -1, 5, 3),
+        (events.ASK, 0, asset.Symbols.BTC, ask_id, -1, 4, 2),
+        (events.FILL, 0, asset.Symbols.BTC, bid_id, ask_id, 5, 2),
+        (events.CANCEL, 0, asset.Symbols.BTC, bid_id, -1, 0.0, 0.0),
+    ], self.events.GetEvents())
+
+  def test_SubmitOrders_SameEventsAsBuyAndSell(self):
+    """Orders submitted as a batch emit the events of Buy and Sell."""
+    self.exchange.Buy(asset.Symbols.BTC, 3, self.buyer_wallet, price=5)
+    self.exchange.Sell(asset.Symbols.BTC, 2, self.seller_wallet)
+    sequential_events = self.events.GetEvents()
+
+    batch_events = events.EventBuffer()
+    batch_exchange = sim_exchange.SimulatedExchange(
+        time=self.time_obj, symbols=[asset.Symbols.BTC],
+        history={asset.Symbols.BTC: [(-1, 10, 0)]}, events=batch_events)
+    batch_exchange.SubmitOrders([
+        exchange.OrderRequest(exchange.OrderSide.BUY, asset.Symbols.BTC, 3,
+                              self.buyer_wallet, 5),
+        exchange.OrderRequest(exchange.OrderSide.SELL, asset.Symbols.BTC, 2,
+                              self.seller_wallet, None),
+    ])
+    self.assertEqual(sequential_events, batch_events.GetEvents())
+
+  def test_LoggerGetsEventBuffer(self):
+    """An exchange with only a logger logs its events."""
+    exchange_obj = sim_exchange.SimulatedExchange(
+        time=self.time_obj, symbols=[asset.Symbols.BTC],
+        history={asset.Symbols.BTC: [(-1, 10, 0)]}, logger=object())
+    self.assertIsInstance(
+        exchange_obj.events.consumers[0], events.LogConsumer)
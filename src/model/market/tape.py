@@ -0,0 +1,344 @@
+"""Binary trade tape for recording executed trades to disk."""
+
+import os
+
+import numpy as np
+
+import src.model.market.trade_history as trade_history
+
+
+# Fixed-size record for one trade (24 bytes).
+RECORD_DTYPE = np.dtype([
+    ('timestamp', '<f8'),
+    ('price', '<f8'),
+    ('amount', '<f8'),
+])
+
+
+class TapeWriter(object):
+  """Appends trades to a tape file of fixed-size binary records.
+
+  Trades are collected in a preallocated buffer and written to the file
+  when the buffer is full, so writing a trade does not touch the disk.
+  """
+
+  # Type of the records in the file.
+  dtype = RECORD_DTYPE
+
+  # Default number of trades buffered before writing to the file.
+  DEFAULT_BUFFER_SIZE = 4096
+
+  def __init__(self, path, buffer_size=DEFAULT_BUFFER_SIZE):
+    """Open the tape for appending.
+
+    Args:
+      path: Path of the tape file. Existing trades in the file are kept.
+      buffer_size: (optional) Number of trades to buffer in memory.
+    """
+    self.path = path
+    self._file = open(path, 'ab')
+    self._buffer = np.empty(buffer_size, dtype=RECORD_DTYPE)
+    self._size = 0
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    self.Close()
+
+  @property
+  def closed(self):
+    """Whether the tape was closed."""
+    return self._file.closed
+
+  def __getstate__(self):
+    """Flush the buffer and keep the path and number of trades written."""
+    if not self.closed:
+      self.Flush()
+    return {'path': self.path, 'buffer_size': len(self._buffer),
+            'num_records': os.path.getsize(self.path) // RECORD_DTYPE.itemsize}
+
+  def __setstate__(self, state):
+    """Reopen the tape for appending.
+
+    Trades written after the tape was pickled are removed, so a restored
+    simulation continues the tape where it was saved.
+    """
+    size = state['num_records'] * RECORD_DTYPE.itemsize
+    if os.path.getsize(state['path']) < size:
+      raise ValueError('Tape %s is shorter than when it was saved.'
+                       % state['path'])
+    os.truncate(state['path'], size)
+    self.__init__(state['path'], state['buffer_size'])
+
+  def Write(self, timestamp, price, amount):
+    """Add a trade to the tape.
+
+    Args:
+      timestamp: Time of the trade.
+      price: Price per unit.
+      amount: Amount traded.
+    """
+    self._buffer[self._size] = (timestamp, price, amount)
+    self._size += 1
+    if self._size == len(self._buffer):
+      self.Flush()
+
+  def WriteColumns(self, timestamps, prices, amounts):
+    """Add trades given as columns to the tape.
+
+    Args:
+      timestamps: Array of trade times.
+      prices: Array of prices per unit.
+      amounts: Array of amounts traded.
+    """
+    self.Flush()
+    records = np.empty(len(timestamps), dtype=RECORD_DTYPE)
+    records['timestamp'] = timestamps
+    records['price'] = prices
+    records['amount'] = amounts
+    self._file.write(records.tobytes())
+
+  def GetNumRecords(self):
+    """Gets the number of trades on the tape, including buffered trades."""
+    return self._file.tell() // RECORD_DTYPE.itemsize + self._size
+
+  def Flush(self):
+    """Write buffered trades to the file."""
+    if self._size:
+      self._file.write(self._buffer[:self._size].tobytes())
+      self._size = 0
+    self._file.flush()
+
+  def Close(self):
+    """Write buffered trades and close the file."""
+    if not self.closed:
+      self.Flush()
+      self._file.close()
+
+
+def ReadTape(path):
+  """Map the records in a tape file into memory.
+
+  Records are read from disk on access, so the tape does not need to fit
+  in memory.
+
+  Args:
+    path: Path of the tape file.
+
+  Returns:
+    Read-only array of RECORD_DTYPE records.
+  """
+  if os.path.getsize(path) == 0:
+    # Empty files cannot be memory-mapped.
+    return np.empty(0, dtype=RECORD_DTYPE)
+  return np.memmap(path, dtype=RECORD_DTYPE, mode='r')
+
+
+def LoadHistory(path):
+  """Create a trade history backed by a tape file.
+
+  The columns of the history are views of the memory-mapped file. Nothing is
+  parsed or copied until a new trade is appended to the history.
+
+  Args:
+    path: Path of the tape file.
+
+  Returns:
+    TradeHistory with the trades on the tape.
+  """
+  records = ReadTape(path)
+  return trade_history.TradeHistory.FromArrays(
+      records['timestamp'], records['price'], records['amount'])
+
+
+class TapeHistory(trade_history.TradeHistory):
+  """Trade history that keeps only its latest trades in memory.
+
+  Trades appended to the history are written to a tape. The latest `window`
+  trades are also kept in memory, so prices and recent candles do not touch
+  the disk. Older trades are read back from the tape file when they are
+  accessed, so a long run holds at most twice the window in memory.
+
+  Reading columns that reach before the window copies the trades from the
+  tape, unlike the views returned by TradeHistory.
+  """
+
+  # Default number of latest trades kept in memory.
+  DEFAULT_WINDOW = 1 << 16
+
+  def __init__(self, writer, base, window=DEFAULT_WINDOW):
+    """Initialize the history.
+
+    Args:
+      writer: TapeWriter that every appended trade is written to.
+      base: TradeHistory of the trades before the trades on the tape.
+      window: (optional) Number of latest trades kept in memory.
+    """
+    if window < 1:
+      raise ValueError('History window must be at least 1.')
+    trade_history.TradeHistory.__init__(self, capacity=2 * window)
+    self.writer = writer
+    self.base = base
+    self.window = window
+    # Record of the writer's tape at which the trades of the history start.
+    self._tape_start = writer.GetNumRecords()
+    # Index of the first trade held in memory.
+    self._window_start = len(base)
+
+  def __len__(self):
+    """Number of trades in the history."""
+    return self._window_start + self._size
+
+  def __getitem__(self, key):
+    """Gets a (timestamp, price, amount) record or a list of records."""
+    if isinstance(key, slice):
+      rows = np.arange(*key.indices(len(self)))
+      if not len(rows):
+        return []
+      first = rows.min()
+      columns = self.Columns(first, rows.max() + 1)
+      return list(zip(*(column[rows - first].tolist() for column in columns)))
+    if key < 0:
+      key += len(self)
+    if not 0 <= key < len(self):
+      raise IndexError('Trade history index out of range.')
+    return tuple(column[0].item() for column in self.Columns(key, key + 1))
+
+  def _Evict(self):
+    """Drop all but the latest `window` trades from memory."""
+    num_dropped = self._size - self.window
+    if num_dropped <= 0:
+      return
+    for column in (self._timestamps, self._prices, self._amounts):
+      column[:self.window] = column[num_dropped:self._size]
+    self._size = self.window
+    self._window_start += num_dropped
+
+  def Append(self, timestamp, price, amount):
+    """Add a trade to the end of the history and the tape.
+
+    Args:
+      timestamp: Time of the trade. Must not be before earlier trades.
+      price: Price per unit.
+      amount: Amount traded.
+    """
+    self.writer.Write(timestamp, price, amount)
+    if self._size == len(self._timestamps):
+      self._Evict()
+    trade_history.TradeHistory.Append(self, timestamp, price, amount)
+
+  def Extend(self, timestamps, prices, amounts):
+    """Add trades given as columns to the end of the history and the tape.
+
+    Args:
+      timestamps: Array of trade times sorted in non-decreasing order, not
+        before earlier trades.
+      prices: Array of prices per unit.
+      amounts: Array of amounts traded.
+    """
+    count = len(timestamps)
+    if not count == len(prices) == len(amounts):
+      raise ValueError('History columns have different lengths.')
+    self.writer.WriteColumns(timestamps, prices, amounts)
+    if count >= self.window:
+      # Only the latest of the new trades are kept in memory.
+      self._window_start += self._size + count - self.window
+      self._size = 0
+      timestamps, prices, amounts = (
+          np.asarray(column)[count - self.window:]
+          for column in (timestamps, prices, amounts))
+    elif self._size + count > len(self._timestamps):
+      self._Evict()
+    trade_history.TradeHistory.Extend(self, timestamps, prices, amounts)
+
+  def _MapTape(self, start, end):
+    """Maps the records of trades history[start:end] on the tape."""
+    if not self.writer.closed:
+      self.writer.Flush()
+    return np.memmap(
+        self.writer.path, dtype=RECORD_DTYPE, mode='r',
+        offset=(self._tape_start + start - len(self.base)) *
+        RECORD_DTYPE.itemsize, shape=(end - start,))
+
+  def _ReadTape(self, start, end):
+    """Gets the columns of trades history[start:end] from the tape."""
+    records = self._MapTape(start, end)
+    return (np.array(records['timestamp']), np.array(records['price']),
+            np.array(records['amount']))
+
+  def Columns(self, start=0, end=None):
+    """Gets the columns of the trades history[start:end].
+
+    Trades before the window are read from the base history and the tape.
+
+    Args:
+      start: (optional) Index of the first trade.
+      end: (optional) Index after the last trade. All trades if None.
+
+    Returns:
+      Tuple of timestamp, price and amount arrays.
+    """
+    start, end, _ = slice(start, end).indices(len(self))
+    if end <= start:
+      return trade_history.TradeHistory.Columns(self, 0, 0)
+    num_base = len(self.base)
+    parts = []
+    if start < num_base:
+      parts.append(self.base.Columns(start, min(end, num_base)))
+    if start < self._window_start and end > num_base:
+      parts.append(self._ReadTape(max(start, num_base),
+                                  min(end, self._window_start)))
+    if end > self._window_start:
+      parts.append(trade_history.TradeHistory.Columns(
+          self, max(start, self._window_start) - self._window_start,
+          end - self._window_start))
+    if len(parts) == 1:
+      return parts[0]
+    return tuple(np.concatenate(column) for column in zip(*parts))
+
+  def Timestamps(self):
+    """Gets the trade times, read from the tape before the window."""
+    return self.Columns()[0]
+
+  def Prices(self):
+    """Gets the trade prices, read from the tape before the window."""
+    return self.Columns()[1]
+
+  def Amounts(self):
+    """Gets the traded amounts, read from the tape before the window."""
+    return self.Columns()[2]
+
+  def _Bisect(self, timestamp, side):
+    """Index of the first trade at or after (left) or after (right) a time.
+
+    The window is searched first. Only times before it are searched in the
+    tape, by binary search on a memory map, and then in the base history.
+    """
+    index = int(np.searchsorted(self._timestamps[:self._size], timestamp,
+                                side=side))
+    if index:
+      return self._window_start + index
+    num_base = len(self.base)
+    if self._window_start > num_base:
+      records = self._MapTape(num_base, self._window_start)
+      index = int(np.searchsorted(records['timestamp'], timestamp, side=side))
+      if index:
+        return num_base + index
+    if side == 'left':
+      return self.base.BisectLeft(timestamp)
+    return self.base.BisectRight(timestamp)
+
+  def BisectLeft(self, timestamp):
+    """Index of the first trade at or after the given time."""
+    return self._Bisect(timestamp, 'left')
+
+  def BisectRight(self, timestamp):
+    """Index of the first trade after the given time."""
+    return self._Bisect(timestamp, 'right')
+
+  def LastPrice(self):
+    """Gets the price of the latest trade."""
+    if not self._size:
+      return self.base.LastPrice()
+    return trade_history.TradeHistory.LastPrice(self)
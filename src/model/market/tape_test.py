@@ -0,0 +1,147 @@
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+import src.model.asset as asset
+import src.model.environment.environment_time as env_time
+import src.model.environment.environment as env
+import src.model.market.simulated_exchange as sim_exchange
+import src.model.market.tape as tape
+import src.model.market.trade_history as trade_history
+import src.model.trader.strategies.strategies as strategies
+import src.model.wallet as wallet
+
+
+class TestTape(unittest.TestCase):
+  """Test cases for recording trades on a tape."""
+
+  def setUp(self):
+    """Test set up. Called before each test case."""
+    self.tmp_dir = tempfile.mkdtemp()
+    self.path = os.path.join(self.tmp_dir, 'btc.tape')
+
+  def tearDown(self):
+    """Test tear down. Called after each test case."""
+    shutil.rmtree(self.tmp_dir)
+
+  def test_WriteAndRead(self):
+    """Trades written to the tape are read back in order."""
+    with tape.TapeWriter(self.path, buffer_size=2) as writer:
+      for t in range(5):
+        writer.Write(t, 10 + t, 1)
+    records = tape.ReadTape(self.path)
+    self.assertEqual(5, len(records))
+    self.assertEqual(list(range(5)), records['timestamp'].tolist())
+    self.assertEqual(14, records['price'][-1])
+
+  def test_Unpickle_TruncatesLaterTrades(self):
+    """An unpickled writer drops trades written after it was pickled."""
+    writer = tape.TapeWriter(self.path, buffer_size=2)
+    writer.Write(0, 10, 1)
+    state = pickle.dumps(writer)
+    writer.Write(1, 11, 1)
+    writer.Close()
+    restored = pickle.loads(state)
+    restored.Write(1, 12, 1)
+    restored.Close()
+    records = tape.ReadTape(self.path)
+    self.assertEqual([10, 12], records['price'].tolist())
+
+  def test_ExchangeRecordsTrades_TapeSeedsHistory(self):
+    """Trades executed on the exchange can seed another exchange."""
+    time_obj = env_time.IntegerTime()
+    symbols = [asset.Symbols.BTC]
+    with tape.TapeWriter(self.path) as writer:
+      writer.Write(-1, 20, 0)
+      exchange = sim_exchange.SimulatedExchange(
+          time=time_obj, symbols=symbols,
+          history={asset.Symbols.BTC: [(-1, 20, 0)]},
+          tapes={asset.Symbols.BTC: writer})
+      amounts = {asset.Symbols.USD: 100, asset.Symbols.BTC: 10}
+      exchange.Buy(asset.Symbols.BTC, 2, wallet.Wallet(amounts), price=25)
+      exchange.Sell(asset.Symbols.BTC, 2, wallet.Wallet(amounts), price=25)
+
+    seeded_exchange = sim_exchange.SimulatedExchange(
+        time=time_obj, symbols=symbols,
+        history={asset.Symbols.BTC: tape.LoadHistory(self.path)})
+    self.assertEqual(25, seeded_exchange.GetPrice(asset.Symbols.BTC))
+    self.assertEqual([[0, 25]], seeded_exchange.GetHistory(asset.Symbols.BTC, limit=1))
+
+  def test_TapeHistory_ReadsOldTradesFromTape(self):
+    """Trades before the window are read back from the tape."""
+    base = trade_history.TradeHistory([(-1, 20, 0)])
+    with tape.TapeWriter(self.path, buffer_size=3) as writer:
+      history = tape.TapeHistory(writer, base, window=4)
+      for t in range(10):
+        history.Append(t, 100 + t, 1)
+      history.Extend(np.arange(10, 20), np.arange(110, 120), np.ones(10))
+      self.assertEqual(21, len(history))
+      self.assertLessEqual(len(history._timestamps), 8)
+      expected = [(-1, 20, 0)] + [(t, 100 + t, 1) for t in range(20)]
+      self.assertEqual(expected, list(history))
+      self.assertEqual(expected[2:15:3], history[2:15:3])
+      self.assertEqual((5, 105, 1), history[6])
+      self.assertEqual((19, 119, 1), history[-1])
+      self.assertEqual(119, history.LastPrice())
+      self.assertEqual([t for t, _, _ in expected],
+                       history.Timestamps().tolist())
+      self.assertEqual(3, history.BisectLeft(2))
+    self.assertEqual(list(range(100, 120)),
+                     tape.ReadTape(self.path)['price'].tolist())
+
+  def test_TapeHistory_BisectWithoutReadingTape(self):
+    """Times are found without reading the columns of the whole tape."""
+    records = [(-2, 20, 0), (-1, 20, 0)] + [
+        (t // 3, 100 + t, 1) for t in range(30)]
+    full = trade_history.TradeHistory(records)
+    with tape.TapeWriter(self.path, buffer_size=3) as writer:
+      history = tape.TapeHistory(
+          writer, trade_history.TradeHistory(records[:2]), window=4)
+      for record in records[2:]:
+        history.Append(*record)
+
+      def NoColumns(*args):
+        raise AssertionError('Columns read.')
+      history.Columns = NoColumns
+      for timestamp in np.arange(-3, 12, 0.5):
+        self.assertEqual(full.BisectLeft(timestamp),
+                         history.BisectLeft(timestamp))
+        self.assertEqual(full.BisectRight(timestamp),
+                         history.BisectRight(timestamp))
+
+  def test_TapeHistory_ExchangeMatchesFullHistory(self):
+    """An exchange with a history window trades like one without."""
+    histories = []
+    for window in (None, 8):
+      time_obj = env_time.IntegerTime(start_time=0, time_unit=1)
+      path = os.path.join(self.tmp_dir, '%s.tape' % window)
+      writer = tape.TapeWriter(path, buffer_size=16)
+      exchange = sim_exchange.SimulatedExchange(
+          time=time_obj, symbols=[asset.Symbols.BTC],
+          history={asset.Symbols.BTC: [(-1, 20, -1)]},
+          tapes={asset.Symbols.BTC: writer}, history_window=window)
+      environment = env.TradingEnvironment(
+          time=time_obj, exchanges=[exchange], seed=3)
+      environment.GenerateAgents(
+          20, {strategies.RandomStrategy(): 0.5,
+               strategies.BandedMomentumStrategy(history_range=5): 0.5},
+          {asset.Symbols.USD: 1000, asset.Symbols.BTC: 10})
+      environment.Run(timesteps=10)
+      history = exchange.history[asset.Symbols.BTC]
+      histories.append((list(history), exchange.GetCandles(
+          asset.Symbols.BTC, limit=None, candle_size=3)))
+      writer.Close()
+      self.assertEqual(list(history)[1:], list(tape.LoadHistory(path)))
+    self.assertIsInstance(exchange.history[asset.Symbols.BTC],
+                          tape.TapeHistory)
+    self.assertGreater(len(histories[1][0]), 16)
+    self.assertEqual(histories[0], histories[1])
+
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,177 @@
+"""Columnar trade history for assets on an exchange."""
+
+import numpy as np
+
+
+class TradeHistory(object):
+  """Trade records for one asset stored in typed columns.
+
+  Timestamps, prices and amounts are kept in separate float64 arrays (24
+  bytes per trade). The arrays grow geometrically, so appending a trade is
+  amortized O(1). Records are read as (timestamp, price, amount) tuples, like
+  the list of tuples this class replaces, and the columns can be read as
+  NumPy views without copying.
+  """
+
+  # Initial number of records the columns can hold.
+  DEFAULT_CAPACITY = 1024
+
+  def __init__(self, records=(), capacity=DEFAULT_CAPACITY):
+    """Initialize the history.
+
+    Args:
+      records: (optional) (timestamp, price, amount) tuples sorted by time.
+      capacity: (optional) Initial number of records to allocate.
+    """
+    records = list(records)
+    capacity = max(capacity, len(records))
+    self._timestamps = np.empty(capacity, dtype=np.float64)
+    self._prices = np.empty(capacity, dtype=np.float64)
+    self._amounts = np.empty(capacity, dtype=np.float64)
+    self._size = 0
+    if records:
+      columns = np.array(records, dtype=np.float64)
+      self._size = len(records)
+      self._timestamps[:self._size] = columns[:, 0]
+      self._prices[:self._size] = columns[:, 1]
+      self._amounts[:self._size] = columns[:, 2]
+
+  @classmethod
+  def FromArrays(cls, timestamps, prices, amounts):
+    """Create a history backed by the given arrays without copying them.
+
+    The arrays are only copied when the first trade is appended.
+
+    Args:
+      timestamps: Array of trade times sorted in non-decreasing order.
+      prices: Array of prices per unit.
+      amounts: Array of amounts traded.
+
+    Returns:
+      TradeHistory containing the trades.
+    """
+    if not len(timestamps) == len(prices) == len(amounts):
+      raise ValueError('History columns have different lengths.')
+    history = cls(capacity=0)
+    history._timestamps = np.asarray(timestamps, dtype=np.float64)
+    history._prices = np.asarray(prices, dtype=np.float64)
+    history._amounts = np.asarray(amounts, dtype=np.float64)
+    history._size = len(timestamps)
+    return history
+
+  def __len__(self):
+    """Number of trades in the history."""
+    return self._size
+
+  def __getitem__(self, key):
+    """Gets a (timestamp, price, amount) record or a list of records."""
+    if isinstance(key, slice):
+      start, stop, step = key.indices(self._size)
+      return list(zip(self._timestamps[start:stop:step].tolist(),
+                      self._prices[start:stop:step].tolist(),
+                      self._amounts[start:stop:step].tolist()))
+    if key < 0:
+      key += self._size
+    if not 0 <= key < self._size:
+      raise IndexError('Trade history index out of range.')
+    return (self._timestamps[key].item(), self._prices[key].item(),
+            self._amounts[key].item())
+
+  def __iter__(self):
+    """Iterate over (timestamp, price, amount) records."""
+    return iter(self[:])
+
+  def _Grow(self, min_capacity=0):
+    """Double the capacity of the columns, or grow them to min_capacity."""
+    capacity = max(2 * len(self._timestamps), self.DEFAULT_CAPACITY,
+                   min_capacity)
+    for name in ('_timestamps', '_prices', '_amounts'):
+      column = np.empty(capacity, dtype=np.float64)
+      column[:self._size] = getattr(self, name)[:self._size]
+      setattr(self, name, column)
+
+  def Append(self, timestamp, price, amount):
+    """Add a trade to the end of the history.
+
+    Args:
+      timestamp: Time of the trade. Must not be before earlier trades.
+      price: Price per unit.
+      amount: Amount traded.
+    """
+    if (self._size == len(self._timestamps) or
+        not self._timestamps.flags.writeable):
+      self._Grow()
+    i = self._size
+    self._timestamps[i] = timestamp
+    self._prices[i] = price
+    self._amounts[i] = amount
+    self._size += 1
+
+  def Extend(self, timestamps, prices, amounts):
+    """Add trades given as columns to the end of the history.
+
+    Args:
+      timestamps: Array of trade times sorted in non-decreasing order, not
+        before earlier trades.
+      prices: Array of prices per unit.
+      amounts: Array of amounts traded.
+    """
+    count = len(timestamps)
+    if not count == len(prices) == len(amounts):
+      raise ValueError('History columns have different lengths.')
+    end = self._size + count
+    if end > len(self._timestamps) or not self._timestamps.flags.writeable:
+      self._Grow(end)
+    self._timestamps[self._size:end] = timestamps
+    self._prices[self._size:end] = prices
+    self._amounts[self._size:end] = amounts
+    self._size = end
+
+  def append(self, record):
+    """Add a (timestamp, price, amount) record, like list.append."""
+    self.Append(*record)
+
+  def Timestamps(self):
+    """Gets a view of the trade times.
+
+    Views are not updated when the history has to grow, so get a new view
+    after appending trades.
+    """
+    return self._timestamps[:self._size]
+
+  def Prices(self):
+    """Gets a view of the trade prices."""
+    return self._prices[:self._size]
+
+  def Amounts(self):
+    """Gets a view of the traded amounts."""
+    return self._amounts[:self._size]
+
+  def Columns(self, start=0, end=None):
+    """Gets the columns of the trades history[start:end].
+
+    Args:
+      start: (optional) Index of the first trade.
+      end: (optional) Index after the last trade. All trades if None.
+
+    Returns:
+      Tuple of timestamp, price and amount arrays. Views of the columns,
+      like Timestamps, Prices and Amounts.
+    """
+    start, end, _ = slice(start, end).indices(self._size)
+    return (self._timestamps[start:end], self._prices[start:end],
+            self._amounts[start:end])
+
+  def LastPrice(self):
+    """Gets the price of the latest trade."""
+    if not self._size:
+      raise IndexError('Trade history is empty.')
+    return self._prices[self._size - 1].item()
+
+  def BisectLeft(self, timestamp):
+    """Index of the first trade at or after the given time."""
+    return int(np.searchsorted(self.Timestamps(), timestamp, side='left'))
+
+  def BisectRight(self, timestamp):
+    """Index of the first trade after the given time."""
+    return int(np.searchsorted(self.Timestamps(), timestamp, side='right'))
@@ -0,0 +1,64 @@
+import unittest
+
+import numpy as np
+
+import src.model.market.trade_history as trade_history
+
+
+class TestTradeHistory(unittest.TestCase):
+  """Test cases for the columnar trade history."""
+
+  def test_RecordsReadAsTuples(self):
+    """Records are read back as (timestamp, price, amount) tuples."""
+    records = [(-1, 20, -1), (1, 21, 2), (2, 19, 3)]
+    history = trade_history.TradeHistory(records)
+    self.assertEqual(3, len(history))
+    self.assertEqual((2, 19, 3), history[-1])
+    self.assertEqual(records[1:], history[1:])
+    self.assertEqual(records, list(history))
+    self.assertEqual(19, history.LastPrice())
+
+  def test_Append_GrowsColumns(self):
+    """Appending past the capacity keeps all records."""
+    history = trade_history.TradeHistory(capacity=2)
+    for t in range(10):
+      history.Append(t, 100 + t, 1)
+    self.assertEqual(10, len(history))
+    self.assertEqual(list(range(10)), history.Timestamps().tolist())
+    self.assertEqual(109, history.LastPrice())
+
+  def test_Extend_AppendsColumns(self):
+    """Columns are appended past the capacity and to array-backed histories."""
+    history = trade_history.TradeHistory.FromArrays(
+        np.array([0.0]), np.array([10.0]), np.array([1.0]))
+    history.Extend(np.arange(1, 3000), np.full(2999, 11.0), np.ones(2999))
+    self.assertEqual(3000, len(history))
+    self.assertEqual((2999, 11, 1), history[-1])
+    self.assertEqual((0, 10, 1), history[0])
+
+  def test_Columns(self):
+    """Columns of a range of trades are views of the history."""
+    history = trade_history.TradeHistory([(t, 10 + t, 1) for t in range(5)])
+    timestamps, prices, amounts = history.Columns(1, 3)
+    self.assertEqual([1, 2], timestamps.tolist())
+    self.assertEqual([11, 12], prices.tolist())
+    self.assertTrue(np.shares_memory(prices, history.Prices()))
+    self.assertEqual([3, 4], history.Columns(-2)[0].tolist())
+
+  def test_Bisect(self):
+    """Bisect finds trades by timestamp."""
+    history = trade_history.TradeHistory([(1, 1, 1), (2, 1, 1), (2, 1, 1), (4, 1, 1)])
+    self.assertEqual(1, history.BisectLeft(2))
+    self.assertEqual(3, history.BisectRight(2))
+    self.assertEqual(3, history.BisectRight(3))
+
+  def test_FromArrays_NoCopyUntilAppend(self):
+    """History shares the given arrays until a trade is appended."""
+    timestamps = np.arange(3, dtype=np.float64)
+    prices = np.array([5.0, 6.0, 7.0])
+    amounts = np.ones(3)
+    history = trade_history.TradeHistory.FromArrays(timestamps, prices, amounts)
+    self.assertTrue(np.shares_memory(prices, history.Prices()))
+    history.Append(3, 8, 1)
+    self.assertEqual(8, history.LastPrice())
+    self.assertEqual([5.0, 6.0, 7.0], prices.tolist())
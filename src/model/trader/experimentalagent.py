@@ -7,21 +7,31 @@ import src.model.wallet as wallet
 
 class ExperimentalAgent(agent.Agent):
 
-  def __init__(self, strategy, initialWallet=None, initialExchanges=[]):
+  def __init__(self, strategy, initialWallet=None, initialExchanges=[],
+               rng=None):
     """Initialize the agent.
     
     Args:
       strategy: The trader's trading strategy.
       initialWallet: (optional) The trader's initial funds.
       initialExchanges: (optional) The exchanges the trader should trade on.
+      rng: (optional) The trader's rng.Stream. Each trade draws from the
+        next block of the stream. The strategy uses the random module if
+        None.
     """
     self.strategy = strategy
     self.wallet = initialWallet or wallet.Wallet()
     self.exchanges = initialExchanges
+    self.rng = rng
 
   def Trade(self):
-    """Invokes this agent's trade strategy."""
-    self.strategy.Invoke(self.exchanges, self.wallet)
+    """Invokes this agent's trade strategy.
+
+    Returns:
+      The result of the strategy, e.g. strategies.IDLE.
+    """
+    rng = self.rng.Next() if self.rng is not None else None
+    return self.strategy.Invoke(self.exchanges, self.wallet, rng=rng)
 
   def GetExchanges(self):
     """Gets the exchange the trader wants to trade on"""
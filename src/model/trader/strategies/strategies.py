@@ -1,60 +1,173 @@
 import numpy as np
 import random as rand
 
+import src.model.asset as asset
+import src.model.market.exchange as exchange_lib
+import src.model.wallet as wallet_lib
+
+
+# Returned by Strategy.Invoke when the agent did not trade and is not
+# expected to trade on its next action either.
+IDLE = 'idle'
+
 
 class Strategy(object):
   """Different types of trading strategies"""
 
+  # Whether InvokeCohort is implemented.
+  supports_cohorts = False
+  # Shared market data service, if the environment provides one.
+  market_data = None
+  # Expected number of actions per time unit of an agent scheduled by
+  # events. Set on an instance to change it for one strategy.
+  arrival_rate = 1.0
+
   def __init__(self, *args, **kwargs):
     """Base class initialization here."""
     pass
 
+  def SetMarketData(self, market_data):
+    """Use the given MarketData service for indicators."""
+    self.market_data = market_data
+
   def Invoke(self, *args, **kwargs):
-    """Invokes this strategy."""
+    """Invokes this strategy.
+
+    Subclasses take the exchanges, the agent's wallet and an optional rng,
+    the agent's random.Random stream. The random module is used if no rng is
+    given. They return IDLE if the agent is idle, e.g. because it has
+    nothing to trade with. Agents scheduled by events are then woken less
+    often until they trade again.
+    """
     raise NotImplementedError('Override this method in a subclass.')
 
+  def InvokeCohort(self, exchanges, wallets, rng):
+    """Invokes this strategy for a cohort of agents at once.
+
+    Args:
+      exchanges: Exchanges where trades can be made.
+      wallets: Wallets of the agents in the cohort.
+      rng: numpy.random.Generator used for the cohort's decisions.
+    """
+    raise NotImplementedError('Override this method in a subclass.')
+
+
+def _HasNothingToTrade(exchange, wallet):
+  """Whether a wallet has less than one unit of cash and of every asset."""
+  if wallet.GetAmount(asset.Symbols.USD) >= 1:
+    return False
+  for symbol in exchange.GetSymbols():
+    if wallet.GetAmount(symbol) >= 1:
+      return False
+  return True
+
 
 class RandomStrategy(Strategy):
   """Zero-intelligence, random trading strategy."""
-  
+
+  supports_cohorts = True
+
   def __init__(self, buy_price_std=1, sell_price_std=1):
     """Initialize the trade strategy."""
     # Price is determined by Gauss(mean=market_price, std) distribution.
     self.buy_price_std = buy_price_std
     self.sell_price_std = sell_price_std
 
-  def Invoke(self, exchanges, wallet):
+  def Invoke(self, exchanges, wallet, rng=None):
     """Invoke the random strategy.
 
     Args:
       exchanges: Exchanges where trades can be made.
       wallet: The assets available for trading.
+      rng: (optional) random.Random used for the agent's decisions.
+
+    Returns:
+      IDLE if the agent has no cash and no shares of the exchange's assets.
     """
+    rng = rng or rand
     # Pick one exchange and one asset to trade on.
-    exchange = rand.choice(exchanges)
-    symbol = rand.choice(exchange.GetSymbols())
+    exchange = rng.choice(exchanges)
+    symbol = rng.choice(exchange.GetSymbols())
+    if _HasNothingToTrade(exchange, wallet):
+      return IDLE
     price = exchange.GetPrice(symbol)
 
     #variable that decides whether agent will buy or sell
-    buy = rand.getrandbits(1)
+    buy = rng.getrandbits(1)
     if buy:
       # Pick bid price from Gaussian distribution centered at market price.
-      buyPrice = int(rand.gauss(price, self.buy_price_std))
+      buyPrice = int(rng.gauss(price, self.buy_price_std))
       walletCash = wallet.GetAmount('usd')
       if walletCash > buyPrice and buyPrice > 0:
         # Buy amount from [1, max_amount_affordable]
-        amount = rand.randint(1, int(walletCash/buyPrice))
+        amount = rng.randint(1, int(walletCash/buyPrice))
         exchange.Buy(symbol, amount, wallet, buyPrice)
     if not buy:
       # Pick bid price from Gaussian distribution centered at market price.
-      sellPrice = int(rand.gauss(price, self.sell_price_std))
+      sellPrice = int(rng.gauss(price, self.sell_price_std))
       walletAmount = wallet.GetAmount(symbol)
       if walletAmount >= 1 and sellPrice > 0:
         # Sell amount from [1, total_shares_int_wallet]
-        amount = rand.randint(1, int(walletAmount))
+        amount = rng.randint(1, int(walletAmount))
         #print("Wallet Amount is %s" % walletAmount)
         exchange.Sell(symbol, amount, wallet, sellPrice)
 
+  def InvokeCohort(self, exchanges, wallets, rng):
+    """Invoke the random strategy for a cohort of agents.
+
+    All decisions of the cohort are drawn as NumPy arrays and the resulting
+    orders are submitted as one batch per exchange. Agents see the market
+    prices at the start of the batch.
+
+    Args:
+      exchanges: Exchanges where trades can be made.
+      wallets: Wallets of the agents in the cohort.
+      rng: numpy.random.Generator used for the cohort's decisions.
+    """
+    # Pick one exchange per agent.
+    exchange_choices = rng.integers(len(exchanges), size=len(wallets))
+    for exchange_index, exchange in enumerate(exchanges):
+      members = np.flatnonzero(exchange_choices == exchange_index)
+      if not len(members):
+        continue
+      # Pick one asset per agent.
+      symbols = exchange.GetSymbols()
+      symbol_choices = rng.integers(len(symbols), size=len(members))
+      market_prices = np.array(
+          [exchange.GetPrice(symbol) for symbol in symbols], dtype=float)
+      # Decide whether each agent buys or sells.
+      buy = rng.integers(2, size=len(members)).astype(bool)
+      # Pick prices from Gaussian distributions centered at market price.
+      price_std = np.where(buy, self.buy_price_std, self.sell_price_std)
+      prices = np.trunc(
+          rng.normal(market_prices[symbol_choices], price_std)).astype(np.int64)
+      member_wallets = [wallets[i] for i in members]
+      cash = wallet_lib.GetAmounts(member_wallets, asset.Symbols.USD)
+      shares = np.zeros(len(members))
+      for symbol_index, symbol in enumerate(symbols):
+        holders = np.flatnonzero(symbol_choices == symbol_index)
+        shares[holders] = wallet_lib.GetAmounts(
+            [member_wallets[i] for i in holders], symbol)
+      # Buy amount from [1, max_amount_affordable] and sell amount from
+      # [1, total_shares_in_wallet].
+      can_buy = buy & (cash > prices) & (prices > 0)
+      can_sell = ~buy & (shares >= 1) & (prices > 0)
+      max_amounts = np.where(
+          buy, cash // np.maximum(prices, 1), np.floor(shares)).astype(np.int64)
+      active = np.flatnonzero(can_buy | can_sell)
+      amounts = rng.integers(1, max_amounts[active] + 1)
+      orders = []
+      for i, amount in zip(active.tolist(), amounts.tolist()):
+        if buy[i]:
+          side = exchange_lib.OrderSide.BUY
+        else:
+          side = exchange_lib.OrderSide.SELL
+        orders.append(exchange_lib.OrderRequest(
+            side, symbols[symbol_choices[i]], amount, member_wallets[i],
+            int(prices[i])))
+      if orders:
+        exchange.SubmitOrders(orders)
+
 
 
 
@@ -66,28 +179,47 @@ class BandedMomentumStrategy(Strategy):
     self.price_range = price_range
     self.momentum = momentum
 
-  def Invoke(self, exchanges, wallet):
-    """Invoke the momentum strategy."""
+  def Invoke(self, exchanges, wallet, rng=None):
+    """Invoke the momentum strategy.
+
+    Returns:
+      IDLE if the price is inside the band or the agent has no cash and no
+      shares of the exchange's assets.
+    """
+    rng = rng or rand
     # Pick one exchange and one asset to trade on.
-    exchange = rand.choice(exchanges)
-    symbol = rand.choice(exchange.GetSymbols())
+    exchange = rng.choice(exchanges)
+    symbol = rng.choice(exchange.GetSymbols())
+    if _HasNothingToTrade(exchange, wallet):
+      return IDLE
     price = exchange.GetPrice(symbol)
-    history = exchange.GetHistory(symbol, self.history_range)
-    price_hist = [i[0] for i in history]
-
-    avg_price = np.mean(price_hist)
-    if (price > (avg_price*(1+self.price_range) and self.momentum) or
-        (price < (avg_price*(1-self.price_range)))):
+    if self.market_data:
+      # Rolling average shared with other agents, updated once per candle.
+      avg_price = self.market_data.Rolling(
+          exchange, symbol, self.history_range).Mean()
+      if avg_price is None:
+        # No completed candles yet.
+        return
+    else:
+      history = exchange.GetHistory(symbol, self.history_range)
+      price_hist = [i[1] for i in history]
+      avg_price = np.mean(price_hist)
+    buy_signal = (price > (avg_price*(1+self.price_range) and self.momentum) or
+                  (price < (avg_price*(1-self.price_range))))
+    sell_signal = (price < (avg_price*(1-self.price_range) and self.momentum) or
+                   (price > (avg_price*(1+self.price_range))))
+    if not buy_signal and not sell_signal:
+      return IDLE
+    if buy_signal:
       walletCash = wallet.GetAmount('usd')
       if walletCash > price and price > 0:
         # Buy amount from [1, max_amount_affordable]
-        amount = rand.randint(1, int(walletCash/price))
+        amount = rng.randint(1, int(walletCash/price))
         exchange.Buy(symbol, amount, wallet)
-    if (price < (avg_price*(1-self.price_range) and self.momentum) or
-        (price > (avg_price*(1+self.price_range)))):
+    if sell_signal:
       walletAmount = wallet.GetAmount(symbol)
       if walletAmount >= 1:
         # Sell amount from [1, total_shares_int_wallet]
-        amount = rand.randint(1, int(walletAmount))
+        amount = rng.randint(1, int(walletAmount))
         #print("Wallet Amount is %s" % walletAmount)
         exchange.Sell(symbol, amount, wallet)
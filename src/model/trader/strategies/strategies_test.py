@@ -0,0 +1,49 @@
+import unittest
+
+import numpy as np
+
+import src.model.asset as asset
+import src.model.environment.environment_time as env_time
+import src.model.market.simulated_exchange as sim_exchange
+import src.model.trader.strategies.strategies as strategies
+import src.model.wallet as wallet
+
+
+class TestRandomStrategy_Cohort(unittest.TestCase):
+  """Test cases for invoking the random strategy for a cohort of agents."""
+
+  # Number of agents in the cohort.
+  NUM_AGENTS = 200
+
+  def setUp(self):
+    """Test set up. Called before each test case."""
+    time_obj = env_time.IntegerTime(start_time=0, time_unit=1)
+    history = {asset.Symbols.BTC: [(-1, 20, 0)]}
+    self.exchange = sim_exchange.SimulatedExchange(
+        time=time_obj, symbols=[asset.Symbols.BTC], history=history)
+    initial_balance = {asset.Symbols.USD: 100, asset.Symbols.BTC: 5}
+    self.wallets = [wallet.Wallet(initial_balance)
+                    for _ in range(self.NUM_AGENTS)]
+    self.strategy = strategies.RandomStrategy()
+
+  def test_InvokeCohort_OrdersAreAffordable(self):
+    """Every agent places at most one order it can afford."""
+    self.strategy.InvokeCohort(
+        [self.exchange], self.wallets, np.random.default_rng(1))
+
+    # Orders were placed by about half of the agents on each side.
+    self.assertGreater(self.exchange.trade_id, self.NUM_AGENTS // 2)
+    self.assertLessEqual(self.exchange.trade_id, self.NUM_AGENTS)
+    for agent_wallet in self.wallets:
+      self.assertGreaterEqual(agent_wallet.GetAmount(asset.Symbols.USD), 0)
+      self.assertGreaterEqual(agent_wallet.GetAmount(asset.Symbols.BTC), 0)
+
+  def test_InvokeCohort_SameSeedSameOrders(self):
+    """The orders only depend on the random generator."""
+    self.strategy.InvokeCohort(
+        [self.exchange], self.wallets, np.random.default_rng(7))
+    first_amounts = [w.amounts for w in self.wallets]
+    self.setUp()
+    self.strategy.InvokeCohort(
+        [self.exchange], self.wallets, np.random.default_rng(7))
+    self.assertEqual(first_amounts, [w.amounts for w in self.wallets])
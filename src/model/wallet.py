@@ -1,6 +1,8 @@
 
 import copy
 
+import numpy as np
+
 
 class Wallet(object):
   """Wallet containing multiple types of assets."""
@@ -54,4 +56,183 @@ class Wallet(object):
       result += '%s: %s, ' % (symbol, amount)
     result += ')'
     return result
-    
+
+
+class WalletBank(object):
+  """Holdings of many wallets stored in one array.
+
+  Row i of the (wallets x symbols) array holds the amounts of wallet i. The
+  wallets are used through BankWallet handles, which have the same interface
+  as Wallet. Aggregate statistics over all wallets are array operations on
+  the columns.
+  """
+
+  def __init__(self, symbols=(), capacity=0):
+    """Initialize an empty bank.
+
+    Args:
+      symbols: (optional) Initial symbols with a column in the bank.
+      capacity: (optional) Number of wallets to allocate.
+    """
+    self.symbols = []
+    # Symbol -> column index.
+    self.columns = {}
+    self.amounts = np.zeros((capacity, 0))
+    self.size = 0
+    for symbol in symbols:
+      self.AddSymbol(symbol)
+
+  def __len__(self):
+    """Number of wallets in the bank."""
+    return self.size
+
+  def AddSymbol(self, symbol):
+    """Add a column for the given symbol if it does not exist yet.
+
+    Returns:
+      Column index of the symbol.
+    """
+    if symbol in self.columns:
+      return self.columns[symbol]
+    column = len(self.symbols)
+    self.symbols.append(symbol)
+    self.columns[symbol] = column
+    self.amounts = np.hstack((self.amounts, np.zeros((len(self.amounts), 1))))
+    return column
+
+  def AddWallets(self, count, amounts={}):
+    """Add wallets to the bank.
+
+    Args:
+      count: Number of wallets to add.
+      amounts: (optional) Initial amount of each asset in every new wallet.
+
+    Returns:
+      List of BankWallet handles for the new wallets.
+    """
+    for symbol in amounts:
+      self.AddSymbol(symbol)
+    start = self.size
+    end = start + count
+    if end > len(self.amounts):
+      # Grow geometrically so adding wallets is amortized O(1).
+      capacity = max(end, 2 * len(self.amounts))
+      grown = np.zeros((capacity, len(self.symbols)))
+      grown[:start] = self.amounts[:start]
+      self.amounts = grown
+    for symbol, amount in amounts.items():
+      self.amounts[start:end, self.columns[symbol]] = amount
+    self.size = end
+    return [BankWallet(self, index) for index in range(start, end)]
+
+  def GetColumn(self, symbol):
+    """Gets a view of the amounts of one asset in all wallets.
+
+    Args:
+      symbol: Name of the asset.
+
+    Returns:
+      Array with the amount in each wallet, in the order wallets were added.
+    """
+    if symbol not in self.columns:
+      return np.zeros(self.size)
+    return self.amounts[:self.size, self.columns[symbol]]
+
+  def GetAmounts(self, indices, symbol):
+    """Gets the amounts of one asset in the given wallets.
+
+    Args:
+      indices: Indices of the wallets in the bank.
+      symbol: Name of the asset.
+
+    Returns:
+      Array with the amount in each of the wallets.
+    """
+    if symbol not in self.columns:
+      return np.zeros(len(indices))
+    return self.amounts[indices, self.columns[symbol]]
+
+
+class BankWallet(object):
+  """Handle to one wallet in a WalletBank, with the interface of Wallet."""
+
+  __slots__ = ('bank', 'index')
+
+  def __init__(self, bank, index):
+    self.bank = bank
+    self.index = index
+
+  def __reduce__(self):
+    # Pickle compactly as a constructor call.
+    return BankWallet, (self.bank, self.index)
+
+  @property
+  def amounts(self):
+    """Amount of each asset in this wallet, as a dict."""
+    row = self.bank.amounts[self.index].tolist()
+    return dict(zip(self.bank.symbols, row))
+
+  def GetAmount(self, symbol):
+    """Get amount of asset in this wallet.
+
+    Args:
+      symbol: Name of the asset.
+
+    Returns:
+      Decimal amount of the asset this wallet contains.
+    """
+    column = self.bank.columns.get(symbol)
+    if column is None:
+      return 0
+    return self.bank.amounts.item(self.index, column)
+
+  def AddAmount(self, symbol, amount):
+    """Add specified amount of asset to this wallet.
+
+    Args:
+      symbol: Name of the asset.
+      amount: Amount to add the wallet.
+    """
+    column = self.bank.columns.get(symbol)
+    if column is None:
+      column = self.bank.AddSymbol(symbol)
+    self.bank.amounts[self.index, column] += amount
+
+  def RemoveAmount(self, symbol, amount):
+    """Remove specified amount of asset from this wallet.
+
+    Args:
+      symbol: Name of the asset.
+      amount: Amount to add the wallet.
+    """
+    column = self.bank.columns.get(symbol)
+    if column is None:
+      raise Exception('%s not in this wallet.' % symbol)
+    self.bank.amounts[self.index, column] -= amount
+
+  def __str__(self):
+    """toString method"""
+    result = '('
+    for symbol, amount in self.amounts.items():
+      result += '%s: %s, ' % (symbol, amount)
+    result += ')'
+    return result
+
+
+def GetAmounts(wallets, symbol):
+  """Gets the amount of an asset in each of the given wallets.
+
+  Wallets in the same WalletBank are read with one array lookup.
+
+  Args:
+    wallets: List of wallets.
+    symbol: Name of the asset.
+
+  Returns:
+    Array with the amount in each wallet.
+  """
+  if wallets and isinstance(wallets[0], BankWallet):
+    bank = wallets[0].bank
+    if all(isinstance(w, BankWallet) and w.bank is bank for w in wallets):
+      return bank.GetAmounts([w.index for w in wallets], symbol)
+  return np.array([w.GetAmount(symbol) for w in wallets], dtype=float)
@@ -0,0 +1,53 @@
+import unittest
+
+import src.model.asset as asset
+import src.model.wallet as wallet
+
+
+class TestWalletBank(unittest.TestCase):
+  """Test cases for wallets stored in a wallet bank."""
+
+  def setUp(self):
+    """Test set up. Called before each test case."""
+    self.bank = wallet.WalletBank([asset.Symbols.USD])
+    self.initial_funds = {asset.Symbols.USD: 100, asset.Symbols.BTC: 5}
+
+  def test_AddWallets_InitialFunds(self):
+    """New wallets contain the initial funds."""
+    wallets = self.bank.AddWallets(3, self.initial_funds)
+    self.assertEqual(3, len(self.bank))
+    for w in wallets:
+      self.assertEqual(100, w.GetAmount(asset.Symbols.USD))
+      self.assertEqual(5, w.GetAmount(asset.Symbols.BTC))
+      self.assertEqual(self.initial_funds, w.amounts)
+
+  def test_AddAndRemoveAmount(self):
+    """Changing one wallet does not change the others."""
+    first, second = self.bank.AddWallets(2, self.initial_funds)
+    first.AddAmount(asset.Symbols.USD, 10)
+    second.RemoveAmount(asset.Symbols.BTC, 2)
+    self.assertEqual([110, 100], self.bank.GetColumn(asset.Symbols.USD).tolist())
+    self.assertEqual([5, 3], self.bank.GetColumn(asset.Symbols.BTC).tolist())
+
+  def test_NewSymbol(self):
+    """Amounts of new assets can be added but not removed."""
+    w, = self.bank.AddWallets(1)
+    self.assertEqual(0, w.GetAmount('eth'))
+    self.assertRaises(Exception, w.RemoveAmount, 'eth', 1)
+    w.AddAmount('eth', 2)
+    self.assertEqual(2, w.GetAmount('eth'))
+
+  def test_AddWallets_GrowsBank(self):
+    """Existing wallets keep their amounts when the bank grows."""
+    first, = self.bank.AddWallets(1, self.initial_funds)
+    first.AddAmount(asset.Symbols.USD, 1)
+    self.bank.AddWallets(10, self.initial_funds)
+    self.assertEqual(101, first.GetAmount(asset.Symbols.USD))
+    self.assertEqual(11, len(self.bank.GetColumn(asset.Symbols.USD)))
+
+  def test_GetAmounts(self):
+    """Amounts are read for bank wallets and plain wallets alike."""
+    bank_wallets = self.bank.AddWallets(2, self.initial_funds)
+    plain_wallets = [wallet.Wallet(self.initial_funds)]
+    self.assertEqual([100, 100], wallet.GetAmounts(bank_wallets, asset.Symbols.USD).tolist())
+    self.assertEqual([5], wallet.GetAmounts(plain_wallets, asset.Symbols.BTC).tolist())
@@ -2,17 +2,20 @@
 import argparse
 import logging
 import matplotlib.pyplot as plt
-import numpy as np
+import os
 import sys
 import time
 
 import src.model.asset as asset
 import src.model.environment.environment as env
 import src.model.environment.environment_time as env_time
+import src.model.environment.metrics as metrics_lib
+import src.model.market.history_loader as history_loader
 import src.model.market.simulated_exchange as sim_exchange
-import src.model.trader.experimentalagent as exp_agent
+import src.model.market.tape as tape
 import src.model.trader.strategies.strategies as trade_strategies
-import src.model.wallet as wallet
+import src.util.events as events_lib
+import src.util.profiler as profiler_lib
 
 
 # logging
@@ -31,10 +34,24 @@ def main(argv):
   parser.add_argument('-log_level', action="store", type=str, default='')
   parser.add_argument('-num_agents', action="store", type=int, default=10)
   parser.add_argument('-timesteps', action="store", type=int, default=10)
+  parser.add_argument('-tape_dir', action="store", type=str, default='')
+  parser.add_argument('-history_window', action="store", type=int,
+                      default=None)
+  parser.add_argument('-matching', action="store", type=str,
+                      default=sim_exchange.MatchingMode.CONTINUOUS)
+  parser.add_argument('-vectorize', action="store_true")
+  parser.add_argument('-seed', action="store", type=int, default=None)
+  parser.add_argument('-scheduling', action="store", type=str,
+                      default=env.SchedulingMode.ROUND_ROBIN)
+  parser.add_argument('-profile', action="store_true")
+  parser.add_argument('-trace_file', action="store", type=str, default='')
+  parser.add_argument('-event_file', action="store", type=str, default='')
+  parser.add_argument('-history', action="store", type=str, default='')
+  parser.add_argument('-metrics_file', action="store", type=str, default='')
   args = parser.parse_args(argv)
 
-  print 'num agents: %d' % args.num_agents
-  print 'num steps: %d' % args.timesteps
+  print('num agents: %d' % args.num_agents)
+  print('num steps: %d' % args.timesteps)
 
   # Logging
   if args.log_level:
@@ -52,19 +69,55 @@ def main(argv):
   else:
     logger = None
 
-  # Create time object for environment.
-  time_obj = env_time.IntegerTime(start_time=0, time_unit=1)
+  # Order, fill and step events, logged and written off the hot path.
+  events = None
+  consumers = []
+  if logger:
+    consumers.append(events_lib.LogConsumer(logger))
+  if args.event_file:
+    consumers.append(events_lib.BinaryConsumer(args.event_file))
+  if consumers:
+    events = events_lib.EventBuffer(consumers=consumers)
 
   # Create exchange.
   symbols = [asset.Symbols.BTC]
-  history = {asset.Symbols.BTC: [(-1, 20, -1)]}
-  print 'initial price: %s' % history[asset.Symbols.BTC][0][1]
+  if args.history:
+    # Seed the exchange with a recorded history and start after it.
+    history = {asset.Symbols.BTC: history_loader.LoadHistory(args.history)}
+    first_timestep = int(history[asset.Symbols.BTC].Timestamps()[-1]) + 1
+  else:
+    history = {asset.Symbols.BTC: [(-1, 20, -1)]}
+    first_timestep = 0
+  print('initial price: %s' % history[asset.Symbols.BTC][-1][1])
+
+  # Create time object for environment.
+  time_obj = env_time.IntegerTime(start_time=first_timestep, time_unit=1)
+
+  # Record trades to tape files.
+  tapes = {}
+  if args.tape_dir:
+    for symbol in symbols:
+      tape_path = os.path.join(args.tape_dir, '%s.tape' % symbol)
+      tapes[symbol] = tape.TapeWriter(tape_path)
   ee = sim_exchange.SimulatedExchange(
-      time=time_obj, symbols=symbols, history=history, logger=logger)
+      time=time_obj, symbols=symbols, history=history, tapes=tapes,
+      history_window=args.history_window, matching=args.matching,
+      events=events, logger=logger)
+
+  # Instrumentation.
+  profiler = None
+  if args.profile or args.trace_file:
+    profiler = profiler_lib.Profiler(trace=bool(args.trace_file))
+
+  # Metrics sampled during the run.
+  metrics = metrics_lib.MetricsRecorder()
 
   # Create simulated trading environment.
   sim_env = env.TradingEnvironment(
-      time=time_obj, exchanges=[ee], logger=logger)
+      time=time_obj, exchanges=[ee], vectorize=args.vectorize, seed=args.seed,
+      scheduling=args.scheduling, profiler=profiler, events=events,
+      metrics=metrics, logger=logger)
+  print('seed: %s' % sim_env.rng_streams.seed)
 
   # Generate agents.
   strategy_dist = {
@@ -72,10 +125,10 @@ def main(argv):
       trade_strategies.BandedMomentumStrategy(): 0.1,
       trade_strategies.BandedMomentumStrategy(momentum=False): 0.3,
   }
-  print 'Strategy distribution:'
+  print('Strategy distribution:')
   for strategy, ratio in strategy_dist.items():
-    print '  %s = %s%%' % (strategy.__class__.__name__, ratio * 100)
-  print
+    print('  %s = %s%%' % (strategy.__class__.__name__, ratio * 100))
+  print()
   initial_funds = {asset.Symbols.USD: 1000, asset.Symbols.BTC: 10}  # distr?
   sim_env.GenerateAgents(args.num_agents, strategy_dist, initial_funds)
 
@@ -84,56 +137,63 @@ def main(argv):
   sim_env.Run(timesteps=args.timesteps)
   end_time = time.time()
   time_elapsed = end_time - start_time
-
-  print 'final price: %s' % sim_env.exchanges[0].GetPrice(asset.Symbols.BTC)
-  print 'simulation time: %.4f seconds' % time_elapsed
+  for symbol_tape in tapes.values():
+    symbol_tape.Close()
+  if events:
+    events.Close()
+
+  print('final price: %s' % sim_env.exchanges[0].GetPrice(asset.Symbols.BTC))
+  print('simulation time: %.4f seconds' % time_elapsed)
+  if profiler:
+    print()
+    print(profiler.Summary())
+    if args.trace_file:
+      profiler.WriteChromeTrace(args.trace_file)
+
+  # Summary of the sampled metrics.
+  series = metrics.GetSeries()
+  if args.metrics_file:
+    metrics.Save(args.metrics_file)
+  print('\ncash on exchange: %s' % ee.wallet.GetAmount(asset.Symbols.USD))
+  print('shares on exchange: %s' % ee.wallet.GetAmount(asset.Symbols.BTC))
+  print('\nFinal wealth by strategy:')
+  median = list(series['quantiles']).index(0.5)
+  for g, group in enumerate(series['groups']):
+    print('  %s: median %.2f, gini %.3f' % (
+        group, series['wealth_quantiles'][-1, g, median],
+        series['wealth_gini'][-1, g]))
+
+  if not len(series['timestamps']):
+    print('\nno metrics were sampled.')
+    print('\ndone.')
+    return
 
   # Plot price history.
-  history = ee.GetHistory(asset.Symbols.BTC, limit=None)
-  #print 'got history length %d' % len(history)
-  t, p = zip(*history)
-  #print t
   fig_hist = plt.figure()
   ax1 = fig_hist.add_subplot(111)
-  ax1.plot(t, p, marker='x')
+  ax1.plot(series['timestamps'], series['prices'][:, 0], marker='x')
   ax1.set_xlabel('Timestep')
   ax1.set_ylabel('Price')
   ax1.set_title('Price History for %s' % asset.Symbols.BTC)
 
-  # Get distribution of wealth.
-  agents = sim_env.GetAgents()
-  dollars = []
-  shares = []
-  for agent in agents:
-    w = agent.GetWallet()
-    d = w.GetAmount(asset.Symbols.USD)
-    s = w.GetAmount(asset.Symbols.BTC)
-    dollars.append(d)
-    shares.append(s)
-  cash_on_exchange = ee.wallet.GetAmount(asset.Symbols.USD)
-  shares_on_exchange = ee.wallet.GetAmount(asset.Symbols.BTC)
-  print '\ncash on exchange: %s' % cash_on_exchange
-  print 'shares on exchange: %s' % shares_on_exchange
-  # Plot distribution of dollars.
-  fig_dollars = plt.figure()
-  ax2 = fig_dollars.add_subplot(111)
-  n, bins, patches = ax2.hist(dollars, 25, facecolor='green')
-  ax2.set_xlabel('Amount of Cash')
-  ax2.set_ylabel('Number of Agents')
-  ax2.set_title('Distribution of Cash Among %d Traders' % len(agents))
+  # Plot distribution of wealth over time.
+  fig_wealth = plt.figure()
+  ax2 = fig_wealth.add_subplot(111)
+  for g, group in enumerate(series['groups']):
+    quantiles = series['wealth_quantiles'][:, g]
+    line, = ax2.plot(series['timestamps'], quantiles[:, median], label=group)
+    ax2.fill_between(series['timestamps'], quantiles[:, 0], quantiles[:, -1],
+                     color=line.get_color(), alpha=0.2)
+  ax2.set_xlabel('Timestep')
+  ax2.set_ylabel('Wealth')
+  ax2.set_title('Median and %d-%d%% Wealth Among %d Traders' % (
+      series['quantiles'][0] * 100, series['quantiles'][-1] * 100,
+      len(sim_env.GetAgents())))
+  ax2.legend()
   ax2.grid(True)
-  # Plot distribution of shares.
-  fig_shares = plt.figure()
-  ax3 = fig_shares.add_subplot(111)
-  ax3.hist(shares, 25, facecolor='green')
-  #ax3.text(1, 1,'matplotlib', transform=ax3.transAxes, horizontalalignment='right', verticalalignment='top')
-  ax3.set_xlabel('Number of Shares')
-  ax3.set_ylabel('Number of Agents')
-  ax3.set_title('Distribution of Shares Among %d Traders' % len(agents))
-  ax3.grid(True)
   # Show plots.
   plt.show()
-  print '\ndone.'
+  print('\ndone.')
 
 
 if __name__ == '__main__':
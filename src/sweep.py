@@ -0,0 +1,248 @@
+"""Headless parameter sweeps over independent simulations.
+
+Usage:
+  python -m src.sweep -spec [spec.json] -results [results.jsonl]
+
+The spec is a JSON object with a "grid" of parameter values to combine, or a
+"random" search over them:
+
+  {"grid": {"num_agents": [100, 1000], "seed": [0, 1, 2]}}
+
+  {"random": {"num_runs": 20, "seed": 0,
+              "params": {"num_agents": {"min": 100, "max": 5000},
+                         "timesteps": [50, 100]}}}
+
+Random search samples every parameter from a list of values or uniformly
+from a {"min", "max"} range. Parameters that are not given keep the defaults
+in DEFAULT_PARAMS. Strategies are given as [name, kwargs, ratio] entries.
+
+One JSON line of summary metrics is appended to the results file as each run
+finishes. Runs already in the results file are skipped, so an interrupted
+sweep resumes where it stopped.
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+import src.model.asset as asset
+import src.model.environment.environment as env
+import src.model.environment.environment_time as env_time
+import src.model.market.simulated_exchange as sim_exchange
+import src.model.trader.strategies.strategies as trade_strategies
+import src.util.stats as stats
+
+
+# Parameters of a run that are not set by the spec.
+DEFAULT_PARAMS = {
+    'num_agents': 10,
+    'timesteps': 10,
+    'seed': None,
+    'initial_price': 20,
+    'initial_usd': 1000,
+    'initial_shares': 10,
+    'matching': sim_exchange.MatchingMode.CONTINUOUS,
+    'vectorize': False,
+    'scheduling': env.SchedulingMode.ROUND_ROBIN,
+    'strategies': [
+        ['RandomStrategy', {}, 0.6],
+        ['BandedMomentumStrategy', {}, 0.1],
+        ['BandedMomentumStrategy', {'momentum': False}, 0.3],
+    ],
+}
+
+
+def ExpandSpec(spec):
+  """Gets the parameters of every run in a sweep spec.
+
+  Args:
+    spec: Dict with a "grid" or a "random" search spec.
+
+  Returns:
+    List of parameter dicts, one per run, including the defaults.
+  """
+  if 'grid' in spec:
+    grid = spec['grid']
+    names = sorted(grid)
+    runs = [dict(zip(names, values))
+            for values in itertools.product(*[grid[name] for name in names])]
+  elif 'random' in spec:
+    search = spec['random']
+    rng = random.Random(search.get('seed'))
+    runs = []
+    for _ in range(search['num_runs']):
+      run = {}
+      for name in sorted(search['params']):
+        run[name] = _Sample(rng, search['params'][name])
+      runs.append(run)
+  else:
+    raise ValueError('Sweep spec needs a "grid" or a "random" search.')
+  for run in runs:
+    for name in run:
+      if name not in DEFAULT_PARAMS:
+        raise ValueError('Unknown sweep parameter \'%s\'' % name)
+  return [dict(DEFAULT_PARAMS, **run) for run in runs]
+
+
+def _Sample(rng, values):
+  """Samples a value from a list or a {"min", "max"} range."""
+  if isinstance(values, dict):
+    low, high = values['min'], values['max']
+    if isinstance(low, int) and isinstance(high, int):
+      return rng.randint(low, high)
+    return rng.uniform(low, high)
+  return rng.choice(values)
+
+
+def RunId(params):
+  """Gets an identifier that is the same for runs with equal parameters."""
+  encoded = json.dumps(params, sort_keys=True).encode('utf-8')
+  return hashlib.sha1(encoded).hexdigest()[:16]
+
+
+def RunSimulation(params):
+  """Runs one simulation and computes its summary metrics.
+
+  Args:
+    params: Parameter dict of the run, as returned by ExpandSpec.
+
+  Returns:
+    Dict with the run id, the parameters and the metrics of the run.
+  """
+  run_id = RunId(params)
+  seed = params['seed']
+  if seed is None:
+    # Derive the seed from the parameters so reruns are reproducible.
+    seed = int(run_id, 16) % 2**32
+  symbol = asset.Symbols.BTC
+  time_obj = env_time.IntegerTime(start_time=0, time_unit=1)
+  exchange = sim_exchange.SimulatedExchange(
+      time=time_obj, symbols=[symbol],
+      history={symbol: [(-1, params['initial_price'], -1)]},
+      matching=params['matching'])
+  sim_env = env.TradingEnvironment(
+      time=time_obj, exchanges=[exchange], vectorize=params['vectorize'],
+      seed=seed, scheduling=params['scheduling'])
+  strategy_dist = {}
+  for name, kwargs, ratio in params['strategies']:
+    strategy_dist[getattr(trade_strategies, name)(**kwargs)] = ratio
+  initial_funds = {asset.Symbols.USD: params['initial_usd'],
+                   symbol: params['initial_shares']}
+  sim_env.GenerateAgents(params['num_agents'], strategy_dist, initial_funds)
+
+  start_time = time.time()
+  sim_env.Run(timesteps=params['timesteps'])
+  elapsed = time.time() - start_time
+
+  final_price = exchange.GetPrice(symbol)
+  closes = np.array([close for _, close in exchange.GetHistory(
+      symbol, limit=params['timesteps'])], dtype=float)
+  closes = closes[closes > 0]
+  volatility = np.diff(np.log(closes)).std() if len(closes) > 1 else 0.0
+  wealth = (sim_env.wallet_bank.GetColumn(asset.Symbols.USD) +
+            final_price * sim_env.wallet_bank.GetColumn(symbol))
+  num_trades = exchange.GetNumTrades(symbol) - 1
+  return {
+      'run_id': run_id,
+      'params': params,
+      'final_price': final_price,
+      'volatility': float(volatility),
+      'wealth_gini': stats.Gini(np.maximum(wealth, 0)),
+      'num_trades': num_trades,
+      'elapsed': elapsed,
+      'trades_per_sec': num_trades / elapsed if elapsed > 0 else 0.0,
+  }
+
+
+def LoadCompletedRuns(path):
+  """Gets the ids of the runs in a results file.
+
+  Lines that cannot be parsed, such as a line cut off by a crash, are
+  ignored, so their runs are done again.
+  """
+  completed = set()
+  if not os.path.exists(path):
+    return completed
+  with open(path) as results:
+    for line in results:
+      try:
+        completed.add(json.loads(line)['run_id'])
+      except (ValueError, KeyError):
+        continue
+  return completed
+
+
+def _EndsWithNewline(path):
+  """Whether the last byte of a non-empty file is a newline."""
+  with open(path, 'rb') as results:
+    results.seek(-1, os.SEEK_END)
+    return results.read(1) == b'\n'
+
+
+def RunSweep(spec, results_path, processes=None):
+  """Runs the simulations of a sweep that are not in the results file yet.
+
+  Args:
+    spec: Sweep spec dict.
+    results_path: Path of the JSON lines results file to append to.
+    processes: (optional) Number of worker processes. Defaults to the number
+      of CPUs. Runs are done in the current process if 1.
+
+  Returns:
+    Number of runs done.
+  """
+  completed = LoadCompletedRuns(results_path)
+  pending = []
+  for params in ExpandSpec(spec):
+    run_id = RunId(params)
+    if run_id not in completed:
+      completed.add(run_id)
+      pending.append(params)
+  if not pending:
+    return 0
+  pool = None
+  if processes == 1:
+    results = map(RunSimulation, pending)
+  else:
+    pool = multiprocessing.Pool(processes)
+    results = pool.imap_unordered(RunSimulation, pending)
+  try:
+    with open(results_path, 'a') as results_file:
+      if results_file.tell() and not _EndsWithNewline(results_path):
+        # Do not append to a line cut off by a crash.
+        results_file.write('\n')
+      for result in results:
+        results_file.write(json.dumps(result, sort_keys=True) + '\n')
+        # Write each run as it finishes, so it survives a crash.
+        results_file.flush()
+  finally:
+    if pool:
+      pool.terminate()
+      pool.join()
+  return len(pending)
+
+
+def main(argv):
+  # Command-line args.
+  parser = argparse.ArgumentParser()
+  parser.add_argument('-spec', action="store", type=str, required=True)
+  parser.add_argument('-results', action="store", type=str, required=True)
+  parser.add_argument('-processes', action="store", type=int, default=None)
+  args = parser.parse_args(argv)
+
+  with open(args.spec) as spec_file:
+    spec = json.load(spec_file)
+  num_runs = RunSweep(spec, args.results, processes=args.processes)
+  sys.stdout.write('%d runs done.\n' % num_runs)
+
+
+if __name__ == '__main__':
+  main(sys.argv[1:])
@@ -0,0 +1,75 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import src.sweep as sweep
+
+
+class TestSweep(unittest.TestCase):
+  """Test cases for parameter sweeps."""
+
+  def setUp(self):
+    """Test set up. Called before each test case."""
+    self.dir = tempfile.mkdtemp()
+    self.results_path = os.path.join(self.dir, 'results.jsonl')
+
+  def tearDown(self):
+    """Test tear down. Called after each test case."""
+    shutil.rmtree(self.dir)
+
+  def _ReadResults(self):
+    """Reads all results in the results file."""
+    with open(self.results_path) as results:
+      return [json.loads(line) for line in results]
+
+  def test_ExpandSpec_Grid(self):
+    """Grid specs combine all parameter values."""
+    runs = sweep.ExpandSpec({'grid': {'num_agents': [10, 20], 'seed': [0, 1, 2]}})
+    self.assertEqual(6, len(runs))
+    self.assertEqual(6, len(set(sweep.RunId(run) for run in runs)))
+    self.assertEqual(sweep.DEFAULT_PARAMS['timesteps'], runs[0]['timesteps'])
+
+  def test_ExpandSpec_Random(self):
+    """Random specs sample reproducibly from lists and ranges."""
+    spec = {'random': {'num_runs': 5, 'seed': 3, 'params': {
+        'num_agents': {'min': 10, 'max': 20}, 'timesteps': [5, 10]}}}
+    runs = sweep.ExpandSpec(spec)
+    self.assertEqual(runs, sweep.ExpandSpec(spec))
+    for run in runs:
+      self.assertTrue(10 <= run['num_agents'] <= 20)
+      self.assertIn(run['timesteps'], [5, 10])
+
+  def test_ExpandSpec_UnknownParameter(self):
+    """Misspelled parameters are rejected."""
+    with self.assertRaises(ValueError):
+      sweep.ExpandSpec({'grid': {'agents': [10]}})
+
+  def test_RunSimulation_Reproducible(self):
+    """Runs with the same seed have the same results."""
+    params = sweep.ExpandSpec({'grid': {'num_agents': [20], 'seed': [4]}})[0]
+    first = sweep.RunSimulation(params)
+    second = sweep.RunSimulation(params)
+    for metric in ['final_price', 'volatility', 'wealth_gini', 'num_trades']:
+      self.assertEqual(first[metric], second[metric])
+
+  def test_RunSweep_Resumes(self):
+    """Completed runs are skipped and cut-off lines are run again."""
+    spec = {'grid': {'num_agents': [10, 20], 'seed': [0, 1]}}
+    self.assertEqual(4, sweep.RunSweep(spec, self.results_path, processes=1))
+    self.assertEqual(0, sweep.RunSweep(spec, self.results_path, processes=1))
+    # Cut off the last result, as if the sweep crashed while writing it.
+    with open(self.results_path) as results:
+      lines = results.readlines()
+    with open(self.results_path, 'w') as results:
+      results.writelines(lines[:-1] + [lines[-1][:10]])
+    self.assertEqual(1, sweep.RunSweep(spec, self.results_path, processes=1))
+    self.assertEqual(4, len(sweep.LoadCompletedRuns(self.results_path)))
+    self.assertEqual(0, sweep.RunSweep(spec, self.results_path, processes=1))
+
+  def test_RunSweep_ProcessPool(self):
+    """Runs on a process pool are written to the results file."""
+    spec = {'grid': {'num_agents': [10], 'seed': [0, 1]}}
+    self.assertEqual(2, sweep.RunSweep(spec, self.results_path, processes=2))
+    self.assertEqual(2, len(self._ReadResults()))
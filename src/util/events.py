@@ -0,0 +1,241 @@
+"""Structured simulation events with deferred consumers.
+
+The order path emits small typed event tuples into a preallocated buffer
+instead of formatting log messages. Consumers, such as a text log, a binary
+file or metrics, read the buffered events in batches off the hot path: when
+the buffer is full and at the end of each timestep.
+"""
+
+import collections
+import logging
+import os
+
+import numpy as np
+
+
+# Kinds of events.
+BID = 0
+ASK = 1
+CANCEL = 2
+FILL = 3
+AUCTION = 4
+STEP = 5
+
+KIND_NAMES = {
+    BID: 'bid',
+    ASK: 'ask',
+    CANCEL: 'cancel',
+    FILL: 'fill',
+    AUCTION: 'auction',
+    STEP: 'step',
+}
+
+# Fields of an event tuple.
+KIND, TIMESTAMP, SYMBOL, ORDER_ID, OTHER_ID, PRICE, AMOUNT = range(7)
+
+# Fixed-size record of an event in binary files.
+EVENT_DTYPE = np.dtype([
+    ('kind', 'u1'),
+    ('timestamp', '<f8'),
+    ('symbol', 'S16'),
+    ('order_id', '<i8'),
+    ('other_id', '<i8'),
+    ('price', '<f8'),
+    ('amount', '<f8'),
+])
+
+
+class EventBuffer(object):
+  """Preallocated buffer of event tuples.
+
+  An event is a (kind, timestamp, symbol, order_id, other_id, price, amount)
+  tuple. For fills, order_id is the bid and other_id the ask. Events are
+  handed to the consumers when the buffer is full or flushed. Without
+  consumers the buffer is a ring that keeps the latest events.
+  """
+
+  # Default number of buffered events.
+  DEFAULT_CAPACITY = 65536
+
+  def __init__(self, capacity=DEFAULT_CAPACITY, consumers=()):
+    """Initialize the buffer.
+
+    Args:
+      capacity: (optional) Number of events to buffer.
+      consumers: (optional) Objects with a Consume(events) method, called
+        with a list of event tuples in order.
+    """
+    self.capacity = capacity
+    self.consumers = list(consumers)
+    self._events = [None] * capacity
+    # Position of the next event.
+    self._size = 0
+    # Whether older events were overwritten in ring mode.
+    self._wrapped = False
+
+  def Emit(self, kind, timestamp, symbol, order_id=-1, other_id=-1, price=0.0,
+           amount=0.0):
+    """Add an event to the buffer. Nothing is formatted or written."""
+    size = self._size
+    self._events[size] = (
+        kind, timestamp, symbol, order_id, other_id, price, amount)
+    size += 1
+    if size == self.capacity:
+      self._Full()
+    else:
+      self._size = size
+
+  def _Full(self):
+    """Flush a full buffer, or start overwriting it without consumers."""
+    if self.consumers:
+      self._size = self.capacity
+      self.Flush()
+    else:
+      self._size = 0
+      self._wrapped = True
+
+  def GetEvents(self):
+    """Gets the buffered events, oldest first."""
+    if self._wrapped:
+      return self._events[self._size:] + self._events[:self._size]
+    return self._events[:self._size]
+
+  def Flush(self):
+    """Hand the buffered events to the consumers and empty the buffer."""
+    if not self.consumers or not self._size:
+      return
+    events = self.GetEvents()
+    self._size = 0
+    for consumer in self.consumers:
+      consumer.Consume(events)
+
+  def Close(self):
+    """Flush the buffer and close consumers that have a Close method."""
+    self.Flush()
+    for consumer in self.consumers:
+      if hasattr(consumer, 'Close'):
+        consumer.Close()
+
+
+def FormatEvent(event):
+  """Formats an event tuple as a log message."""
+  kind = event[KIND]
+  if kind == BID or kind == ASK:
+    return 'Placed %s %s: (symbol: %s, price: %s, amount: %s)' % (
+        KIND_NAMES[kind], event[ORDER_ID], event[SYMBOL], event[PRICE],
+        event[AMOUNT])
+  if kind == CANCEL:
+    return 'Cancelled order %s.' % event[ORDER_ID]
+  if kind == FILL:
+    return 'Trade executed (symbol: %s, price: %s, amount: %s).' % (
+        event[SYMBOL], event[PRICE], event[AMOUNT])
+  if kind == AUCTION:
+    return 'Auction cleared (symbol: %s, price: %s, amount: %s).' % (
+        event[SYMBOL], event[PRICE], event[AMOUNT])
+  if kind == STEP:
+    return 'TIMESTEP %d' % event[AMOUNT]
+  return 'Unknown event %r' % (event,)
+
+
+class LogConsumer(object):
+  """Formats events as messages of a logger.
+
+  Nothing is formatted if the logger does not log the level. Step events
+  are followed by the last price of every symbol traded so far.
+  """
+
+  def __init__(self, logger, level=logging.DEBUG):
+    self.logger = logger
+    self.level = level
+    # Symbol -> last traded price.
+    self.prices = {}
+
+  def Consume(self, events):
+    """Log the events."""
+    if not self.logger.isEnabledFor(self.level):
+      return
+    for event in events:
+      self.logger.log(self.level, FormatEvent(event))
+      if event[KIND] == FILL or event[KIND] == AUCTION:
+        self.prices[event[SYMBOL]] = event[PRICE]
+      elif event[KIND] == STEP:
+        for symbol, price in sorted(self.prices.items()):
+          self.logger.log(self.level, '    %s %s' % (symbol, price))
+
+
+class BinaryConsumer(object):
+  """Appends events to a file of fixed-size EVENT_DTYPE records."""
+
+  # Type of the records in the file.
+  dtype = EVENT_DTYPE
+
+  def __init__(self, path):
+    self.path = path
+    self._file = open(path, 'ab')
+
+  def __getstate__(self):
+    """Flush the file and keep the path and number of events written."""
+    if not self._file.closed:
+      self._file.flush()
+    return {'path': self.path,
+            'num_records': os.path.getsize(self.path) // EVENT_DTYPE.itemsize}
+
+  def __setstate__(self, state):
+    """Reopen the file for appending.
+
+    Events written after the consumer was pickled are removed, so a restored
+    simulation continues the file where it was saved.
+    """
+    size = state['num_records'] * EVENT_DTYPE.itemsize
+    if os.path.getsize(state['path']) < size:
+      raise ValueError('Event file %s is shorter than when it was saved.'
+                       % state['path'])
+    os.truncate(state['path'], size)
+    self.__init__(state['path'])
+
+  def Consume(self, events):
+    """Write the events to the file."""
+    records = np.array(
+        [(kind, timestamp, (symbol or '').encode('utf-8'), order_id,
+          other_id, price, amount)
+         for kind, timestamp, symbol, order_id, other_id, price, amount
+         in events], dtype=EVENT_DTYPE)
+    self._file.write(records.tobytes())
+
+  def Close(self):
+    """Close the file."""
+    if not self._file.closed:
+      self._file.close()
+
+
+def ReadEvents(path):
+  """Map the records of an event file into memory.
+
+  Args:
+    path: Path of a file written by BinaryConsumer.
+
+  Returns:
+    Read-only array of EVENT_DTYPE records.
+  """
+  if os.path.getsize(path) == 0:
+    # Empty files cannot be memory-mapped.
+    return np.empty(0, dtype=EVENT_DTYPE)
+  return np.memmap(path, dtype=EVENT_DTYPE, mode='r')
+
+
+class MetricsConsumer(object):
+  """Counts events by kind and traded volume by symbol."""
+
+  def __init__(self):
+    self.counts = collections.Counter()
+    self.volumes = collections.Counter()
+    self.num_fills = collections.Counter()
+
+  def Consume(self, events):
+    """Add the events to the metrics."""
+    for event in events:
+      kind = event[KIND]
+      self.counts[kind] += 1
+      if kind == FILL:
+        self.volumes[event[SYMBOL]] += event[AMOUNT]
+        self.num_fills[event[SYMBOL]] += 1
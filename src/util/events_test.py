@@ -0,0 +1,131 @@
+import logging
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+import src.util.events as events
+
+
+class _ListConsumer(object):
+  """Consumer that keeps the batches of events it is given."""
+
+  def __init__(self):
+    self.batches = []
+
+  def Consume(self, batch):
+    self.batches.append(list(batch))
+
+
+class _ListHandler(logging.Handler):
+  """Logging handler that keeps the logged messages."""
+
+  def __init__(self):
+    logging.Handler.__init__(self)
+    self.messages = []
+
+  def emit(self, record):
+    self.messages.append(record.getMessage())
+
+
+class TestEventBuffer(unittest.TestCase):
+  """Test cases for the buffer of structured events."""
+
+  def test_FlushedWhenFull(self):
+    """Consumers get the events in order when the buffer fills up."""
+    consumer = _ListConsumer()
+    buf = events.EventBuffer(capacity=2, consumers=[consumer])
+    for order_id in range(5):
+      buf.Emit(events.BID, 0, 'BTC', order_id, price=1.0, amount=2.0)
+    self.assertEqual([[0, 1], [2, 3]], [
+        [event[events.ORDER_ID] for event in batch]
+        for batch in consumer.batches])
+    buf.Flush()
+    self.assertEqual(4, consumer.batches[-1][0][events.ORDER_ID])
+    # Nothing is left to flush.
+    buf.Flush()
+    self.assertEqual(3, len(consumer.batches))
+
+  def test_RingKeepsLatestEvents(self):
+    """Without consumers the latest events are kept, oldest first."""
+    buf = events.EventBuffer(capacity=3)
+    for order_id in range(7):
+      buf.Emit(events.ASK, 0, 'BTC', order_id)
+    self.assertEqual(
+        [4, 5, 6], [event[events.ORDER_ID] for event in buf.GetEvents()])
+
+  def test_LogConsumer_FormatsOnlyWhenEnabled(self):
+    """Events are logged with the last prices after each step."""
+    logger = logging.getLogger('events_test')
+    logger.propagate = False
+    handler = _ListHandler()
+    logger.addHandler(handler)
+    buf = events.EventBuffer(consumers=[events.LogConsumer(logger)])
+    buf.Emit(events.FILL, 1, 'BTC', 1, 2, price=10.0, amount=3.0)
+    buf.Emit(events.STEP, 1, None, amount=0)
+    logger.setLevel(logging.INFO)
+    buf.Flush()
+    self.assertEqual([], handler.messages)
+    buf.Emit(events.FILL, 1, 'BTC', 1, 2, price=10.0, amount=3.0)
+    buf.Emit(events.STEP, 1, None, amount=0)
+    logger.setLevel(logging.DEBUG)
+    buf.Flush()
+    self.assertEqual([
+        'Trade executed (symbol: BTC, price: 10.0, amount: 3.0).',
+        'TIMESTEP 0',
+        '    BTC 10.0',
+    ], handler.messages)
+
+  def test_BinaryConsumer_RoundTrip(self):
+    """Events written to a binary file are read back as records."""
+    directory = tempfile.mkdtemp()
+    try:
+      path = os.path.join(directory, 'events.bin')
+      buf = events.EventBuffer(
+          capacity=2, consumers=[events.BinaryConsumer(path)])
+      buf.Emit(events.BID, 1, 'BTC', 7, price=5.0, amount=2.0)
+      buf.Emit(events.FILL, 1, 'BTC', 7, 8, price=5.0, amount=1.0)
+      buf.Emit(events.STEP, 2, None, amount=1)
+      buf.Close()
+      records = events.ReadEvents(path)
+      self.assertEqual(
+          [events.BID, events.FILL, events.STEP], records['kind'].tolist())
+      self.assertEqual([b'BTC', b'BTC', b''], records['symbol'].tolist())
+      self.assertEqual(8, records['other_id'][1])
+      self.assertEqual(1.0, records['amount'][2])
+    finally:
+      shutil.rmtree(directory)
+
+  def test_BinaryConsumer_UnpickleTruncatesLaterEvents(self):
+    """An unpickled consumer drops events written after it was pickled."""
+    directory = tempfile.mkdtemp()
+    try:
+      path = os.path.join(directory, 'events.bin')
+      consumer = events.BinaryConsumer(path)
+      consumer.Consume([(events.STEP, 0, None, -1, -1, 0.0, 1)])
+      state = pickle.dumps(consumer)
+      consumer.Consume([(events.STEP, 1, None, -1, -1, 0.0, 1)])
+      consumer.Close()
+      restored = pickle.loads(state)
+      restored.Consume([(events.STEP, 2, None, -1, -1, 0.0, 1)])
+      restored.Close()
+      self.assertEqual([0, 2], events.ReadEvents(path)['timestamp'].tolist())
+    finally:
+      shutil.rmtree(directory)
+
+  def test_MetricsConsumer(self):
+    """Metrics count events and traded volume."""
+    metrics = events.MetricsConsumer()
+    buf = events.EventBuffer(consumers=[metrics])
+    buf.Emit(events.BID, 0, 'BTC', 1, price=5.0, amount=2.0)
+    buf.Emit(events.FILL, 0, 'BTC', 1, 2, price=5.0, amount=2.0)
+    buf.Emit(events.FILL, 0, 'BTC', 1, 3, price=5.0, amount=0.5)
+    buf.Flush()
+    self.assertEqual(2, metrics.counts[events.FILL])
+    self.assertEqual(2.5, metrics.volumes['BTC'])
+    self.assertEqual(2, metrics.num_fills['BTC'])
+
+
+if __name__ == '__main__':
+  unittest.main()
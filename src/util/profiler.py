@@ -0,0 +1,154 @@
+"""Low-overhead instrumentation of the simulation's hot paths.
+
+Instrumented code follows the same pattern as logging:
+
+  if self.profiler:
+    start = time.perf_counter()
+  ...
+  if self.profiler:
+    self.profiler.Record('exchange.match', start)
+
+so nothing but the check is paid when no profiler is attached.
+"""
+
+import collections
+import json
+import time
+
+
+# Number of log2 buckets of the timing histograms. Bucket i counts durations
+# of less than 2**i nanoseconds (and at least 2**(i - 1) for i > 0).
+NUM_BUCKETS = 48
+
+
+class PhaseStats(object):
+  """Number of calls, total time and timing histogram of one phase."""
+
+  __slots__ = ('count', 'total', 'buckets')
+
+  def __init__(self):
+    self.count = 0
+    # Total time in seconds.
+    self.total = 0.0
+    self.buckets = [0] * NUM_BUCKETS
+
+  def Percentile(self, percent):
+    """Upper bound in seconds of the given percentile of the durations."""
+    if not self.count:
+      return 0.0
+    rank = self.count * percent / 100.0
+    seen = 0
+    for bucket, count in enumerate(self.buckets):
+      seen += count
+      if seen >= rank:
+        break
+    return 2 ** bucket * 1e-9
+
+
+class Profiler(object):
+  """Collects per-phase timings and event counters.
+
+  Phases are named with dotted names, such as 'exchange.match' or
+  'strategy.RandomStrategy'. Timings of nested phases include their inner
+  phases. Totals are kept for the whole run and for every timestep, and
+  individual timings can be recorded for a Chrome trace.
+  """
+
+  def __init__(self, trace=False, max_trace_events=10**6):
+    """Initialize the profiler.
+
+    Args:
+      trace: (optional) Record every timing for WriteChromeTrace.
+      max_trace_events: (optional) Maximum number of recorded timings. Later
+        timings are only aggregated.
+    """
+    self.origin = time.perf_counter()
+    # Phase name -> PhaseStats for the whole run.
+    self.phases = {}
+    # Counter name -> count for the whole run.
+    self.counters = collections.Counter()
+    # Totals of the current timestep.
+    self.step_times = collections.Counter()
+    self.step_counters = collections.Counter()
+    # One (time, end of the timestep from time.perf_counter(),
+    # {phase: seconds}, {counter: count}) tuple per timestep.
+    self.steps = []
+    self.trace = trace
+    self.max_trace_events = max_trace_events
+    # (phase, start, duration) of recorded timings.
+    self.events = []
+
+  def Record(self, phase, start):
+    """Record a phase that started at the given time.
+
+    Args:
+      phase: Name of the phase.
+      start: Start of the phase from time.perf_counter().
+    """
+    duration = time.perf_counter() - start
+    stats = self.phases.get(phase)
+    if stats is None:
+      stats = self.phases[phase] = PhaseStats()
+    stats.count += 1
+    stats.total += duration
+    stats.buckets[min(int(duration * 1e9).bit_length(), NUM_BUCKETS - 1)] += 1
+    self.step_times[phase] += duration
+    if self.trace and len(self.events) < self.max_trace_events:
+      self.events.append((phase, start, duration))
+
+  def Count(self, counter, count=1):
+    """Add to an event counter, such as the number of fills."""
+    self.counters[counter] += count
+    self.step_counters[counter] += count
+
+  def EndStep(self, timestamp):
+    """Store the totals of the timestep that ends and start a new one.
+
+    Args:
+      timestamp: Time of the timestep in the environment.
+    """
+    self.steps.append((timestamp, time.perf_counter(), dict(self.step_times),
+                       dict(self.step_counters)))
+    self.step_times.clear()
+    self.step_counters.clear()
+
+  def Summary(self):
+    """Gets a table of the phases and counters, slowest phase first."""
+    lines = ['%-40s %10s %12s %10s %10s %10s' % (
+        'phase', 'count', 'total ms', 'mean us', 'p50 us', 'p99 us')]
+    for phase, stats in sorted(self.phases.items(),
+                               key=lambda item: -item[1].total):
+      lines.append('%-40s %10d %12.1f %10.2f %10.2f %10.2f' % (
+          phase, stats.count, stats.total * 1e3,
+          stats.total / stats.count * 1e6, stats.Percentile(50) * 1e6,
+          stats.Percentile(99) * 1e6))
+    if self.counters:
+      lines.append('')
+      lines.append('%-40s %10s' % ('counter', 'count'))
+      for counter, count in sorted(self.counters.items()):
+        lines.append('%-40s %10d' % (counter, count))
+    return '\n'.join(lines)
+
+  def WriteChromeTrace(self, path):
+    """Write recorded timings in the Chrome trace event format.
+
+    The file can be opened in chrome://tracing or Perfetto, which show the
+    nested phases as a flame graph. Counters are shown per timestep.
+
+    Args:
+      path: Path of the JSON file.
+    """
+    events = []
+    for phase, start, duration in self.events:
+      events.append({
+          'name': phase, 'cat': phase.split('.')[0], 'ph': 'X', 'pid': 0,
+          'tid': 0, 'ts': (start - self.origin) * 1e6, 'dur': duration * 1e6,
+      })
+    for _, end, _, counters in self.steps:
+      if counters:
+        events.append({
+            'name': 'counters', 'ph': 'C', 'pid': 0, 'tid': 0,
+            'ts': (end - self.origin) * 1e6, 'args': counters,
+        })
+    with open(path, 'w') as trace_file:
+      json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, trace_file)
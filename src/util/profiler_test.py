@@ -0,0 +1,67 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import src.model.asset as asset
+import src.model.environment.environment as env
+import src.model.environment.environment_time as env_time
+import src.model.market.simulated_exchange as sim_exchange
+import src.model.trader.strategies.strategies as strategies
+import src.util.profiler as profiler_lib
+
+
+class TestProfiler(unittest.TestCase):
+  """Test cases for the profiler."""
+
+  def setUp(self):
+    """Test set up. Called before each test case."""
+    self.dir = tempfile.mkdtemp()
+
+  def tearDown(self):
+    """Test tear down. Called after each test case."""
+    shutil.rmtree(self.dir)
+
+  def test_Record(self):
+    """Phases are counted and their timings aggregated."""
+    profiler = profiler_lib.Profiler()
+    for _ in range(10):
+      profiler.Record('phase', time.perf_counter())
+    profiler.Count('fills', 3)
+    profiler.EndStep(0)
+    stats = profiler.phases['phase']
+    self.assertEqual(10, stats.count)
+    self.assertEqual(10, sum(stats.buckets))
+    self.assertLessEqual(stats.Percentile(50), stats.Percentile(99))
+    self.assertEqual(3, profiler.counters['fills'])
+    self.assertEqual({'fills': 3}, profiler.steps[0][3])
+    self.assertIn('phase', profiler.Summary())
+
+  def test_Environment(self):
+    """Runs report strategy and exchange phases and a Chrome trace."""
+    time_obj = env_time.IntegerTime(start_time=0, time_unit=1)
+    exchange = sim_exchange.SimulatedExchange(
+        time=time_obj, symbols=[asset.Symbols.BTC],
+        history={asset.Symbols.BTC: [(-1, 20, -1)]})
+    profiler = profiler_lib.Profiler(trace=True)
+    environment = env.TradingEnvironment(
+        time=time_obj, exchanges=[exchange], seed=1, profiler=profiler)
+    environment.GenerateAgents(
+        20, {strategies.RandomStrategy(): 0.5,
+             strategies.BandedMomentumStrategy(history_range=3): 0.5},
+        {asset.Symbols.USD: 1000, asset.Symbols.BTC: 10})
+    environment.Run(timesteps=5)
+    self.assertEqual(5, len(profiler.steps))
+    self.assertEqual(5, profiler.phases['environment.step'].count)
+    self.assertEqual(100, profiler.phases['strategy.RandomStrategy'].count +
+                     profiler.phases['strategy.BandedMomentumStrategy'].count)
+    self.assertIn('exchange.match', profiler.phases)
+    self.assertEqual(profiler.counters['exchange.fills'],
+                     profiler.phases['exchange.settle'].count)
+    path = os.path.join(self.dir, 'trace.json')
+    profiler.WriteChromeTrace(path)
+    with open(path) as trace_file:
+      events = json.load(trace_file)['traceEvents']
+    self.assertIn('environment.step', set(event['name'] for event in events))
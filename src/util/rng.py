@@ -0,0 +1,253 @@
+"""Independent, reproducible random number streams for a simulation."""
+
+import random
+
+import numpy as np
+
+
+# Kinds of streams. Streams of different kinds never overlap.
+AGENT_STREAM = 0
+COHORT_STREAM = 1
+SCHEDULER_STREAM = 2
+
+
+# Number of 64-bit words in one block of a CounterRandom stream.
+_BLOCK_WORDS = 8
+# Number of consecutive streams whose blocks are drawn at once.
+_PREFETCH_STREAMS = 64
+# Mask of the low 64 bits of an int.
+_MASK_64 = (1 << 64) - 1
+
+
+class CounterRandom(random.Random):
+  """random.Random that draws from blocks of a counter-based Philox stream.
+
+  Philox computes every 4 words of output from its key and a 256-bit
+  counter, so any part of its output can be drawn without generating the
+  parts before it. Block `count` of the stream with index i is drawn from
+  the counters (2 * i, count, 0, kind) and (2 * i + 1, count, 0, kind), and
+  words beyond the block from the counters (j, count, i + 1, kind). The
+  numbers drawn after Seek(index, count) therefore only depend on the seed,
+  kind, index and count. One CounterRandom serves all streams of a kind, so
+  a stream costs no memory beyond its position.
+
+  Blocks of consecutive streams with the same count are adjacent. When
+  streams are sought in order, as agents trading in turn do, the blocks of
+  the following streams are drawn together, so the bit generator is rarely
+  reset.
+  """
+
+  def __init__(self, seed, kind):
+    """Initialize the generator.
+
+    Args:
+      seed: Seed of the simulation.
+      kind: Kind of the streams, such as AGENT_STREAM.
+    """
+    self._seed = seed
+    self._kind = kind
+    self._bit_generator = np.random.Philox(
+        np.random.SeedSequence(seed, spawn_key=(kind,)))
+    self._state = self._bit_generator.state
+    # (count, first index, last index) and words of the prefetched blocks.
+    self._prefetch = (None, 0, -1)
+    self._prefetched = []
+    # (index, count) of the last Seek.
+    self._last = None
+    # Unused words of the current block, drawn from the end.
+    self._words = []
+    # (index, count, counter) of the next words beyond the current block.
+    self._overflow = None
+    random.Random.__init__(self)
+    self.Seek(0, 0)
+
+  def __reduce__(self):
+    # The position is set by the next Seek, so only the identity is kept.
+    return CounterRandom, (self._seed, self._kind)
+
+  def seed(self, *args, **kwargs):
+    """Streams are seeded by their position, see Seek."""
+    self.gauss_next = None
+
+  def _Draw(self, counter, num_words):
+    """Draws words of the Philox output starting at the given counter."""
+    self._state['state']['counter'][:] = counter
+    # Discard words buffered by the bit generator.
+    self._state['buffer_pos'] = 4
+    self._state['has_uint32'] = 0
+    self._bit_generator.state = self._state
+    return self._bit_generator.random_raw(num_words).tolist()
+
+  def Seek(self, index, count):
+    """Move to the start of a block.
+
+    Args:
+      index: Index of the stream among streams of its kind.
+      count: Index of the block in the stream.
+    """
+    prefetch_count, first, last = self._prefetch
+    if count != prefetch_count or not first <= index <= last:
+      if self._last == (index - 1, count):
+        # Streams are sought in order. Draw the blocks of the next streams.
+        num_streams = _PREFETCH_STREAMS
+      else:
+        num_streams = 1
+      self._prefetched = self._Draw(
+          (_BLOCK_WORDS // 4 * index, count, 0, self._kind),
+          num_streams * _BLOCK_WORDS)
+      first = index
+      self._prefetch = (count, first, first + num_streams - 1)
+    start = (index - first) * _BLOCK_WORDS
+    self._words = self._prefetched[start:start + _BLOCK_WORDS]
+    self._last = (index, count)
+    self._overflow = (index, count, 0)
+    self.gauss_next = None
+
+  def _NextWord(self):
+    """Gets the next 64 random bits of the block."""
+    if not self._words:
+      index, count, counter = self._overflow
+      self._words = self._Draw(
+          (counter, count, index + 1, self._kind), _BLOCK_WORDS)
+      self._overflow = (index, count, counter + _BLOCK_WORDS // 4)
+    return self._words.pop()
+
+  def random(self):
+    """Gets the next random float in [0, 1)."""
+    return (self._NextWord() >> 11) * (1.0 / 9007199254740992)
+
+  def _Below(self, n):
+    """Gets a random int in [0, n) with Lemire's multiply-shift method."""
+    if n > _MASK_64:
+      return self._randbelow(n)
+    product = self._NextWord() * n
+    if (product & _MASK_64) < n:
+      # Reject the few products that would bias the result.
+      threshold = ((1 << 64) - n) % n
+      while (product & _MASK_64) < threshold:
+        product = self._NextWord() * n
+    return product >> 64
+
+  def choice(self, seq):
+    """Gets a random element of a non-empty sequence."""
+    if not len(seq):
+      raise IndexError('Cannot choose from an empty sequence.')
+    return seq[self._Below(len(seq))]
+
+  def randint(self, a, b):
+    """Gets a random int in [a, b]."""
+    if b < a:
+      raise ValueError('Empty range for randint(%s, %s).' % (a, b))
+    return a + self._Below(b - a + 1)
+
+  def getrandbits(self, k):
+    """Gets an int with k random bits."""
+    if 0 <= k <= 64:
+      return self._NextWord() >> (64 - k)
+    if k < 0:
+      raise ValueError('Number of bits must be non-negative.')
+    bits = 0
+    for shift in range(0, k, 64):
+      bits |= (self._NextWord() >> max(64 - (k - shift), 0)) << shift
+    return bits
+
+
+class Stream(object):
+  """Position of one stream in a shared CounterRandom.
+
+  Every call of Next starts a new block of the stream, e.g. one block per
+  action of an agent.
+  """
+
+  __slots__ = ('source', 'index', 'count')
+
+  def __init__(self, source, index, count=0):
+    self.source = source
+    self.index = index
+    self.count = count
+
+  def Next(self):
+    """Seek the shared generator to the next block of this stream.
+
+    Returns:
+      The shared CounterRandom, valid until the next call of Next on any
+      stream of the same kind.
+    """
+    self.source.Seek(self.index, self.count)
+    self.count += 1
+    return self.source
+
+
+class RngStreams(object):
+  """Derives independent random number streams from one seed.
+
+  Each stream is identified by its kind and an index, such as the index of an
+  agent, and is seeded from SeedSequence(seed, spawn_key=(kind, index)). A
+  stream therefore only depends on the seed and its identity, not on how many
+  other streams were created or in what order they are used, so a simulation
+  draws the same numbers however its agents are scheduled or parallelized.
+  """
+
+  def __init__(self, seed=None):
+    """Initialize the streams.
+
+    Args:
+      seed: (optional) Seed of the simulation. A random seed is drawn from
+        the operating system if None and stored in the seed attribute, so the
+        run can be reproduced.
+    """
+    if seed is None:
+      seed = np.random.SeedSequence().entropy
+    self.seed = seed
+    # Kind -> CounterRandom shared by the streams of the kind.
+    self._counter_randoms = {}
+
+  def GetSeedSequence(self, kind, index):
+    """Gets the SeedSequence of a stream."""
+    return np.random.SeedSequence(self.seed, spawn_key=(kind, index))
+
+  def GetRandom(self, kind, index):
+    """Gets a stream as a random.Random, with the API of the random module.
+
+    Args:
+      kind: Kind of the stream, such as AGENT_STREAM.
+      index: Index of the stream among streams of its kind.
+
+    Returns:
+      random.Random seeded for the stream.
+    """
+    state = self.GetSeedSequence(kind, index).generate_state(4, np.uint64)
+    return random.Random(int.from_bytes(state.tobytes(), 'little'))
+
+  def GetStream(self, kind, index, count=0):
+    """Gets a stream drawn in blocks from a counter-based generator.
+
+    Unlike GetRandom, the stream has no generator of its own, so millions of
+    agents can each have a stream.
+
+    Args:
+      kind: Kind of the stream, such as AGENT_STREAM.
+      index: Index of the stream among streams of its kind.
+      count: (optional) Number of blocks already drawn from the stream.
+
+    Returns:
+      Stream whose Next method returns the generator for its next block.
+    """
+    source = self._counter_randoms.get(kind)
+    if source is None:
+      source = CounterRandom(self.seed, kind)
+      self._counter_randoms[kind] = source
+    return Stream(source, index, count)
+
+  def GetGenerator(self, kind, index):
+    """Gets a stream as a NumPy Generator for vectorized draws.
+
+    Args:
+      kind: Kind of the stream, such as COHORT_STREAM.
+      index: Index of the stream among streams of its kind.
+
+    Returns:
+      numpy.random.Generator using the counter-based Philox bit generator.
+    """
+    return np.random.Generator(
+        np.random.Philox(self.GetSeedSequence(kind, index)))
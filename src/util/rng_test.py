@@ -0,0 +1,81 @@
+import unittest
+
+import src.util.rng as rng
+
+
+class TestRngStreams(unittest.TestCase):
+  """Test cases for seeded random number streams."""
+
+  def test_Reproducible(self):
+    """Streams with the same seed and identity draw the same numbers."""
+    first = rng.RngStreams(5)
+    second = rng.RngStreams(5)
+    self.assertEqual(
+        [first.GetRandom(rng.AGENT_STREAM, 3).random() for _ in range(3)],
+        [second.GetRandom(rng.AGENT_STREAM, 3).random() for _ in range(3)])
+    self.assertEqual(
+        first.GetGenerator(rng.COHORT_STREAM, 0).integers(100, size=10).tolist(),
+        second.GetGenerator(rng.COHORT_STREAM, 0).integers(100, size=10).tolist())
+
+  def test_IndependentOfOrder(self):
+    """A stream does not depend on other streams created before it."""
+    streams = rng.RngStreams(5)
+    for index in range(10):
+      streams.GetRandom(rng.AGENT_STREAM, index).random()
+    late = streams.GetRandom(rng.AGENT_STREAM, 9).random()
+    self.assertEqual(late, rng.RngStreams(5).GetRandom(rng.AGENT_STREAM, 9).random())
+
+  def test_DistinctStreams(self):
+    """Streams of different agents, kinds and seeds differ."""
+    draws = set([
+        rng.RngStreams(5).GetRandom(rng.AGENT_STREAM, 0).random(),
+        rng.RngStreams(5).GetRandom(rng.AGENT_STREAM, 1).random(),
+        rng.RngStreams(5).GetRandom(rng.COHORT_STREAM, 0).random(),
+        rng.RngStreams(6).GetRandom(rng.AGENT_STREAM, 0).random(),
+    ])
+    self.assertEqual(4, len(draws))
+
+  def test_RandomSeedIsRecorded(self):
+    """Unseeded streams record their seed so they can be reproduced."""
+    streams = rng.RngStreams()
+    self.assertEqual(
+        streams.GetRandom(rng.AGENT_STREAM, 0).random(),
+        rng.RngStreams(streams.seed).GetRandom(rng.AGENT_STREAM, 0).random())
+
+  def test_Stream_IndependentOfOrder(self):
+    """Blocks of counter-based streams do not depend on the seek order."""
+    def Draws(order):
+      streams = rng.RngStreams(5)
+      agent_streams = [streams.GetStream(rng.AGENT_STREAM, index)
+                       for index in range(100)]
+      draws = {}
+      for index in order:
+        source = agent_streams[index].Next()
+        draws.setdefault(index, []).append(
+            [source.random(), source.randint(1, 6), source.getrandbits(70)])
+      return draws
+    in_order = Draws(list(range(100)) * 2)
+    self.assertEqual(in_order, Draws(list(range(99, -1, -1)) * 2))
+    self.assertNotEqual(in_order[0][0], in_order[0][1])
+    self.assertNotEqual(in_order[0][0], in_order[1][0])
+
+  def test_Stream_BeyondBlock(self):
+    """Draws beyond a block do not overlap the blocks of other streams."""
+    streams = rng.RngStreams(5)
+    source = streams.GetStream(rng.AGENT_STREAM, 0).Next()
+    long_draws = [source.getrandbits(64) for _ in range(40)]
+    other_draws = []
+    for index in range(1, 6):
+      source = streams.GetStream(rng.AGENT_STREAM, index).Next()
+      other_draws.extend(source.getrandbits(64) for _ in range(8))
+    self.assertEqual(40, len(set(long_draws)))
+    self.assertFalse(set(other_draws).intersection(long_draws))
+
+  def test_Stream_RestoredPosition(self):
+    """A stream created at a position continues where another one was."""
+    streams = rng.RngStreams(5)
+    stream = streams.GetStream(rng.AGENT_STREAM, 3)
+    stream.Next()
+    expected = stream.Next().random()
+    restored = rng.RngStreams(5).GetStream(rng.AGENT_STREAM, 3, count=1)
+    self.assertEqual(expected, restored.Next().random())
@@ -0,0 +1,112 @@
+"""Streaming statistics over a sliding window of values."""
+
+import collections
+import math
+
+
+class RollingWindow(object):
+  """Sum, mean, variance, min and max of the last N values.
+
+  Every statistic is updated in O(1) (amortized for min and max) when a
+  value is pushed, so the cost per value does not grow with the window size.
+  The mean and variance use Welford's updates for adding and removing a
+  value. Min and max use monotonic deques.
+  """
+
+  def __init__(self, size):
+    """Initialize an empty window.
+
+    Args:
+      size: Maximum number of values in the window.
+    """
+    if size < 1:
+      raise ValueError('Window size must be at least 1.')
+    self.size = size
+    self._values = collections.deque()
+    self._mean = 0.0
+    # Sum of squared differences from the mean.
+    self._m2 = 0.0
+    # Number of values pushed so far.
+    self._count = 0
+    # (count, value) pairs with increasing values for the min and
+    # decreasing values for the max.
+    self._min_candidates = collections.deque()
+    self._max_candidates = collections.deque()
+
+  def __len__(self):
+    """Number of values in the window."""
+    return len(self._values)
+
+  def IsFull(self):
+    """Whether the window holds size values."""
+    return len(self._values) == self.size
+
+  def Push(self, value):
+    """Add a value, dropping the oldest value if the window is full."""
+    if len(self._values) == self.size:
+      self._Remove(self._values.popleft())
+    self._values.append(value)
+    # Welford update for the new value.
+    n = len(self._values)
+    delta = value - self._mean
+    self._mean += delta / n
+    self._m2 += delta * (value - self._mean)
+    # Update the min and max candidates.
+    self._count += 1
+    oldest = self._count - self.size
+    while self._min_candidates and self._min_candidates[-1][1] >= value:
+      self._min_candidates.pop()
+    self._min_candidates.append((self._count, value))
+    if self._min_candidates[0][0] <= oldest:
+      self._min_candidates.popleft()
+    while self._max_candidates and self._max_candidates[-1][1] <= value:
+      self._max_candidates.pop()
+    self._max_candidates.append((self._count, value))
+    if self._max_candidates[0][0] <= oldest:
+      self._max_candidates.popleft()
+
+  def _Remove(self, value):
+    """Reverse the Welford update for a value leaving the window."""
+    n = len(self._values)
+    if n == 0:
+      self._mean = 0.0
+      self._m2 = 0.0
+      return
+    delta = value - self._mean
+    self._mean -= delta / n
+    self._m2 = max(self._m2 - delta * (value - self._mean), 0.0)
+
+  def Sum(self):
+    """Sum of the values in the window."""
+    return self._mean * len(self._values)
+
+  def Mean(self):
+    """Mean of the values, or None if the window is empty."""
+    if not self._values:
+      return None
+    return self._mean
+
+  def Variance(self):
+    """Population variance of the values, or None if the window is empty."""
+    if not self._values:
+      return None
+    return self._m2 / len(self._values)
+
+  def Std(self):
+    """Population standard deviation of the values."""
+    variance = self.Variance()
+    if variance is None:
+      return None
+    return math.sqrt(variance)
+
+  def Min(self):
+    """Smallest value in the window, or None if the window is empty."""
+    if not self._values:
+      return None
+    return self._min_candidates[0][1]
+
+  def Max(self):
+    """Largest value in the window, or None if the window is empty."""
+    if not self._values:
+      return None
+    return self._max_candidates[0][1]
@@ -0,0 +1,48 @@
+import random
+import unittest
+
+import numpy as np
+
+import src.util.rolling as rolling
+
+
+class TestRollingWindow(unittest.TestCase):
+  """Test cases for streaming window statistics."""
+
+  def test_Empty(self):
+    """Statistics of an empty window are None."""
+    window = rolling.RollingWindow(3)
+    self.assertEqual(0, len(window))
+    self.assertIsNone(window.Mean())
+    self.assertIsNone(window.Variance())
+    self.assertIsNone(window.Min())
+    self.assertIsNone(window.Max())
+
+  def test_InvalidSize(self):
+    """Windows must hold at least one value."""
+    with self.assertRaises(ValueError):
+      rolling.RollingWindow(0)
+
+  def test_DropsOldestValue(self):
+    """Only the latest values are kept."""
+    window = rolling.RollingWindow(3)
+    for value in [5, 1, 2, 3]:
+      window.Push(value)
+    self.assertTrue(window.IsFull())
+    self.assertEqual(6, window.Sum())
+    self.assertEqual(2, window.Mean())
+    self.assertEqual(1, window.Min())
+    self.assertEqual(3, window.Max())
+
+  def test_MatchesFullRecomputation(self):
+    """Streaming statistics match statistics of the full window."""
+    rng = random.Random(1)
+    values = [rng.uniform(90, 110) for _ in range(500)]
+    window = rolling.RollingWindow(50)
+    for i, value in enumerate(values):
+      window.Push(value)
+      expected = np.array(values[max(0, i - 49):i + 1])
+      self.assertAlmostEqual(expected.mean(), window.Mean())
+      self.assertAlmostEqual(expected.var(), window.Variance())
+      self.assertEqual(expected.min(), window.Min())
+      self.assertEqual(expected.max(), window.Max())
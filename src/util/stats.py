@@ -0,0 +1,13 @@
+"""Summary statistics of simulation results."""
+
+import numpy as np
+
+
+def Gini(values):
+  """Gini coefficient of non-negative values, between 0 and 1."""
+  values = np.sort(np.asarray(values, dtype=float))
+  if not len(values) or values.sum() <= 0:
+    return 0.0
+  ranks = np.arange(1, len(values) + 1)
+  return float(2 * np.dot(ranks, values) / (len(values) * values.sum()) -
+               (len(values) + 1.0) / len(values))
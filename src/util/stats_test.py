@@ -0,0 +1,16 @@
+import unittest
+
+import src.util.stats as stats
+
+
+class TestStats(unittest.TestCase):
+  """Test cases for summary statistics."""
+
+  def test_Gini(self):
+    """Gini is 0 for equal wealth and grows with inequality."""
+    self.assertEqual(0, stats.Gini([5, 5, 5, 5]))
+    self.assertAlmostEqual(0.75, stats.Gini([0, 0, 0, 8]))
+
+
+if __name__ == '__main__':
+  unittest.main()